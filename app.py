@@ -1,11 +1,33 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 import os
 import json
 import time
-import requests
-from bs4 import BeautifulSoup
+import hashlib
+import hmac
+import zlib
+import threading
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urldefrag, urljoin, urlparse, urlsplit, urlunsplit
+import httpx
 import re
 import logging
+from http.cookies import SimpleCookie, CookieError
+
+from cache import cache_key, create_cache, create_validator_store, normalize_url
+from coalesce import SingleFlight
+from fetcher import FETCHER, FETCH_DEADLINE, FETCH_MAX_BYTES
+from jobs import JOBS_PATH, JobScheduler, QueueFull
+from metrics import METRICS, PatternTimer
+from regex_guard import ENGINES, GUARD, SearchContext, backtracking_risk, compile_regex, parse_regex
+from parsers import PARSER_BACKEND, parse_html, parse_soup
+from renderer import RENDER_TIMEOUT, RENDERER, BrowserUnavailable, RenderError, render_available
+
+try:
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_constants
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, 
@@ -14,15 +36,12 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Carregar o arquivo technologies.json local
-try:
-    technologies_path = os.path.join(os.path.dirname(__file__), 'technologies.json')
-    with open(technologies_path, 'r', encoding='utf-8') as f:
-        TECHNOLOGIES = json.load(f)
-    logger.info(f"Arquivo technologies.json carregado com sucesso. {len(TECHNOLOGIES)} tecnologias disponíveis.")
-except Exception as e:
-    logger.error(f"Erro ao carregar technologies.json: {str(e)}")
-    TECHNOLOGIES = {}
+# Base de fingerprints (technologies.json), recarregável sem reiniciar os workers
+TECHNOLOGIES_PATH = os.environ.get('TECHNOLOGIES_PATH', os.path.join(os.path.dirname(__file__), 'technologies.json'))
+# Artefato pré-compilado (build_fingerprints.py); usado quando corresponde à versão do technologies.json
+FINGERPRINTS_ARTIFACT = os.environ.get('FINGERPRINTS_ARTIFACT', os.path.join(os.path.dirname(__file__), 'technologies.compiled.json'))
+FINGERPRINTS_WATCH_INTERVAL = float(os.environ.get('FINGERPRINTS_WATCH_INTERVAL', 0))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
 
 @app.route('/')
 def index():
@@ -52,8 +71,35 @@ def index():
         <ul>
             <li><code>timeout</code>: Tempo limite em segundos para a requisição (padrão: 10)</li>
             <li><code>cookie</code>: String de cookie para sites que requerem autenticação</li>
+            <li><code>render</code>: <code>true</code> renderiza a página num navegador headless (requer Playwright e Chromium; sem navegador a resposta é 503), avaliando as propriedades JS dos fingerprints</li>
+            <li><code>debug</code>: <code>timings</code> inclui na resposta o tempo de cada fase (download, parse, pré-filtro, casamento por família) e as regexes mais lentas</li>
+            <li><code>depth</code> / <code>max_pages</code>: segue os links da mesma origem a partir da página inicial (até <code>depth</code> níveis e <code>max_pages</code> páginas no total) e junta as detecções, mantendo a maior confiança e a versão encontrada. Widgets de chat e ferramentas de análise que só aparecem em páginas internas passam a ser detectados. O crawl tem prazo total (<code>CRAWL_BUDGET</code>); a resposta lista as páginas visitadas em <code>crawl.pages</code></li>
+            <li><code>assets</code>: <code>true</code> também baixa os scripts e CSS externos da página (até <code>ASSET_MAX_COUNT</code>, cada um limitado a <code>ASSET_MAX_BYTES</code>) para os padrões <code>scripts</code>/<code>css</code>. O resultado de cada arquivo fica em cache por URL e conteúdo, então bibliotecas populares de CDN são baixadas e analisadas uma vez só</li>
+            <li><code>cache</code>: <code>bypass</code> ignora o cache de resultados; <code>refresh</code> refaz a detecção e atualiza o cache (resposta traz o cabeçalho <code>X-Cache: HIT/MISS</code>)</li>
         </ul>
         
+        <h2>Detecção em lote:</h2>
+        <p>Envie um POST para <code>/detect/batch</code> com uma lista de URLs. Os resultados chegam em NDJSON (uma linha JSON por URL), na ordem em que cada detecção termina:</p>
+        <pre>POST /detect/batch
+{{"urls": ["https://exemplo.com", "https://outro.com"], "timeout": 10}}</pre>
+        
+        <h2>Detecção assíncrona:</h2>
+        <p>Envie um POST para <code>/jobs</code> com as mesmas opções do <code>/detect</code>; a resposta (202) traz o <code>id</code> na hora e o resultado sai em <code>GET /jobs/&lt;id&gt;</code>. Com <code>callback_url</code>, o job concluído também é enviado por POST para essa URL. A fila fica em SQLite (<code>JOBS_PATH</code>, padrão <code>DATA_DIR/jobs.sqlite3</code>) e sobrevive a reinícios se <code>DATA_DIR</code> estiver num volume persistente; <code>JOB_PER_HOST</code> e <code>JOB_HOST_INTERVAL</code> limitam o ritmo por site:</p>
+        <pre>POST /jobs
+{{"url": "https://exemplo.com", "assets": true, "callback_url": "https://meu-servico/webhook"}}</pre>
+        
+        <h2>Análise de HTML já baixado:</h2>
+        <p>Envie um POST para <code>/analyze</code> com a página e os cabeçalhos; nada é baixado, só a detecção roda. Use <code>html</code> (texto) ou <code>html_base64</code> (bytes, gzip aceito); o corpo inteiro pode ir com <code>Content-Encoding: gzip</code>. Sem <code>cookies</code>, eles são lidos dos cabeçalhos <code>Set-Cookie</code>:</p>
+        <pre>POST /analyze
+{{"url": "https://exemplo.com", "html": "&lt;html&gt;...", "headers": {{"Server": "nginx"}}, "cookies": {{"PHPSESSID": "abc"}}}}</pre>
+        <p>Em Python, a mesma análise está em <code>app.analyze(html, headers, cookies, url)</code>.</p>
+        
+        <h2>Base de fingerprints:</h2>
+        <p>A versão ativa (hash do technologies.json) aparece em <code>/status</code> e no campo <code>fingerprints_version</code> de cada detecção. Para trocar a base sem reiniciar, defina <code>FINGERPRINTS_WATCH_INTERVAL</code> (segundos) ou envie <code>POST /admin/reload</code> com <code>Authorization: Bearer $ADMIN_TOKEN</code>.</p>
+        
+        <h2>Métricas:</h2>
+        <p><code>GET /metrics</code> expõe no formato do Prometheus os histogramas de cada fase, somados entre os workers; com <code>METRICS_SAMPLE_RATE</code> uma fração das detecções também mede cada regex por tecnologia.</p>
+        
         <h2>Exemplo:</h2>
         <p><a href="/detect?url=https://google.com">Detectar tecnologias em google.com</a></p>
         
@@ -62,14 +108,25 @@ def index():
         <pre>https://n8n-wappalyzer-next.hvlihi.easypanel.host/detect?url={{$json.website}}</pre>
     </body>
     </html>
-    """.format(len(TECHNOLOGIES))
+    """.format(len(DATABASE.patterns))
 
 @app.route('/status')
 def status():
     return jsonify({
         "status": "online",
         "version": "1.0.0",
-        "technologies_count": len(TECHNOLOGIES),
+        "technologies_count": len(DATABASE.patterns),
+        "fingerprints": DATABASE.stats(),
+        "html_parser": PARSER_BACKEND,
+        "render": RENDERER.stats(),
+        "cache": RESULT_CACHE.stats() if RESULT_CACHE is not None else None,
+        "revalidation": dict(REVALIDATION_STATS, stored=VALIDATOR_STORE.size() if VALIDATOR_STORE is not None else 0),
+        "assets": dict(ASSET_STATS,
+                       urls=ASSET_URLS.stats() if ASSET_URLS is not None else None,
+                       scans=ASSET_SCANS.stats() if ASSET_SCANS is not None else None),
+        "regex_guard": GUARD.stats(DATABASE.risky),
+        "coalescing": INFLIGHT.stats(),
+        "jobs": JOBS.stats(),
         "timestamp": time.time()
     })
 
@@ -92,52 +149,131 @@ def safe_compile_regex(pattern, flags=0):
         logger.warning(f"Erro genérico ao compilar regex '{pattern}': {str(e)}")
         return None
 
-def extract_version(pattern, match, text):
-    """Extrai a versão de um padrão com base na tag version"""
-    version = ""
-    
-    if match and "\\;version:" in pattern:
-        try:
-            version_tag = pattern.split("\\;version:")[1].split("\\;")[0]
-            
-            # Se o version_tag contém referência ao grupo de captura
-            if "\\1" in version_tag:
-                if match.groups():
-                    # Substituir \\1 pelo primeiro grupo capturado
-                    version = version_tag.replace("\\1", match.group(1))
-            else:
-                # Se é um índice numérico direto
-                try:
-                    group_index = int(version_tag)
-                    if len(match.groups()) >= group_index:
-                        version = match.group(group_index)
-                except ValueError:
-                    # Se não for um número, usa o próprio tag como versão
-                    version = version_tag
-        except Exception as e:
-            logger.warning(f"Erro ao extrair versão: {str(e)}")
-            
-    return version
+class Pattern:
+    """Padrão de fingerprint normalizado, com regex, confiança e versão já interpretados"""
+
+    __slots__ = ("pattern", "name", "key", "source", "flags", "_regex", "engine", "confidence", "version",
+                 "literals", "risk")
+
+    def __init__(self, pattern, source, flags, confidence=100, version="", name="", regex=None, engine="re"):
+        self.pattern = pattern
+        self.name = name
+        self.key = name.lower()
+        self.source = source
+        self.flags = flags
+        self._regex = regex
+        self.engine = engine if regex is not None else ""
+        self.confidence = confidence
+        self.version = version
+        self.literals = ()
+        self.risk = ""
+
+    @property
+    def regex(self):
+        """Regex compilada pelo motor do regex_guard no primeiro uso"""
+        if self._regex is None:
+            self._regex, self.engine = compile_regex(self.source, self.flags)
+        return self._regex
+
+    def to_artifact(self):
+        # Regex, confiança e versão saem de novo do padrão bruto na carga; só a análise vai no artefato
+        if not self.literals and not self.risk:
+            return self.pattern
+        item = [self.pattern, sorted(self.literals)]
+        return item + [self.risk] if self.risk else item
+
+    @classmethod
+    def from_artifact(cls, item, name=""):
+        pattern, literals, risk = (item, (), "") if isinstance(item, str) else (item + [""])[:3]
+        source, confidence, version = parse_tags(pattern)
+        instance = cls(pattern, source, re.IGNORECASE if source else 0, confidence, version, name)
+        instance.literals = tuple(literals)
+        instance.risk = risk
+        return instance
+
+    def extract_version(self, match):
+        """Monta a versão a partir do template: \\1 (grupos), índice de grupo ou texto fixo"""
+        template = self.version
+        if not template or not match:
+            return ""
 
-def get_confidence(pattern):
-    """Extrai o valor de confiança de um padrão"""
-    confidence = 100  # Valor padrão
-    
-    if "\\;confidence:" in pattern:
         try:
-            confidence_str = pattern.split("\\;confidence:")[1].split("\\;")[0]
-            confidence = int(confidence_str)
-        except (ValueError, IndexError):
-            pass
-            
-    return confidence
+            if "\\" in template:
+                return re.sub(r"\\(\d+)", lambda ref: match.group(int(ref.group(1))) or "", template)
+            if template.isdigit():
+                index = int(template)
+                return (match.group(index) or "") if len(match.groups()) >= index else ""
+        except IndexError as e:
+            logger.warning(f"Erro ao extrair versão de '{self.pattern}': {str(e)}")
+            return ""
+
+        return template
+
+def parse_tags(raw):
+    """Separa valor, confiança e versão de 'valor\\;confidence:N\\;version:V'"""
+    value, *tags = raw.split("\\;")
+    confidence = 100
+    version = ""
+
+    for tag in tags:
+        key, _, tag_value = tag.partition(":")
+        if key == "confidence":
+            try:
+                confidence = int(tag_value)
+            except ValueError:
+                pass
+        elif key == "version":
+            version = tag_value
+
+    return value, confidence, version
+
+def parse_pattern(raw, name="", allow_empty=False, flags=re.IGNORECASE):
+    """Interpreta um padrão do technologies.json (regex\\;confidence:N\\;version:V) e o compila"""
+    if not isinstance(raw, str):
+        return None
+
+    regex_source, confidence, version = parse_tags(raw)
+
+    if not regex_source:
+        # Padrão vazio em meta/headers/cookies/js: basta o item existir
+        if not allow_empty:
+            return None
+        return Pattern(raw, "", 0, confidence, version, name, re.compile(""))
+
+    # Uma única compilação, já pelo motor de busca; o último motor da lista decide se o padrão é válido
+    try:
+        compiled, engine = compile_regex(regex_source, flags)
+    except Exception as e:
+        logger.warning(f"Erro ao compilar regex '{raw}': {str(e)}")
+        return None
+
+    return Pattern(raw, regex_source, flags, confidence, version, name, compiled, engine)
+
+# Famílias regex: chave no technologies.json -> nome em patterns[tech]["regex"]
+REGEX_FAMILIES = (
+    ("html", "html"),
+    ("scriptSrc", "script"),
+    ("url", "url"),
+    ("text", "text"),
+    ("css", "css"),
+    ("scripts", "scripts"),
+)
+
+# Famílias indexadas por nome de meta tag, cabeçalho, cookie ou propriedade JS
+KEYED_FAMILIES = ("meta", "headers", "cookies", "js")
 
-def compile_patterns():
-    """Compila padrões de expressões regulares de todas as tecnologias"""
+def as_list(value):
+    return value if isinstance(value, list) else [value]
+
+def compile_patterns(technologies, invalid=None):
+    """Compila padrões de expressões regulares de todas as tecnologias
+
+    Os padrões descartados são acrescentados a invalid (tecnologia, família, padrão), se fornecida.
+    """
     patterns = {}
     skipped_patterns = 0
     
-    for tech_name, tech_info in TECHNOLOGIES.items():
+    for tech_name, tech_info in technologies.items():
         patterns[tech_name] = {
             "regex": {},
             "categories": tech_info.get("cats", []),
@@ -146,458 +282,1696 @@ def compile_patterns():
             "description": tech_info.get("description", "")
         }
         
-        # HTML patterns (deprecated mas ainda suportado)
-        if "html" in tech_info:
-            patterns[tech_name]["regex"]["html"] = []
-            if isinstance(tech_info["html"], list):
-                for pattern in tech_info["html"]:
-                    compiled = safe_compile_regex(pattern, re.IGNORECASE)
-                    if compiled:
-                        patterns[tech_name]["regex"]["html"].append({
-                            "pattern": pattern,
-                            "compiled": compiled,
-                            "confidence": get_confidence(pattern)
-                        })
-                    else:
-                        skipped_patterns += 1
-            else:
-                compiled = safe_compile_regex(tech_info["html"], re.IGNORECASE)
-                if compiled:
-                    patterns[tech_name]["regex"]["html"].append({
-                        "pattern": tech_info["html"],
-                        "compiled": compiled,
-                        "confidence": get_confidence(tech_info["html"])
-                    })
-                else:
-                    skipped_patterns += 1
-        
-        # Script source patterns
-        if "scriptSrc" in tech_info:
-            patterns[tech_name]["regex"]["script"] = []
-            if isinstance(tech_info["scriptSrc"], list):
-                for pattern in tech_info["scriptSrc"]:
-                    compiled = safe_compile_regex(pattern, re.IGNORECASE)
-                    if compiled:
-                        patterns[tech_name]["regex"]["script"].append({
-                            "pattern": pattern,
-                            "compiled": compiled,
-                            "confidence": get_confidence(pattern)
-                        })
-                    else:
-                        skipped_patterns += 1
-            else:
-                compiled = safe_compile_regex(tech_info["scriptSrc"], re.IGNORECASE)
-                if compiled:
-                    patterns[tech_name]["regex"]["script"].append({
-                        "pattern": tech_info["scriptSrc"],
-                        "compiled": compiled,
-                        "confidence": get_confidence(tech_info["scriptSrc"])
-                    })
-                else:
-                    skipped_patterns += 1
-        
-        # Meta patterns
-        if "meta" in tech_info:
-            patterns[tech_name]["meta"] = tech_info["meta"]
-        
-        # URL patterns
-        if "url" in tech_info:
-            patterns[tech_name]["regex"]["url"] = []
-            if isinstance(tech_info["url"], list):
-                for pattern in tech_info["url"]:
-                    compiled = safe_compile_regex(pattern, re.IGNORECASE)
-                    if compiled:
-                        patterns[tech_name]["regex"]["url"].append({
-                            "pattern": pattern,
-                            "compiled": compiled,
-                            "confidence": get_confidence(pattern)
-                        })
-                    else:
-                        skipped_patterns += 1
-            else:
-                compiled = safe_compile_regex(tech_info["url"], re.IGNORECASE)
-                if compiled:
-                    patterns[tech_name]["regex"]["url"].append({
-                        "pattern": tech_info["url"],
-                        "compiled": compiled,
-                        "confidence": get_confidence(tech_info["url"])
-                    })
-                else:
-                    skipped_patterns += 1
-        
-        # Headers patterns
-        if "headers" in tech_info:
-            patterns[tech_name]["headers"] = tech_info["headers"]
-        
-        # JS patterns
-        if "js" in tech_info:
-            patterns[tech_name]["js"] = tech_info["js"]
-        
-        # Text patterns
-        if "text" in tech_info:
-            patterns[tech_name]["regex"]["text"] = []
-            if isinstance(tech_info["text"], list):
-                for pattern in tech_info["text"]:
-                    compiled = safe_compile_regex(pattern, re.IGNORECASE)
-                    if compiled:
-                        patterns[tech_name]["regex"]["text"].append({
-                            "pattern": pattern,
-                            "compiled": compiled,
-                            "confidence": get_confidence(pattern)
-                        })
-                    else:
-                        skipped_patterns += 1
-            else:
-                compiled = safe_compile_regex(tech_info["text"], re.IGNORECASE)
-                if compiled:
-                    patterns[tech_name]["regex"]["text"].append({
-                        "pattern": tech_info["text"],
-                        "compiled": compiled,
-                        "confidence": get_confidence(tech_info["text"])
-                    })
-                else:
-                    skipped_patterns += 1
-        
-        # CSS patterns
-        if "css" in tech_info:
-            patterns[tech_name]["regex"]["css"] = []
-            if isinstance(tech_info["css"], list):
-                for pattern in tech_info["css"]:
-                    compiled = safe_compile_regex(pattern, re.IGNORECASE)
-                    if compiled:
-                        patterns[tech_name]["regex"]["css"].append({
-                            "pattern": pattern,
-                            "compiled": compiled,
-                            "confidence": get_confidence(pattern)
-                        })
-                    else:
-                        skipped_patterns += 1
-            else:
-                compiled = safe_compile_regex(tech_info["css"], re.IGNORECASE)
-                if compiled:
-                    patterns[tech_name]["regex"]["css"].append({
-                        "pattern": tech_info["css"],
-                        "compiled": compiled,
-                        "confidence": get_confidence(tech_info["css"])
-                    })
+        # Padrões html, scriptSrc, url, text, css e scripts
+        for source_key, family in REGEX_FAMILIES:
+            if source_key not in tech_info:
+                continue
+
+            patterns[tech_name]["regex"][family] = []
+            for raw in as_list(tech_info[source_key]):
+                pattern = parse_pattern(raw)
+                if pattern:
+                    patterns[tech_name]["regex"][family].append(pattern)
                 else:
                     skipped_patterns += 1
-        
-        # Scripts content patterns
-        if "scripts" in tech_info:
-            patterns[tech_name]["regex"]["scripts"] = []
-            if isinstance(tech_info["scripts"], list):
-                for pattern in tech_info["scripts"]:
-                    compiled = safe_compile_regex(pattern, re.IGNORECASE)
-                    if compiled:
-                        patterns[tech_name]["regex"]["scripts"].append({
-                            "pattern": pattern,
-                            "compiled": compiled,
-                            "confidence": get_confidence(pattern)
-                        })
+                    if invalid is not None:
+                        invalid.append((tech_name, source_key, raw))
+
+        # Padrões meta, headers, cookies e js
+        for family in KEYED_FAMILIES:
+            if not isinstance(tech_info.get(family), dict):
+                continue
+
+            patterns[tech_name][family] = []
+            for name, value in tech_info[family].items():
+                for raw in as_list(value):
+                    pattern = parse_pattern(raw, name=name, allow_empty=True)
+                    if pattern:
+                        patterns[tech_name][family].append(pattern)
                     else:
                         skipped_patterns += 1
-            else:
-                compiled = safe_compile_regex(tech_info["scripts"], re.IGNORECASE)
-                if compiled:
-                    patterns[tech_name]["regex"]["scripts"].append({
-                        "pattern": tech_info["scripts"],
-                        "compiled": compiled,
-                        "confidence": get_confidence(tech_info["scripts"])
-                    })
-                else:
-                    skipped_patterns += 1
+                        if invalid is not None:
+                            invalid.append((tech_name, f"{family}.{name}", raw))
     
     logger.info(f"Total de padrões ignorados devido a erros de expressão regular: {skipped_patterns}")
     return patterns
 
-# Compilar padrões regex uma vez na inicialização
+# Famílias de padrões aplicadas ao conteúdo da página que passam pelo pré-filtro
+PREFILTER_FAMILIES = ("html", "text", "scripts", "css")
+
+# Tamanho mínimo de um literal para ser usado como pré-filtro
+PREFILTER_MIN_LITERAL = 3
+
+# Caracteres que o re.IGNORECASE considera equivalentes a letras ASCII
+PREFILTER_CASE_FOLD = str.maketrans({"ı": "i", "ſ": "s"})
+
+def _sequence_literals(items):
+    """Retorna os literais dos quais pelo menos um deve aparecer para a sequência casar"""
+    # Alternação no nível superior: basta um literal de cada alternativa
+    if len(items) == 1 and items[0][0] is sre_constants.BRANCH:
+        alternatives = []
+        for branch in items[0][1][1]:
+            branch_literals = _sequence_literals(list(branch))
+            if not branch_literals:
+                return ()
+            alternatives.extend(branch_literals)
+        return tuple(alternatives)
+
+    best = ""
+    run = []
+    for op, av in items + [(None, None)]:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+
+    if len(best) < PREFILTER_MIN_LITERAL or not best.isascii():
+        return ()
+
+    return (best.lower(),)
+
+def required_literals(parsed):
+    """Extrai de uma regex já analisada (parse_regex) os literais obrigatórios usados no pré-filtro"""
+    if parsed is None:
+        return ()
+    return _sequence_literals(list(parsed))
+
+def _trie_regex(literals):
+    """Monta uma alternação em forma de trie, bem mais rápida que uma alternação simples"""
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = []
+        chars = []
+        for char in sorted(key for key in node if key):
+            sub = build(node[char])
+            if sub is None:
+                chars.append(re.escape(char))
+            else:
+                branches.append(re.escape(char) + sub)
+
+        if chars:
+            branches.append(chars[0] if len(chars) == 1 else "[" + "".join(chars) + "]")
+        if not branches:
+            return None
+
+        regex = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            regex = "(?:" + regex + ")?"
+        return regex
+
+    return build(trie)
+
+class LiteralPrefilter:
+    """Encontra numa única varredura quais literais obrigatórios aparecem num texto"""
+
+    def __init__(self, literals, source=None):
+        self.literals = set(literals)
+        self.regex = None
+
+        if self.literals:
+            # O lookahead testa todas as posições, inclusive dentro de outros literais
+            self.regex = re.compile(source or "(?=(" + _trie_regex(self.literals) + "))")
+
+        # Em cada posição a trie retorna o literal mais longo; os prefixos dele também ocorrem
+        self.prefixes = {
+            literal: [literal[:i] for i in range(1, len(literal)) if literal[:i] in self.literals]
+            for literal in self.literals
+        }
+
+    def scan(self, text):
+        """Retorna o conjunto de literais presentes no texto (já em minúsculas)"""
+        found = set()
+        if self.regex is None:
+            return found
+
+        if not text.isascii():
+            text = text.translate(PREFILTER_CASE_FOLD)
+
+        for match in self.regex.finditer(text):
+            found.add(match.group(1))
+
+        for literal in list(found):
+            found.update(self.prefixes[literal])
+
+        return found
+
+def build_prefilter(patterns):
+    """Anota cada padrão com seus literais obrigatórios e risco de backtracking e monta o pré-filtro combinado"""
+    literals = set()
+    risky = 0
+
+    for tech_patterns in patterns.values():
+        for family, items in tech_patterns["regex"].items():
+            for pattern in items:
+                # Uma única análise da regex serve ao pré-filtro e ao regex_guard
+                parsed = parse_regex(pattern.source, pattern.flags)
+                pattern.risk = backtracking_risk(parsed)
+                risky += bool(pattern.risk)
+                if family in PREFILTER_FAMILIES:
+                    pattern.literals = required_literals(parsed)
+                    literals.update(pattern.literals)
+
+    logger.info(f"Pré-filtro de literais montado com {len(literals)} literais ({risky} padrões com risco de backtracking).")
+    return LiteralPrefilter(literals)
+
+class DependencyGraph:
+    """Relações implies/excludes/requires/requiresCategory, montadas uma vez por versão da base"""
+
+    def __init__(self, patterns, implies, excludes, requires, requires_category):
+        self.patterns = patterns
+        self.implies = implies
+        self.excludes = excludes
+        self.requires = requires
+        self.requires_category = requires_category
+
+        # Tecnologias sem pré-requisito são avaliadas sempre; as demais só depois que ele aparecer
+        self.gated = set(self.requires) | set(self.requires_category)
+        self.ungated = [tech_name for tech_name in patterns if tech_name not in self.gated]
+
+    def to_artifact(self):
+        return {
+            "implies": self.implies,
+            "excludes": self.excludes,
+            "requires": {name: sorted(values) for name, values in self.requires.items()},
+            "requires_category": {name: sorted(values) for name, values in self.requires_category.items()}
+        }
+
+    @classmethod
+    def from_artifact(cls, patterns, data):
+        return cls(
+            patterns,
+            {name: [tuple(item) for item in values] for name, values in data["implies"].items()},
+            data["excludes"],
+            {name: set(values) for name, values in data["requires"].items()},
+            {name: set(values) for name, values in data["requires_category"].items()}
+        )
+
+    def ready(self, technologies, evaluated):
+        """Tecnologias condicionadas cujo pré-requisito já foi detectado e que ainda não foram avaliadas"""
+        categories = {cat for tech in technologies.values() for cat in tech["categories"]}
+        return [
+            tech_name for tech_name in self.gated
+            if tech_name not in evaluated and (
+                not self.requires.get(tech_name, set()).isdisjoint(technologies)
+                or not self.requires_category.get(tech_name, set()).isdisjoint(categories)
+            )
+        ]
+
+    def add_implied(self, technologies):
+        """Adiciona as tecnologias implicadas (transitivamente) com a confiança do implies"""
+        pending = list(technologies)
+        while pending:
+            tech_name = pending.pop()
+            parent = technologies[tech_name]
+            for implied_name, implied_confidence, implied_version in self.implies.get(tech_name, ()):
+                confidence = min(parent["confidence"], implied_confidence)
+                current = technologies.get(implied_name)
+                if current is not None and current["confidence"] >= confidence:
+                    continue
+
+                if current is None:
+                    tech_patterns = self.patterns.get(implied_name, {})
+                    technologies[implied_name] = {
+                        "version": implied_version,
+                        "confidence": confidence,
+                        "categories": tech_patterns.get("categories", []),
+                        "icon": tech_patterns.get("icon", ""),
+                        "website": tech_patterns.get("website", ""),
+                        "description": tech_patterns.get("description", ""),
+                        "matched_patterns": [f"implied:{tech_name}"]
+                    }
+                else:
+                    current["confidence"] = confidence
+                    current["matched_patterns"].append(f"implied:{tech_name}")
+                pending.append(implied_name)
+
+    def remove_excluded(self, technologies):
+        """Remove as tecnologias excluídas por outra tecnologia detectada"""
+        excluded = {name for tech_name in technologies for name in self.excludes.get(tech_name, ())}
+        for name in excluded:
+            technologies.pop(name, None)
+
+def build_dependency_graph(patterns, technologies):
+    """Interpreta implies/excludes/requires/requiresCategory das tecnologias compiladas"""
+    implies = {}
+    excludes = {}
+    requires = {}
+    requires_category = {}
+
+    for tech_name, tech_info in technologies.items():
+        if tech_name not in patterns:
+            continue
+
+        values = [parse_tags(raw) for raw in as_list(tech_info.get("implies", [])) if isinstance(raw, str)]
+        for name in [name for name, _, _ in values if name not in patterns]:
+            # Sem entrada na base não há categorias, ícone nem site para reportar
+            logger.warning(f"{tech_name} implica '{name}', que não existe na base; ignorado.")
+        values = [value for value in values if value[0] in patterns]
+        if values:
+            implies[tech_name] = values
+
+        values = [raw for raw in as_list(tech_info.get("excludes", [])) if isinstance(raw, str)]
+        if values:
+            excludes[tech_name] = values
+
+        values = {raw for raw in as_list(tech_info.get("requires", [])) if isinstance(raw, str)}
+        if values:
+            requires[tech_name] = values
+
+        values = {cat for cat in as_list(tech_info.get("requiresCategory", [])) if isinstance(cat, int)}
+        if values:
+            requires_category[tech_name] = values
+
+    return DependencyGraph(patterns, implies, excludes, requires, requires_category)
+
+class FingerprintDatabase:
+    """Base de fingerprints compilada; nunca é alterada, só substituída por inteiro numa recarga"""
+
+    __slots__ = ("patterns", "prefilter", "graph", "js_chains", "risky", "version", "path", "source", "loaded_at")
+
+    def __init__(self, patterns, prefilter, graph, version="", path="", source="json"):
+        self.patterns = patterns
+        self.prefilter = prefilter
+        self.graph = graph
+        self.version = version
+        self.path = path
+        self.source = source
+        self.loaded_at = time.time()
+
+        # Cadeias de propriedades JS avaliadas no modo render
+        self.js_chains = sorted({pattern.name for tech_patterns in patterns.values()
+                                 for pattern in tech_patterns.get("js", ())})
+
+        # Padrões sinalizados na compilação como sujeitos a backtracking catastrófico
+        self.risky = [(tech_name, family, pattern.pattern, pattern.risk)
+                      for tech_name, tech_patterns in patterns.items()
+                      for family, items in tech_patterns["regex"].items()
+                      for pattern in items if pattern.risk]
+
+    def compile_all(self):
+        """Compila as regexes adiadas pelo artefato; antes de um fork, para os processos compartilharem"""
+        for tech_patterns in self.patterns.values():
+            for items in tech_patterns["regex"].values():
+                for pattern in items:
+                    pattern.regex
+            for family in KEYED_FAMILIES:
+                for pattern in tech_patterns.get(family, ()):
+                    pattern.regex
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "technologies_count": len(self.patterns),
+            "loaded_at": self.loaded_at,
+            "watch_interval": FINGERPRINTS_WATCH_INTERVAL
+        }
+
+def compile_database(technologies, version="", path="", invalid=None):
+    """Compila padrões, pré-filtro e grafo de dependências a partir do technologies.json já lido"""
+    try:
+        patterns = compile_patterns(technologies, invalid)
+        logger.info(f"Padrões compilados com sucesso: {len(patterns)} tecnologias carregadas.")
+    except Exception as e:
+        logger.error(f"Erro ao compilar padrões: {str(e)}")
+        patterns = {}
+
+    try:
+        prefilter = build_prefilter(patterns)
+    except Exception as e:
+        logger.error(f"Erro ao montar pré-filtro de literais: {str(e)}")
+        prefilter = None
+
+    try:
+        graph = build_dependency_graph(patterns, technologies)
+    except Exception as e:
+        logger.error(f"Erro ao montar grafo de dependências: {str(e)}")
+        graph = None
+
+    return FingerprintDatabase(patterns, prefilter, graph, version, path)
+
+# Formato do artefato gerado por build_fingerprints.py; mudar ao alterar a estrutura
+ARTIFACT_FORMAT = 3
+
+# Metadados omitidos do artefato quando vazios
+TECHNOLOGY_DEFAULTS = {"categories": [], "icon": "", "website": "", "description": ""}
+
+def database_to_artifact(database):
+    """Serializa o que a carga não recalcula barato: padrões com literais e risco, a trie do pré-filtro e o grafo"""
+    technologies = {}
+    for tech_name, tech_patterns in database.patterns.items():
+        # Metadados vazios e famílias ausentes ficam de fora; a carga preenche os valores padrão
+        entry = {key: value for key, value in tech_patterns.items()
+                 if key not in ("regex",) + KEYED_FAMILIES and value}
+        if tech_patterns["regex"]:
+            entry["regex"] = {family: [pattern.to_artifact() for pattern in items]
+                              for family, items in tech_patterns["regex"].items()}
+        for family in KEYED_FAMILIES:
+            if family in tech_patterns:
+                # Mesmo formato do technologies.json: nome -> padrões
+                grouped = entry[family] = {}
+                for pattern in tech_patterns[family]:
+                    grouped.setdefault(pattern.name, []).append(pattern.to_artifact())
+        technologies[tech_name] = entry
+
+    prefilter = database.prefilter
+    return {
+        "format": ARTIFACT_FORMAT,
+        "version": database.version,
+        "built_at": time.time(),
+        "technologies": technologies,
+        # Os literais já vão nos padrões; a regex da trie vai pronta, pois remontá-la é a parte cara da carga
+        "prefilter": prefilter.regex.pattern if prefilter is not None and prefilter.regex is not None else None,
+        "graph": database.graph.to_artifact() if database.graph is not None else None
+    }
+
+def database_from_artifact(artifact, path=""):
+    """Reconstrói a base a partir do artefato sem validar nem analisar regexes (compiladas sob demanda)"""
+    patterns = {}
+    for tech_name, entry in artifact["technologies"].items():
+        tech_patterns = dict(TECHNOLOGY_DEFAULTS, **entry)
+        tech_patterns["regex"] = {family: [Pattern.from_artifact(item) for item in items]
+                                  for family, items in entry.get("regex", {}).items()}
+        for family in KEYED_FAMILIES:
+            if family in entry:
+                tech_patterns[family] = [Pattern.from_artifact(item, name)
+                                         for name, items in entry[family].items() for item in items]
+        patterns[tech_name] = tech_patterns
+
+    literals = set()
+    for tech_patterns in patterns.values():
+        for items in tech_patterns["regex"].values():
+            for pattern in items:
+                literals.update(pattern.literals)
+    prefilter = LiteralPrefilter(literals, artifact["prefilter"])
+
+    graph = artifact["graph"]
+    if graph is not None:
+        graph = DependencyGraph.from_artifact(patterns, graph)
+
+    return FingerprintDatabase(patterns, prefilter, graph, artifact["version"], path, source="artifact")
+
+def file_version(content):
+    """Versão da base: prefixo do hash SHA-256 do arquivo"""
+    return hashlib.sha256(content).hexdigest()[:16]
+
+def load_artifact(artifact_path, version, path=""):
+    """Carrega o artefato pré-compilado se existir e corresponder à versão do technologies.json"""
+    if not artifact_path or not os.path.exists(artifact_path):
+        return None
+
+    try:
+        with open(artifact_path, 'r', encoding='utf-8') as f:
+            artifact = json.load(f)
+        if artifact.get("format") != ARTIFACT_FORMAT or artifact.get("version") != version:
+            logger.warning(f"Artefato {os.path.basename(artifact_path)} desatualizado. Compilando o technologies.json.")
+            return None
+        database = database_from_artifact(artifact, path)
+    except Exception as e:
+        logger.warning(f"Erro ao carregar o artefato {os.path.basename(artifact_path)}: {str(e)}")
+        return None
+
+    logger.info(f"Artefato {os.path.basename(artifact_path)} carregado: {len(database.patterns)} tecnologias.")
+    return database
+
+def load_database(path=TECHNOLOGIES_PATH, artifact_path=FINGERPRINTS_ARTIFACT):
+    """Carrega a base pelo artefato pré-compilado ou, sem ele, lendo e compilando o arquivo JSON"""
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    version = file_version(content)
+    database = load_artifact(artifact_path, version, path)
+    if database is not None:
+        return database
+
+    technologies = json.loads(content)
+    if not isinstance(technologies, dict):
+        raise ValueError("fingerprint file must contain a JSON object")
+
+    logger.info(f"Arquivo {os.path.basename(path)} carregado com sucesso. {len(technologies)} tecnologias disponíveis.")
+    return compile_database(technologies, version, path)
+
 try:
-    PATTERNS = compile_patterns()
-    logger.info(f"Padrões compilados com sucesso: {len(PATTERNS)} tecnologias carregadas.")
+    DATABASE = load_database()
 except Exception as e:
-    logger.error(f"Erro ao compilar padrões: {str(e)}")
-    PATTERNS = {}
+    logger.error(f"Erro ao carregar technologies.json: {str(e)}")
+    DATABASE = FingerprintDatabase({}, None, None, path=TECHNOLOGIES_PATH)
 
-def detect_technologies(html_content, url, headers, soup=None):
-    """Detecta tecnologias com base no conteúdo HTML, URL e headers"""
-    if soup is None:
-        soup = BeautifulSoup(html_content, 'html.parser')
-    
+DATABASE_LOCK = threading.Lock()
+
+def reload_database(path=None):
+    """Compila a base do arquivo e a troca atomicamente; requisições em andamento terminam com a anterior.
+
+    Retorna (versão anterior, base ativa). Arquivo sem alterações não é recompilado.
+    """
+    global DATABASE
+    path = path or DATABASE.path or TECHNOLOGIES_PATH
+
+    with DATABASE_LOCK:
+        previous = DATABASE
+        with open(path, 'rb') as f:
+            if file_version(f.read()) == previous.version and path == previous.path:
+                return previous.version, previous
+
+        database = load_database(path)
+        # Regexes adiadas pelo artefato compiladas antes da troca: nenhuma requisição paga a compilação
+        database.compile_all()
+        DATABASE = database
+        GUARD.reset()
+
+    logger.info(f"Base de fingerprints recarregada: {previous.version or '-'} -> {database.version} "
+                f"({len(database.patterns)} tecnologias).")
+    return previous.version, database
+
+class DatabaseWatcher:
+    """Thread que recarrega a base quando o arquivo muda (FINGERPRINTS_WATCH_INTERVAL > 0)"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='fingerprints-watcher', daemon=True)
+        self._thread.start()
+
+    def _stamp(self, path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _run(self):
+        last = self._stamp(DATABASE.path)
+        while True:
+            time.sleep(self.interval)
+            stamp = self._stamp(DATABASE.path)
+            if stamp is None or stamp == last:
+                continue
+            last = stamp
+            try:
+                reload_database()
+            except Exception as e:
+                logger.error(f"Erro ao recarregar a base de fingerprints: {str(e)}")
+
+DATABASE_WATCHER = DatabaseWatcher(FINGERPRINTS_WATCH_INTERVAL)
+
+class PageEvidence:
+    """Evidências da página extraídas uma única vez por requisição"""
+
+    __slots__ = ("url", "html", "script_srcs", "scripts", "css", "meta", "links", "headers", "cookies", "js",
+                 "assets", "asset_matches")
+
+    def __init__(self, html_content, url, headers, soup=None, cookies=None, js=None, seen_scripts=None):
+        # Extrair só script/style/meta/link, com o parser configurado (ou do soup recebido)
+        elements = parse_soup(soup) if soup is not None else parse_html(str(html_content))
+
+        self.url = url
+
+        # Converter HTML para string para facilitar a busca
+        self.html = str(html_content).lower()
+
+        script_srcs = elements.script_srcs
+        scripts = elements.scripts
+        if seen_scripts is not None:
+            # Crawl: scripts já avaliados em outra página do mesmo site não são casados de novo
+            script_srcs = unseen(script_srcs, seen_scripts, lambda src: urljoin(url, src))
+            scripts = unseen(scripts, seen_scripts, lambda text: hashlib.sha1(text.encode("utf-8", "replace")).digest())
+
+        self.script_srcs = " ".join(script_srcs)
+        self.scripts = " ".join(scripts)
+        self.css = " ".join(elements.styles)
+        self.links = elements.links
+
+        # Scripts e folhas de estilo externos (URL absoluta, família), baixados só com assets=true
+        self.assets = [(urljoin(url, src), "scripts") for src in script_srcs if src]
+        self.assets += [(urljoin(url, attrs["href"]), "css") for attrs in elements.links
+                        if attrs.get("href") and "stylesheet" in attrs.get("rel", "").lower()]
+        self.asset_matches = {}
+
+        # Mapa name/property/http-equiv -> conteúdos das meta tags
+        self.meta = {}
+        for attrs in elements.metas:
+            content = attrs.get("content", "")
+            keys = {attrs.get(attr, "").lower() for attr in ("name", "property", "http-equiv")}
+            keys.discard("")
+            for key in keys:
+                self.meta.setdefault(key, []).append(content)
+
+        # Cabeçalhos normalizados em minúsculas (mantém a primeira ocorrência)
+        self.headers = {}
+        for key, value in headers.items():
+            self.headers.setdefault(key.lower(), value)
+
+        # Cookies com nomes em minúsculas, como os cabeçalhos
+        if cookies is None:
+            cookies = parse_set_cookie(self.headers.get("set-cookie", ""))
+        self.cookies = {}
+        for name, value in cookies.items():
+            self.cookies.setdefault(name.lower(), value)
+
+        # Propriedades JS avaliadas no navegador (só no modo render)
+        self.js = {}
+        for chain, value in (js or {}).items():
+            self.js.setdefault(chain.lower(), value)
+
+
+def unseen(items, seen, key):
+    """Itens cuja chave ainda não está em seen, registrando-as"""
+    fresh = []
+    for item in items:
+        item_key = key(item)
+        if item_key not in seen:
+            seen.add(item_key)
+            fresh.append(item)
+    return fresh
+
+def parse_set_cookie(set_cookie):
+    """Extrai nome e valor dos cookies de um cabeçalho Set-Cookie"""
+    cookies = {}
+    if not set_cookie:
+        return cookies
+
+    try:
+        parsed = SimpleCookie()
+        parsed.load(set_cookie)
+        for name, morsel in parsed.items():
+            cookies[name] = morsel.value
+    except CookieError as e:
+        logger.warning(f"Erro ao interpretar cabeçalho Set-Cookie: {str(e)}")
+
+    return cookies
+
+
+def match_regex_patterns(patterns, text, prefix, confidence, version, matched_patterns, hits=None, context=None):
+    """Aplica padrões compilados a um texto e retorna a confiança e versão atualizadas"""
+    for pattern in patterns:
+        # Pular padrões cujos literais obrigatórios não aparecem no texto
+        if hits is not None and pattern.literals and hits.isdisjoint(pattern.literals):
+            continue
+
+        match = GUARD.search(pattern, text, prefix, context)
+        if match:
+            confidence = max(confidence, pattern.confidence)
+
+            # Tentar extrair versão
+            extracted_version = pattern.extract_version(match)
+            if extracted_version:
+                version = extracted_version
+
+            matched_patterns.append(f"{prefix}:{pattern.pattern}")
+
+    return confidence, version
+
+def match_keyed_patterns(patterns, values, prefix, confidence, version, matched_patterns, skip_empty=True, context=None):
+    """Aplica padrões indexados por nome (meta, header, cookie) aos valores encontrados na página"""
+    for pattern in patterns:
+        value = values.get(pattern.key)
+        if value is None:
+            continue
+
+        for text in (value if isinstance(value, list) else (value,)):
+            if skip_empty and not text:
+                continue
+
+            match = GUARD.search(pattern, text, prefix, context)
+            if match:
+                confidence = max(confidence, pattern.confidence)
+
+                # Tentar extrair versão
+                extracted_version = pattern.extract_version(match)
+                if extracted_version:
+                    version = extracted_version
+
+                matched_patterns.append(f"{prefix}:{pattern.name}={pattern.pattern}")
+
+    return confidence, version
+
+def match_technology(tech_patterns, evidence, hits, context):
+    """Aplica todos os padrões de uma tecnologia às evidências e retorna o resultado (ou None)"""
+    confidence = 0
+    version = ""
+    matched_patterns = []
+    tech_regex = tech_patterns.get("regex", {})
+
+    # Verificar padrões HTML
+    confidence, version = match_regex_patterns(
+        tech_regex.get("html", []), evidence.html, "html", confidence, version, matched_patterns,
+        hits["html"], context=context)
+
+    # Verificar padrões de script
+    confidence, version = match_regex_patterns(
+        tech_regex.get("script", []), evidence.script_srcs, "script", confidence, version, matched_patterns, context=context)
+
+    # Verificar padrões de meta tags
+    confidence, version = match_keyed_patterns(
+        tech_patterns.get("meta", ()), evidence.meta, "meta", confidence, version, matched_patterns, context=context)
+
+    # Verificar padrões de URL
+    confidence, version = match_regex_patterns(
+        tech_regex.get("url", []), evidence.url, "url", confidence, version, matched_patterns, context=context)
+
+    # Verificar padrões de headers
+    confidence, version = match_keyed_patterns(
+        tech_patterns.get("headers", ()), evidence.headers, "header", confidence, version, matched_patterns, context=context)
+
+    # Verificar padrões de cookies (o cookie existir já basta para padrões vazios)
+    confidence, version = match_keyed_patterns(
+        tech_patterns.get("cookies", ()), evidence.cookies, "cookie", confidence, version, matched_patterns,
+        skip_empty=False, context=context)
+
+    # Verificar propriedades JS (avaliadas apenas no modo render)
+    confidence, version = match_keyed_patterns(
+        tech_patterns.get("js", ()), evidence.js, "js", confidence, version, matched_patterns,
+        skip_empty=False, context=context)
+
+    # Verificar padrões de texto
+    confidence, version = match_regex_patterns(
+        tech_regex.get("text", []), evidence.html, "text", confidence, version, matched_patterns,
+        hits["html"], context=context)
+
+    # Verificar padrões de CSS
+    confidence, version = match_regex_patterns(
+        tech_regex.get("css", []), evidence.css, "css", confidence, version, matched_patterns,
+        hits["css"], context=context)
+
+    # Verificar padrões de scripts
+    confidence, version = match_regex_patterns(
+        tech_regex.get("scripts", []), evidence.scripts, "scripts", confidence, version, matched_patterns,
+        hits["scripts"], context=context)
+
+    # Padrões scripts/css já casados no conteúdo dos assets externos (assets=true)
+    for prefix, pattern, pattern_confidence, pattern_version in evidence.asset_matches.get(context.technology, ()):
+        confidence = max(confidence, pattern_confidence)
+        if pattern_version:
+            version = pattern_version
+        if f"{prefix}:{pattern}" not in matched_patterns:
+            matched_patterns.append(f"{prefix}:{pattern}")
+
+    # Se encontrou alguma evidência, retornar o resultado da tecnologia
+    if confidence > 0:
+        return {
+            "version": version,
+            "confidence": confidence,
+            "categories": tech_patterns["categories"],
+            "icon": tech_patterns.get("icon", ""),
+            "website": tech_patterns.get("website", ""),
+            "description": tech_patterns.get("description", ""),
+            "matched_patterns": matched_patterns
+        }
+    return None
+
+def detect_technologies(html_content, url, headers, soup=None, evidence=None, database=None, context=None, timings=None):
+    """Detecta tecnologias com base no conteúdo HTML, URL e headers
+
+    context (SearchContext) traz o orçamento de regex e a medição opcional por padrão;
+    timings recebe os tempos do pré-filtro e do casamento.
+    """
+    if evidence is None:
+        evidence = PageEvidence(html_content, url, headers, soup)
+
+    # A base é lida uma única vez: uma recarga no meio da detecção não a afeta
+    database = database or DATABASE
+    context = context or SearchContext()
+    patterns = database.patterns
     technologies = {}
-    
-    # Converter HTML para string para facilitar a busca
-    html_str = str(html_content).lower()
-    
-    for tech_name, tech_patterns in PATTERNS.items():
-        confidence = 0
-        version = ""
-        matched_patterns = []
-        
-        # Verificar padrões HTML
-        if "regex" in tech_patterns and "html" in tech_patterns["regex"]:
-            for pattern_obj in tech_patterns["regex"]["html"]:
-                match = pattern_obj["compiled"].search(html_str)
-                if match:
-                    pattern_confidence = pattern_obj["confidence"]
-                    confidence = max(confidence, pattern_confidence)
-                    
-                    # Tentar extrair versão
-                    extracted_version = extract_version(pattern_obj["pattern"], match, html_str)
-                    if extracted_version:
-                        version = extracted_version
-                        
-                    matched_patterns.append(f"html:{pattern_obj['pattern']}")
-        
-        # Verificar padrões de script
-        if "regex" in tech_patterns and "script" in tech_patterns["regex"]:
-            script_tags = soup.find_all("script", src=True)
-            script_srcs = [script.get("src", "") for script in script_tags]
-            script_srcs_str = " ".join(script_srcs)
-            
-            for pattern_obj in tech_patterns["regex"]["script"]:
-                match = pattern_obj["compiled"].search(script_srcs_str)
-                if match:
-                    pattern_confidence = pattern_obj["confidence"]
-                    confidence = max(confidence, pattern_confidence)
-                    
-                    # Tentar extrair versão
-                    extracted_version = extract_version(pattern_obj["pattern"], match, script_srcs_str)
-                    if extracted_version:
-                        version = extracted_version
-                        
-                    matched_patterns.append(f"script:{pattern_obj['pattern']}")
-        
-        # Verificar padrões de meta tags
-        if "meta" in tech_patterns:
-            meta_tags = soup.find_all("meta")
-            for meta_tag in meta_tags:
-                for meta_name, meta_pattern in tech_patterns["meta"].items():
-                    meta_content = None
-                    
-                    # Verificar diferentes atributos de meta tags
-                    if meta_tag.get("name", "").lower() == meta_name.lower():
-                        meta_content = meta_tag.get("content", "")
-                    elif meta_tag.get("property", "").lower() == meta_name.lower():
-                        meta_content = meta_tag.get("content", "")
-                    elif meta_tag.get("http-equiv", "").lower() == meta_name.lower():
-                        meta_content = meta_tag.get("content", "")
-                    
-                    if meta_content and isinstance(meta_pattern, str):
-                        # Remover a parte de versão para a correspondência
-                        match_pattern = meta_pattern.split('\\;')[0] if '\\;' in meta_pattern else meta_pattern
-                        match = re.search(match_pattern, meta_content, re.IGNORECASE)
-                        
-                        if match:
-                            # Verificar confiança
-                            if "\\;confidence:" in meta_pattern:
-                                conf_value = int(meta_pattern.split("\\;confidence:")[1].split("\\;")[0])
-                                confidence = max(confidence, conf_value)
-                            else:
-                                confidence = max(confidence, 100)
-                                
-                            # Obter versão
-                            if "\\;version:" in meta_pattern:
-                                try:
-                                    version_pattern = meta_pattern.split("\\;version:")[1].split("\\;")[0]
-                                    if match.groups() and version_pattern.isdigit():
-                                        version = match.group(int(version_pattern))
-                                except Exception:
-                                    pass
-                                    
-                            matched_patterns.append(f"meta:{meta_name}={meta_pattern}")
-        
-        # Verificar padrões de URL
-        if "regex" in tech_patterns and "url" in tech_patterns["regex"]:
-            for pattern_obj in tech_patterns["regex"]["url"]:
-                match = pattern_obj["compiled"].search(url)
-                if match:
-                    pattern_confidence = pattern_obj["confidence"]
-                    confidence = max(confidence, pattern_confidence)
-                    
-                    # Tentar extrair versão
-                    extracted_version = extract_version(pattern_obj["pattern"], match, url)
-                    if extracted_version:
-                        version = extracted_version
-                        
-                    matched_patterns.append(f"url:{pattern_obj['pattern']}")
-        
-        # Verificar padrões de headers
-        if "headers" in tech_patterns:
-            for header_name, header_pattern in tech_patterns["headers"].items():
-                header_value = ""
-                
-                # Converter cabeçalhos para formato consistente (lowercase)
-                for key, value in headers.items():
-                    if key.lower() == header_name.lower():
-                        header_value = value
-                        break
-                
-                if header_value and isinstance(header_pattern, str):
-                    # Remover a parte de versão para a correspondência
-                    match_pattern = header_pattern.split('\\;')[0] if '\\;' in header_pattern else header_pattern
-                    match = re.search(match_pattern, header_value, re.IGNORECASE)
-                    
-                    if match:
-                        # Verificar confiança
-                        if "\\;confidence:" in header_pattern:
-                            conf_value = int(header_pattern.split("\\;confidence:")[1].split("\\;")[0])
-                            confidence = max(confidence, conf_value)
-                        else:
-                            confidence = max(confidence, 100)
-                            
-                        # Obter versão
-                        if "\\;version:" in header_pattern:
-                            try:
-                                version_pattern = header_pattern.split("\\;version:")[1].split("\\;")[0]
-                                if match.groups() and version_pattern.isdigit():
-                                    version = match.group(int(version_pattern))
-                            except Exception:
-                                pass
-                                
-                        matched_patterns.append(f"header:{header_name}={header_pattern}")
-        
-        # Verificar padrões de texto
-        if "regex" in tech_patterns and "text" in tech_patterns["regex"]:
-            for pattern_obj in tech_patterns["regex"]["text"]:
-                match = pattern_obj["compiled"].search(html_str)
-                if match:
-                    pattern_confidence = pattern_obj["confidence"]
-                    confidence = max(confidence, pattern_confidence)
-                    
-                    # Tentar extrair versão
-                    extracted_version = extract_version(pattern_obj["pattern"], match, html_str)
-                    if extracted_version:
-                        version = extracted_version
-                        
-                    matched_patterns.append(f"text:{pattern_obj['pattern']}")
-        
-        # Verificar padrões de CSS
-        if "regex" in tech_patterns and "css" in tech_patterns["regex"]:
-            css_str = " ".join([style.string for style in soup.find_all("style") if style.string])
-            
-            for pattern_obj in tech_patterns["regex"]["css"]:
-                match = pattern_obj["compiled"].search(css_str)
-                if match:
-                    pattern_confidence = pattern_obj["confidence"]
-                    confidence = max(confidence, pattern_confidence)
-                    
-                    # Tentar extrair versão
-                    extracted_version = extract_version(pattern_obj["pattern"], match, css_str)
-                    if extracted_version:
-                        version = extracted_version
-                        
-                    matched_patterns.append(f"css:{pattern_obj['pattern']}")
-        
-        # Verificar padrões de scripts
-        if "regex" in tech_patterns and "scripts" in tech_patterns["regex"]:
-            scripts_str = " ".join([script.string for script in soup.find_all("script") if script.string])
-            
-            for pattern_obj in tech_patterns["regex"]["scripts"]:
-                match = pattern_obj["compiled"].search(scripts_str)
-                if match:
-                    pattern_confidence = pattern_obj["confidence"]
-                    confidence = max(confidence, pattern_confidence)
-                    
-                    # Tentar extrair versão
-                    extracted_version = extract_version(pattern_obj["pattern"], match, scripts_str)
-                    if extracted_version:
-                        version = extracted_version
-                        
-                    matched_patterns.append(f"scripts:{pattern_obj['pattern']}")
-        
-        # Se encontrou alguma evidência, adicionar à lista de tecnologias
-        if confidence > 0:
-            technologies[tech_name] = {
-                "version": version,
-                "confidence": confidence,
-                "categories": tech_patterns["categories"],
-                "icon": tech_patterns.get("icon", ""),
-                "website": tech_patterns.get("website", ""),
-                "description": tech_patterns.get("description", ""),
-                "matched_patterns": matched_patterns
-            }
-    
-    # Detecções específicas para tecnologias de chat e atendimento ao cliente
-    chat_patterns = {
-        "Zendesk Chat": [r"zopim", r"zendesk", r"zdassets", r"zd-chat"],
-        "Intercom": [r"intercom", r"intercomcdn", r"intercomassets"],
-        "Drift": [r"drift", r"driftt\.com", r"js\.driftt\.com"],
-        "Crisp": [r"crisp", r"crisp\.chat", r"client\.crisp\.chat"],
-        "Tawk.to": [r"tawk\.to", r"embed\.tawk\.to"],
-        "LiveChat": [r"livechat", r"livechatinc", r"cdn\.livechatinc\.com"],
-        "Olark": [r"olark", r"static\.olark\.com"],
-        "HubSpot Chat": [r"hubspot", r"js\.hs-scripts\.com", r"js\.usemessages\.com"],
-        "Freshchat": [r"freshchat", r"wchat\.freshchat\.com"],
-        "LivePerson": [r"liveperson", r"lpcdn\.lpsnmedia\.net"],
-        "Chatwoot": [r"chatwoot", r"app\.chatwoot\.com"]
-    }
-    
-    for tech_name, patterns in chat_patterns.items():
-        if tech_name not in technologies:  # Evitar duplicatas
-            for pattern in patterns:
-                if re.search(pattern, html_str, re.IGNORECASE) or re.search(pattern, url, re.IGNORECASE) or re.search(pattern, str(headers), re.IGNORECASE):
-                    technologies[tech_name] = {
-                        "version": "",
-                        "confidence": 100,
-                        "categories": [52],  # Categoria "Live chat"
-                        "icon": "",
-                        "website": "",
-                        "description": f"{tech_name} é uma ferramenta de chat e atendimento ao cliente.",
-                        "matched_patterns": [f"custom:{pattern}"]
-                    }
-                    break
-    
+
+    # Uma única varredura por texto encontra os literais presentes
+    start = time.perf_counter()
+    hits = {"html": None, "scripts": None, "css": None}
+    prefilter = database.prefilter
+    if prefilter is not None:
+        hits["html"] = prefilter.scan(evidence.html)
+        hits["scripts"] = prefilter.scan(evidence.scripts.lower())
+        hits["css"] = prefilter.scan(evidence.css.lower())
+    prefiltered = time.perf_counter()
+
+    # Tecnologias com requires/requiresCategory só são avaliadas se o pré-requisito for detectado
+    graph = database.graph
+    for tech_name in (graph.ungated if graph is not None else patterns):
+        context.technology = tech_name
+        result = match_technology(patterns[tech_name], evidence, hits, context)
+        if result is not None:
+            technologies[tech_name] = result
+
+    if graph is not None:
+        graph.add_implied(technologies)
+
+        # Avaliar as tecnologias condicionadas à medida que os pré-requisitos aparecem
+        evaluated = set()
+        ready = graph.ready(technologies, evaluated)
+        while ready:
+            for tech_name in ready:
+                evaluated.add(tech_name)
+                context.technology = tech_name
+                result = match_technology(patterns[tech_name], evidence, hits, context)
+                if result is not None:
+                    # Já implicada por outra: junta a detecção direta (maior confiança, padrões dos dois)
+                    merge_technologies(technologies, {tech_name: result})
+            graph.add_implied(technologies)
+            ready = graph.ready(technologies, evaluated)
+
+        graph.remove_excluded(technologies)
+
+    if timings is not None:
+        timings["prefilter"] = prefiltered - start
+        timings["match"] = time.perf_counter() - prefiltered
+
     return technologies
 
+# Limites do endpoint de detecção em lote
+BATCH_MAX_URLS = int(os.environ.get('BATCH_MAX_URLS', 500))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 16))
+BATCH_PER_HOST = int(os.environ.get('BATCH_PER_HOST', 2))
+DETECT_WORKERS = int(os.environ.get('DETECT_WORKERS', 4))
+ANALYZE_MAX_BYTES = int(os.environ.get('ANALYZE_MAX_BYTES', FETCH_MAX_BYTES))
+
+# Crawl raso (depth/max_pages no /detect): limites, prazo total e downloads simultâneos por crawl.
+# Com 1, as páginas reaproveitam a mesma conexão keep-alive do pool (ou o mesmo stream HTTP/2).
+CRAWL_MAX_DEPTH = int(os.environ.get('CRAWL_MAX_DEPTH', 3))
+CRAWL_MAX_PAGES = int(os.environ.get('CRAWL_MAX_PAGES', 20))
+CRAWL_BUDGET = float(os.environ.get('CRAWL_BUDGET', 30))
+CRAWL_CONCURRENCY = int(os.environ.get('CRAWL_CONCURRENCY', 1))
+
+# Assets externos (assets=true): quantos por página, bytes de cada um, downloads simultâneos e prazo total
+ASSET_MAX_COUNT = int(os.environ.get('ASSET_MAX_COUNT', 20))
+ASSET_MAX_BYTES = int(os.environ.get('ASSET_MAX_BYTES', 1024 * 1024))
+ASSET_CONCURRENCY = int(os.environ.get('ASSET_CONCURRENCY', 8))
+ASSET_DEADLINE = float(os.environ.get('ASSET_DEADLINE', 5))
+ASSET_CACHE_TTL = float(os.environ.get('ASSET_CACHE_TTL', 24 * 3600))
+ASSET_CACHE_MAX_ENTRIES = int(os.environ.get('ASSET_CACHE_MAX_ENTRIES', 5000))
+
+# Cache de resultados (backend configurado em cache.py) e valores aceitos em cache=
+RESULT_CACHE = create_cache()
+CACHE_MODES = ('', 'bypass', 'refresh')
+
+# Validadores da última busca de cada URL, para revalidação condicional
+VALIDATOR_STORE = create_validator_store()
+REVALIDATION_STATS = {"not_modified": 0, "unchanged_body": 0}
+REVALIDATION_LOCK = threading.Lock()
+
+# Cache de assets compartilhado entre requisições (mesmo backend do de resultados):
+# URL absoluta -> hash do conteúdo, e hash + versão da base + família -> padrões casados.
+# Arquivos populares de CDN (jQuery, GTM, Intercom) são baixados e analisados uma vez só.
+ASSET_URLS = create_cache('asset_urls', ASSET_CACHE_MAX_ENTRIES, ASSET_CACHE_TTL)
+ASSET_SCANS = create_cache('asset_scans', ASSET_CACHE_MAX_ENTRIES, ASSET_CACHE_TTL)
+ASSET_STATS = {"fetched": 0, "failed": 0, "scanned": 0}
+ASSET_LOCK = threading.Lock()
+
+# Requisições /detect idênticas e simultâneas compartilham um único download e detecção
+INFLIGHT = SingleFlight()
+
+# Opções do /detect aceitas no corpo do POST /jobs (callback_url é tratado à parte)
+JOB_PARAMS = ('url', 'timeout', 'cookie', 'cache', 'render', 'assets', 'depth', 'max_pages')
+
+# Pool compartilhado que executa detect_technologies para os lotes
+DETECT_POOL = ThreadPoolExecutor(max_workers=DETECT_WORKERS, thread_name_prefix='detect')
+
+def fetch_page(url, timeout=10, cookie='', extra_headers=None):
+    """Baixa a página pelo pool de conexões compartilhado e retorna a resposta HTTP"""
+    return FETCHER.fetch(url, timeout, cookie, extra_headers)
+
+def observe_analysis(mode, analysis, timer, timings):
+    """Registra as métricas de uma análise e, com debug=timings, copia os tempos para a resposta"""
+    METRICS.detections.inc(mode=mode)
+    METRICS.observe_phases(analysis)
+    if timer is not None:
+        METRICS.observe_timer(timer)
+
+    if timings is not None:
+        timings.update(analysis)
+        if timer is not None:
+            timings["families"] = dict(timer.families)
+            timings["slowest_patterns"] = timer.slowest()
+
+def analyze_page(url, html, headers, cookies=None, js=None, timings=None, mode="fetch", database=None,
+                 seen_scripts=None, assets=False):
+    """Extrai as evidências e detecta tecnologias; núcleo comum de todas as formas de análise"""
+    analysis = {}
+    timer = PatternTimer() if timings is not None or METRICS.should_sample() else None
+    database = database or DATABASE
+
+    # Extrair evidências da página uma única vez
+    start = time.perf_counter()
+    evidence = PageEvidence(html, url, headers, cookies=cookies, js=js, seen_scripts=seen_scripts)
+    analysis["parse"] = time.perf_counter() - start
+
+    # Um orçamento de regex para a detecção inteira: assets e página
+    context = SearchContext(timer)
+    if assets:
+        start = time.perf_counter()
+        load_assets(evidence, database, context)
+        analysis["assets"] = time.perf_counter() - start
+
+    # Detectar tecnologias
+    technologies = detect_technologies(html, url, headers, evidence=evidence,
+                                       database=database, context=context, timings=analysis)
+    observe_analysis(mode, analysis, timer, timings)
+
+    result = {
+        "url": url,
+        "technologies": technologies,
+        "fingerprints_version": database.version
+    }
+
+    # Orçamento de regex esgotado: alguns padrões não foram avaliados
+    if context.exceeded:
+        result["regex_budget_exceeded"] = True
+
+    return result
+
+def scan_asset(text, family, database, context=None):
+    """Casa os padrões da família (scripts ou css) de todas as tecnologias com o conteúdo de um asset
+
+    context é o SearchContext da detecção, cujo orçamento de regex é compartilhado com a página.
+    Retorna {tecnologia: [[padrão, confiança, versão], ...]} e se a varredura terminou dentro do orçamento.
+    """
+    hits = database.prefilter.scan(text.lower()) if database.prefilter is not None else None
+    context = context or SearchContext()
+    matches = {}
+    for tech_name, tech_patterns in database.patterns.items():
+        context.technology = tech_name
+        found = []
+        for pattern in tech_patterns["regex"].get(family, ()):
+            if hits is not None and pattern.literals and hits.isdisjoint(pattern.literals):
+                continue
+            match = GUARD.search(pattern, text, family, context)
+            if match:
+                found.append([pattern.pattern, pattern.confidence, pattern.extract_version(match) or ""])
+        if found:
+            matches[tech_name] = found
+    return matches, not context.exceeded
+
+async def fetch_assets_async(urls):
+    """Baixa os assets em paralelo, com limite de bytes e prazo total; None para os que falharem"""
+    limit = asyncio.Semaphore(ASSET_CONCURRENCY)
+
+    async def fetch(url):
+        async with limit:
+            return await FETCHER.fetch_async(url, ASSET_DEADLINE, max_bytes=ASSET_MAX_BYTES, deadline=ASSET_DEADLINE)
+
+    tasks = [asyncio.ensure_future(fetch(url)) for url in urls]
+    done, pending = await asyncio.wait(tasks, timeout=ASSET_DEADLINE)
+    for task in pending:
+        task.cancel()
+
+    responses = []
+    for url, task in zip(urls, tasks):
+        if task in done and task.exception() is None:
+            responses.append(task.result())
+        else:
+            logger.info(f"Asset {url} não baixado: {task.exception() if task in done else 'prazo esgotado'}")
+            responses.append(None)
+    return responses
+
+def cached_asset_scan(url, family, version):
+    """Padrões já casados no conteúdo da URL com esta versão da base (None se for preciso baixar)"""
+    if ASSET_URLS is None or ASSET_SCANS is None:
+        return None
+    entry = ASSET_URLS.get(url)
+    if entry is None:
+        return None
+    return ASSET_SCANS.get(f"{entry['hash']}|{version}|{family}")
+
+def add_asset_matches(evidence, family, matches):
+    for tech_name, found in matches.items():
+        evidence.asset_matches.setdefault(tech_name, []).extend(
+            (family, pattern, confidence, version) for pattern, confidence, version in found)
+
+def load_assets(evidence, database, context=None):
+    """Preenche evidence.asset_matches com os padrões casados nos scripts e CSS externos da página"""
+    selected = {}
+    for url, family in evidence.assets:
+        if len(selected) >= ASSET_MAX_COUNT:
+            break
+        if urlparse(url).scheme in ('http', 'https'):
+            selected.setdefault(urldefrag(url)[0], family)
+
+    pending = []
+    for url, family in selected.items():
+        matches = cached_asset_scan(url, family, database.version)
+        if matches is None:
+            pending.append((url, family))
+        else:
+            add_asset_matches(evidence, family, matches)
+
+    if not pending:
+        return
+
+    # Downloads no loop do FETCHER; a análise (CPU) fica na thread que chamou
+    responses = FETCHER.submit(fetch_assets_async([url for url, _ in pending])).result()
+    for (url, family), response in zip(pending, responses):
+        if response is None:
+            with ASSET_LOCK:
+                ASSET_STATS["failed"] += 1
+            continue
+
+        # Conteúdo idêntico servido por outra URL já tem o resultado em cache
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        key = f"{content_hash}|{database.version}|{family}"
+        matches = ASSET_SCANS.get(key) if ASSET_SCANS is not None else None
+        if matches is None:
+            matches, complete = scan_asset(response.text, family, database, context)
+            with ASSET_LOCK:
+                ASSET_STATS["scanned"] += 1
+            if complete and ASSET_SCANS is not None:
+                ASSET_SCANS.set(key, matches)
+
+        if ASSET_URLS is not None:
+            ASSET_URLS.set(url, {"hash": content_hash})
+        with ASSET_LOCK:
+            ASSET_STATS["fetched"] += 1
+        add_asset_matches(evidence, family, matches)
+
+def analyze_response(url, response, timings=None, assets=False):
+    """Detecta tecnologias numa resposta HTTP já baixada e monta o resultado"""
+    result = analyze_page(url, response.text, response.headers, response.cookies, timings=timings, assets=assets)
+    result["truncated"] = bool(response.truncated)
+
+    # Download interrompido: a detecção rodou apenas sobre o início da página
+    if response.truncated:
+        result["truncation_reason"] = response.truncated
+        result["bytes_analyzed"] = len(response.content)
+
+    return result
+
+def previous_fetch(url, cookie='', cache_mode='', variant=''):
+    """Retorna os validadores e o resultado da última busca da URL (None com cache=bypass|refresh)"""
+    if VALIDATOR_STORE is None or cache_mode in ('bypass', 'refresh'):
+        return None
+
+    # Resultado analisado com outra versão da base não pode ser reaproveitado
+    previous = VALIDATOR_STORE.get(cache_key(url, cookie, variant))
+    if previous is None or previous["result"].get("fingerprints_version") != DATABASE.version:
+        return None
+    return previous
+
+def conditional_headers(previous):
+    """Monta If-None-Match/If-Modified-Since a partir dos validadores guardados"""
+    headers = {}
+    if previous:
+        if previous.get("etag"):
+            headers['If-None-Match'] = previous["etag"]
+        if previous.get("last_modified"):
+            headers['If-Modified-Since'] = previous["last_modified"]
+    return headers
+
+def count_revalidation(kind):
+    with REVALIDATION_LOCK:
+        REVALIDATION_STATS[kind] += 1
+
+def analyze_fetched(url, cookie, cache_mode, response, previous, timings=None, assets=False):
+    """Analisa a resposta, reaproveitando o resultado anterior se a página não mudou (304 ou corpo idêntico)"""
+    METRICS.observe_phases(response.timings)
+    if timings is not None:
+        timings["fetch"] = dict(response.timings)
+
+    if previous is not None and response.status_code == 304:
+        count_revalidation("not_modified")
+        METRICS.detections.inc(mode="revalidated")
+        return dict(previous["result"], url=url)
+
+    body_hash = hashlib.sha256(response.content).hexdigest()
+    if previous is not None and previous.get("body_hash") == body_hash:
+        count_revalidation("unchanged_body")
+        METRICS.detections.inc(mode="revalidated")
+        result = dict(previous["result"], url=url)
+    else:
+        result = analyze_response(url, response, timings, assets)
+
+    if VALIDATOR_STORE is not None and cache_mode != 'bypass' and not result.get("regex_budget_exceeded"):
+        VALIDATOR_STORE.set(cache_key(url, cookie, 'assets' if assets else ''), {
+            "etag": response.headers.get('ETag', ''),
+            "last_modified": response.headers.get('Last-Modified', ''),
+            "body_hash": body_hash,
+            "result": result
+        })
+
+    return result
+
+def error_result(url, e):
+    """Monta o resultado de erro de uma detecção"""
+    METRICS.detections.inc(mode="error")
+    if isinstance(e, httpx.HTTPError):
+        return {
+            "error": f"Request error: {str(e)}",
+            "url": url
+        }
+    if isinstance(e, RenderError):
+        return {
+            "error": f"Render error: {str(e)}",
+            "url": url
+        }
+    return {
+        "error": str(e),
+        "url": url
+    }
+
+def result_key(url, cookie='', variant='', version=None):
+    """Chave do cache de resultados, separada por versão da base de fingerprints"""
+    version = DATABASE.version if version is None else version
+    return cache_key(url, cookie, f"{version}|{variant}" if variant else version)
+
+def cached_result(url, cookie='', cache_mode='', variant=''):
+    """Busca o resultado no cache, a menos que cache=bypass|refresh"""
+    if RESULT_CACHE is None or cache_mode in ('bypass', 'refresh'):
+        return None
+    return RESULT_CACHE.get(result_key(url, cookie, variant))
+
+def store_result(url, cookie, cache_mode, result, variant=''):
+    """Guarda o resultado no cache, exceto com cache=bypass"""
+    # Resultados parciais (orçamento de regex esgotado) não são guardados
+    if (RESULT_CACHE is not None and cache_mode != 'bypass' and "fingerprints_version" in result
+            and not result.get("regex_budget_exceeded")):
+        RESULT_CACHE.set(result_key(url, cookie, variant, result["fingerprints_version"]), result)
+
+def render_page(url, timeout=10, cookie=''):
+    """Renderiza a página no navegador headless do pool compartilhado"""
+    return FETCHER.submit(RENDERER.render(url, timeout, cookie, DATABASE.js_chains)).result()
+
+def analyze_rendered(url, page, timings=None):
+    """Detecta tecnologias no DOM renderizado, incluindo as propriedades JS avaliadas"""
+    result = analyze_page(url, page.html, page.headers, page.cookies, page.js, timings, mode="render")
+    result["truncated"] = False
+    result["rendered"] = True
+    return result
+
+def gunzip(data, max_bytes=0):
+    """Descompacta gzip; com max_bytes > 0 recusa conteúdo maior (proteção contra gzip bomb)"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    content = decompressor.decompress(data, max_bytes + 1 if max_bytes > 0 else 0)
+    if max_bytes > 0 and len(content) > max_bytes:
+        raise ValueError(f"decompressed content exceeds {max_bytes} bytes")
+    return content
+
+def normalize_headers(headers):
+    """Aceita dict ou lista de pares (nome, valor); retorna o dict e todos os valores de Set-Cookie"""
+    if headers is None:
+        return {}, []
+
+    pairs = headers.items() if isinstance(headers, dict) else headers
+    normalized = {}
+    set_cookies = []
+    for name, value in pairs:
+        if not isinstance(name, str):
+            raise ValueError("header names must be strings")
+        values = value if isinstance(value, list) else [value]
+        normalized.setdefault(name, ", ".join(str(item) for item in values))
+        if name.lower() == "set-cookie":
+            set_cookies.extend(str(item) for item in values)
+
+    return normalized, set_cookies
+
+def decode_html(body, headers, max_bytes=0):
+    """Converte o corpo (str ou bytes, gzip opcional) em texto, usando o charset do Content-Type"""
+    if isinstance(body, str):
+        return body
+
+    if body[:2] == b"\x1f\x8b":
+        body = gunzip(body, max_bytes)
+
+    content_type = next((value for name, value in headers.items() if name.lower() == "content-type"), "")
+    charset = re.search(r"charset=[\"']?([\w.:-]+)", content_type)
+    try:
+        return body.decode(charset.group(1) if charset else "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+def truncate_html(html, max_bytes):
+    """Corta o HTML enviado (str ou bytes) em max_bytes bytes; retorna (html, truncado)
+
+    Texto é medido em bytes UTF-8. gzip não é cortado: o limite vale para o conteúdo
+    descompactado, que acima dele é recusado em analyze.
+    """
+    if isinstance(html, str):
+        # Até 4 bytes por caractere: texto curto cabe sem codificar
+        if len(html) * 4 <= max_bytes:
+            return html, False
+        data = html.encode("utf-8")
+        if len(data) <= max_bytes:
+            return html, False
+        return data[:max_bytes].decode("utf-8", errors="ignore"), True
+
+    if html[:2] == b"\x1f\x8b" or len(html) <= max_bytes:
+        return html, False
+    return html[:max_bytes], True
+
+def analyze(html, headers=None, cookies=None, url="", js=None, timings=None, database=None, max_bytes=0):
+    """Ponto de entrada como biblioteca: detecta tecnologias numa página já baixada, sem acessar a rede
+
+    html pode ser str ou bytes (gzip aceito); headers, dict ou lista de pares (nome, valor);
+    cookies, dict nome -> valor (sem ele, são lidos dos cabeçalhos Set-Cookie).
+    O gzip é descompactado uma única vez; com max_bytes > 0, um conteúdo descompactado
+    maior levanta ValueError.
+    """
+    headers, set_cookies = normalize_headers(headers)
+    if cookies is None:
+        cookies = {}
+        for set_cookie in set_cookies:
+            cookies.update(parse_set_cookie(set_cookie))
+
+    html = decode_html(html or b"", headers, max_bytes)
+    return analyze_page(url, html, headers, cookies, js, timings, mode="offline", database=database)
+
+def timings_ms(timings):
+    """Converte os tempos (segundos, possivelmente aninhados) para milissegundos"""
+    return {
+        phase: round(value * 1000, 3) if isinstance(value, float) else
+        timings_ms(value) if isinstance(value, dict) else value
+        for phase, value in timings.items()
+    }
+
+def detect_options(args):
+    """Valida as opções de uma detecção (query string do /detect ou corpo do POST /jobs)
+
+    Levanta ValueError com a mensagem para o cliente se alguma opção for inválida.
+    """
+    url = args.get('url')
+    if not url:
+        raise ValueError("URL parameter is required")
+
+    flag = lambda name: str(args.get(name, '')).lower() in ('1', 'true', 'yes')
+    options = {
+        "url": url,
+        "cookie": args.get('cookie', ''),
+        "cache_mode": args.get('cache', ''),
+        "render": flag('render'),
+        "assets": flag('assets')
+    }
+
+    # Crawl raso: depth sem max_pages usa o limite configurado; max_pages sem depth segue só os links da inicial
+    try:
+        options["timeout"] = int(args.get('timeout', 10))
+        options["depth"] = int(args.get('depth', 1 if 'max_pages' in args else 0))
+        options["max_pages"] = int(args.get('max_pages', CRAWL_MAX_PAGES))
+    except (TypeError, ValueError):
+        raise ValueError("timeout, depth and max_pages must be integers")
+
+    variant = 'render' if options["render"] else ''
+    options["crawl"] = options["depth"] > 0 and options["max_pages"] > 1
+    if options["crawl"]:
+        if not (options["depth"] <= CRAWL_MAX_DEPTH and options["max_pages"] <= CRAWL_MAX_PAGES):
+            raise ValueError(f"depth must be at most {CRAWL_MAX_DEPTH} and max_pages at most {CRAWL_MAX_PAGES}")
+        if options["render"]:
+            raise ValueError("depth/max_pages cannot be combined with render=true or debug=timings")
+        variant = f'crawl:{options["depth"]}:{options["max_pages"]}'
+    if options["assets"]:
+        variant = f'{variant}+assets' if variant else 'assets'
+    options["variant"] = variant
+
+    if options["cache_mode"] not in CACHE_MODES:
+        raise ValueError("cache parameter must be 'bypass' or 'refresh'")
+
+    if not isinstance(options["cookie"], str):
+        raise ValueError("cookie must be a string")
+
+    if options["render"] and options["assets"]:
+        raise ValueError("assets=true cannot be combined with render=true")
+
+    return options
+
+def detect_url(options, timings=None):
+    """Executa a detecção com as opções de detect_options; retorna (resultado, origem)
+
+    origem é 'HIT' (cache), 'MISS' ou 'COALESCED' (resultado de uma detecção idêntica em andamento).
+    Levanta TimeoutError se a espera pela detecção em andamento estourar.
+    """
+    url, cookie, cache_mode, variant = options["url"], options["cookie"], options["cache_mode"], options["variant"]
+    timeout = options["timeout"]
+
+    result = cached_result(url, cookie, cache_mode, variant) if timings is None else None
+    if result is not None:
+        return result, 'HIT'
+
+    def run():
+        if options["crawl"]:
+            result = crawl_site(url, options["depth"], options["max_pages"], timeout, cookie, options["assets"])
+        elif options["render"]:
+            start = time.perf_counter()
+            page = render_page(url, timeout, cookie)
+            METRICS.phases.observe(time.perf_counter() - start, phase="render")
+            if timings is not None:
+                timings["render"] = time.perf_counter() - start
+            result = analyze_rendered(url, page, timings)
+        else:
+            previous = previous_fetch(url, cookie, cache_mode, variant) if timings is None else None
+            response = fetch_page(url, timeout, cookie, conditional_headers(previous))
+            result = analyze_fetched(url, cookie, cache_mode, response, previous, timings, options["assets"])
+
+        # Crawl interrompido pelo prazo é parcial: não vai para o cache
+        if not result.get("crawl", {}).get("budget_exceeded"):
+            store_result(url, cookie, cache_mode, result, variant)
+        return result
+
+    if timings is not None:
+        return run(), 'MISS'
+
+    # Quem chega com a mesma URL e opções espera a detecção em andamento até o prazo do líder (não o
+    # próprio timeout, que só vale para o download de quem executa); refresh/bypass não pegam carona
+    # numa detecção comum, e vice-versa
+    if options["crawl"]:
+        wait = CRAWL_BUDGET
+    elif options["render"]:
+        wait = RENDER_TIMEOUT
+    else:
+        wait = FETCH_DEADLINE + (ASSET_DEADLINE if options["assets"] else 0)
+    result, shared = INFLIGHT.do((cache_mode, cache_key(url, cookie, variant)), run, wait)
+    return result, 'COALESCED' if shared else 'MISS'
+
 @app.route('/detect', methods=['GET'])
 def detect():
-    url = request.args.get('url')
-    timeout = int(request.args.get('timeout', 10))
-    cookie = request.args.get('cookie', '')
-    
-    if not url:
-        return jsonify({"error": "URL parameter is required"}), 400
-    
+    # debug=timings: detecção completa (sem cache nem revalidação), com os tempos de cada fase na resposta
+    timings = {} if 'timings' in request.args.get('debug', '').split(',') else None
+
     try:
-        # Configurar headers
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        }
-        
-        # Adicionar cookies se fornecidos
-        if cookie:
-            headers['Cookie'] = cookie
-            
-        # Fazer a requisição
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        
-        # Preparar BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Detectar tecnologias
-        technologies = detect_technologies(response.text, url, response.headers, soup)
-        
-        # Montar resultado
-        result = {
-            "url": url,
-            "technologies": technologies
+        options = detect_options(request.args)
+        if options["crawl"] and timings is not None:
+            raise ValueError("depth/max_pages cannot be combined with render=true or debug=timings")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    url = options["url"]
+    try:
+        result, source = detect_url(options, timings)
+    except TimeoutError as e:
+        return jsonify({"error": str(e), "url": url}), 504
+    except BrowserUnavailable as e:
+        # Playwright ou Chromium ausentes: falha do servidor, não da página
+        return jsonify(error_result(url, e)), 503
+    except Exception as e:
+        return jsonify(error_result(url, e)), 500
+
+    if timings is not None:
+        result = dict(result, timings=timings_ms(timings))
+    response = jsonify(result)
+    response.headers['X-Cache'] = 'HIT' if source == 'HIT' else 'MISS'
+    if source == 'COALESCED':
+        response.headers['X-Coalesced'] = 'true'
+    return response
+
+def run_job(params):
+    """Executa um job da fila com as mesmas opções e cache do /detect"""
+    url = params.get("url")
+    try:
+        result, _ = detect_url(detect_options(params))
+    except Exception as e:
+        return error_result(url, e)
+    return result
+
+JOBS = JobScheduler(JOBS_PATH, run_job)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Enfileira uma detecção e retorna o id do job na hora (202); o resultado sai em GET /jobs/<id>"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+
+    params = {key: payload[key] for key in JOB_PARAMS if key in payload}
+    try:
+        options = detect_options(params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    callback_url = payload.get('callback_url')
+    if callback_url is not None and (not isinstance(callback_url, str)
+                                     or urlparse(callback_url).scheme not in ('http', 'https')):
+        return jsonify({"error": "callback_url must be an http(s) URL"}), 400
+
+    try:
+        job_id = JOBS.store.create(params, urlparse(options["url"]).hostname or '', callback_url)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    JOBS.notify()
+
+    response = jsonify({"id": job_id, "status": "queued", "url": options["url"]})
+    response.headers['Location'] = f'/jobs/{job_id}'
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = JOBS.store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route('/analyze', methods=['POST'])
+def analyze_endpoint():
+    """Detecta tecnologias num HTML enviado pelo cliente, sem acessar a rede"""
+    timings = {} if 'timings' in request.args.get('debug', '').split(',') else None
+
+    # O JSON pode ocupar mais que o HTML (escapes, base64): folga de 2x sobre o limite
+    body = request.get_data(cache=False)
+    try:
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = gunzip(body, ANALYZE_MAX_BYTES * 2)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    except zlib.error:
+        return jsonify({"error": "Invalid gzip body"}), 400
+
+    if len(body) > ANALYZE_MAX_BYTES * 2:
+        return jsonify({"error": f"Request body exceeds {ANALYZE_MAX_BYTES * 2} bytes"}), 413
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return jsonify({"error": "JSON object body is required"}), 400
+
+    url = payload.get('url', '')
+    headers = payload.get('headers') or {}
+    cookies = payload.get('cookies')
+    if not isinstance(url, str) or not isinstance(headers, (dict, list)) \
+            or not (cookies is None or isinstance(cookies, dict)):
+        return jsonify({"error": "url must be a string, headers an object or list of pairs, cookies an object"}), 400
+
+    # html em texto ou html_base64 (bytes da página, gzip aceito e descompactado só em analyze)
+    try:
+        if 'html_base64' in payload:
+            html = base64.b64decode(payload['html_base64'], validate=True)
+        else:
+            html = payload.get('html')
+            if not isinstance(html, str):
+                return jsonify({"error": "JSON body with 'html' or 'html_base64' is required"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"html_base64: {e}"}), 400
+
+    # Mesmo limite do download: o excedente é descartado e o resultado sai marcado
+    html, truncated = truncate_html(html, ANALYZE_MAX_BYTES)
+
+    try:
+        result = analyze(html, headers, cookies, url, timings=timings, max_bytes=ANALYZE_MAX_BYTES)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413 if "exceeds" in str(e) else 400
+    except zlib.error as e:
+        return jsonify({"error": f"html_base64: invalid gzip ({e})"}), 400
+
+    result["truncated"] = truncated
+    if truncated:
+        result["truncation_reason"] = "max_bytes"
+        result["bytes_analyzed"] = ANALYZE_MAX_BYTES
+    if timings is not None:
+        result["timings"] = timings_ms(timings)
+    return jsonify(result)
+
+def scan_batch(urls, timeout=10, cookie='', cache_mode='', assets=False):
+    """Baixa e analisa várias URLs em paralelo, gerando os resultados na ordem em que terminam"""
+    variant = 'assets' if assets else ''
+    # Os downloads rodam no loop do FETCHER, limitados no total e por host
+    global_limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+    host_limits = {}
+
+    async def scan(url):
+        # Cache e validadores podem estar em disco (SQLite): as consultas bloqueantes rodam fora do loop.
+        # Qualquer falha (inclusive URL inválida na chave do cache) vira o resultado de erro desta URL.
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(None, cached_result, url, cookie, cache_mode, variant)
+            if result is not None:
+                return result
+
+            host = urlparse(url).netloc.lower()
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(BATCH_PER_HOST))
+            previous = await loop.run_in_executor(None, previous_fetch, url, cookie, cache_mode, variant)
+            async with host_limit, global_limit:
+                response = await FETCHER.fetch_async(url, timeout, cookie, conditional_headers(previous))
+            result = await asyncio.wrap_future(
+                DETECT_POOL.submit(analyze_fetched, url, cookie, cache_mode, response, previous, None, assets))
+            await loop.run_in_executor(None, store_result, url, cookie, cache_mode, result, variant)
+        except Exception as e:
+            return error_result(url, e)
+        return result
+
+    futures = [FETCHER.submit(scan(url)) for url in urls]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Cliente desconectou: cancelar as URLs que ainda não terminaram
+        for future in futures:
+            future.cancel()
+
+# Links <a href> das páginas do crawl (a extração normal só olha script/style/meta/link)
+LINK_RE = re.compile(r"""<a\s[^>]*?href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+# Links que certamente não são páginas HTML
+CRAWL_SKIP_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".pdf", ".zip", ".gz", ".mp3", ".mp4",
+    ".webm", ".avi", ".mov", ".css", ".js", ".json", ".xml", ".txt", ".woff", ".woff2", ".ttf", ".exe", ".dmg"
+)
+
+def url_origin(url):
+    parsed = urlparse(url)
+    return parsed.scheme, parsed.netloc
+
+def same_origin_links(html, base_url, origins):
+    """Links da página para outras páginas da mesma origem, normalizados e na ordem em que aparecem"""
+    links = []
+    for match in LINK_RE.finditer(html):
+        href = next(group for group in match.groups() if group is not None).strip()
+        if not href or href.startswith(("#", "mailto:", "tel:", "javascript:", "data:")):
+            continue
+        link = normalize_url(urljoin(base_url, href))
+        if url_origin(link) in origins and not urlparse(link).path.lower().endswith(CRAWL_SKIP_EXTENSIONS):
+            links.append(link)
+    return links
+
+def crawl_key(url):
+    """Chave de deduplicação do crawl: /docs e /docs/ costumam ser a mesma página"""
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(path=parts.path.rstrip('/') or '/'))
+
+def merge_technologies(merged, technologies):
+    """Acrescenta as detecções de uma página, mantendo a maior confiança e a versão encontrada"""
+    for name, info in technologies.items():
+        current = merged.get(name)
+        if current is None:
+            merged[name] = dict(info, matched_patterns=list(info["matched_patterns"]))
+            continue
+
+        current["confidence"] = max(current["confidence"], info["confidence"])
+        if not current["version"] and info["version"]:
+            current["version"] = info["version"]
+        current["matched_patterns"].extend(pattern for pattern in info["matched_patterns"]
+                                           if pattern not in current["matched_patterns"])
+
+async def crawl_async(url, depth, max_pages, timeout=10, cookie='', assets=False, budget=CRAWL_BUDGET):
+    """Crawl em largura das páginas da mesma origem, juntando as detecções de todas
+
+    Cada URL e cada script (externo ou inline) é avaliado uma única vez; ao fim do
+    prazo total as páginas pendentes são abandonadas e o resultado sai marcado.
+    """
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + budget
+    start = time.perf_counter()
+    start_url = normalize_url(url)
+    seen = {crawl_key(start_url)}
+    seen_scripts = set()
+    origins = {url_origin(start_url)}
+    limit = asyncio.Semaphore(CRAWL_CONCURRENCY)
+    merged = {}
+    pages = []
+    version = DATABASE.version
+    budget_exceeded = False
+    regex_budget_exceeded = False
+
+    async def visit(page_url):
+        async with limit:
+            remaining = expires - loop.time()
+            if remaining <= 0:
+                raise TimeoutError
+            response = await FETCHER.fetch_async(page_url, timeout, cookie, deadline=min(FETCH_DEADLINE, remaining))
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and 'html' not in content_type.lower():
+            return response, None
+        result = await asyncio.wrap_future(DETECT_POOL.submit(
+            analyze_page, response.url, response.text, response.headers, response.cookies,
+            mode="crawl", seen_scripts=seen_scripts, assets=assets))
+        return response, result
+
+    frontier = [start_url]
+    for level in range(depth + 1):
+        tasks = [(page_url, asyncio.ensure_future(visit(page_url))) for page_url in frontier[:max_pages - len(pages)]]
+        frontier = []
+        try:
+            async with asyncio.timeout_at(expires):
+                for page_url, task in tasks:
+                    try:
+                        response, result = await task
+                    except TimeoutError:
+                        raise
+                    except Exception as e:
+                        pages.append({"url": page_url, "error": str(e)})
+                        continue
+
+                    page = {"url": page_url, "status_code": response.status_code}
+                    if result is None:
+                        page["skipped"] = "not_html"
+                    else:
+                        page["technologies"] = len(result["technologies"])
+                        merge_technologies(merged, result["technologies"])
+                        version = result["fingerprints_version"]
+                        regex_budget_exceeded |= bool(result.get("regex_budget_exceeded"))
+                        if response.truncated:
+                            page["truncated"] = response.truncated
+                    pages.append(page)
+
+                    # Redirect na página inicial (http -> https, www) muda a origem aceita
+                    if level == 0:
+                        origins.add(url_origin(normalize_url(response.url)))
+                    if level < depth and result is not None:
+                        for link in same_origin_links(response.text, response.url, origins):
+                            if crawl_key(link) not in seen:
+                                seen.add(crawl_key(link))
+                                frontier.append(link)
+        except TimeoutError:
+            budget_exceeded = True
+            for _, task in tasks:
+                task.cancel()
+            break
+
+        if not frontier or len(pages) >= max_pages:
+            break
+
+    if not any("technologies" in page for page in pages):
+        # Nenhuma página analisada: o erro da página inicial vale para o crawl todo
+        raise RuntimeError(pages[0].get("error", "no HTML page could be analyzed") if pages else "crawl budget exceeded")
+
+    result = {
+        "url": url,
+        "technologies": merged,
+        "fingerprints_version": version,
+        "crawl": {
+            "depth": depth,
+            "max_pages": max_pages,
+            "pages": pages,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            "budget_exceeded": budget_exceeded
         }
-        
-        return jsonify(result)
-    
-    except requests.exceptions.RequestException as e:
-        return jsonify({
-            "error": f"Request error: {str(e)}",
-            "url": url
-        }), 500
+    }
+    if regex_budget_exceeded:
+        result["regex_budget_exceeded"] = True
+    return result
+
+def crawl_site(url, depth, max_pages, timeout=10, cookie='', assets=False):
+    """Versão síncrona de crawl_async para as rotas do Flask"""
+    return FETCHER.submit(crawl_async(url, depth, max_pages, timeout, cookie, assets)).result()
+
+@app.route('/detect/batch', methods=['POST'])
+def detect_batch():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "JSON object body with a non-empty 'urls' list is required"}), 400
+
+    urls = payload.get('urls')
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url for url in urls):
+        return jsonify({"error": "JSON body with a non-empty 'urls' list is required"}), 400
+
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({"error": f"At most {BATCH_MAX_URLS} URLs per batch"}), 400
+
+    # Mesmas regras do /detect; as opções valem para todas as URLs do lote
+    try:
+        options = detect_options(dict(payload, url=urls[0]))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if options["render"] or options["crawl"]:
+        return jsonify({"error": "render and depth/max_pages are not supported in batches"}), 400
+    timeout, cookie, cache_mode, assets = options["timeout"], options["cookie"], options["cache_mode"], options["assets"]
+
+    def generate():
+        for result in scan_batch(urls, timeout, cookie, cache_mode, assets):
+            yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    # Desativado sem ADMIN_TOKEN; com vários workers, prefira FINGERPRINTS_WATCH_INTERVAL
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoint disabled (set ADMIN_TOKEN)"}), 404
+
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return jsonify({"error": "Invalid admin token"}), 403
+
+    try:
+        previous_version, database = reload_database()
     except Exception as e:
-        return jsonify({
-            "error": str(e),
-            "url": url
-        }), 500
+        logger.error(f"Erro ao recarregar a base de fingerprints: {str(e)}")
+        return jsonify({"error": f"Reload failed: {str(e)}", "version": DATABASE.version}), 500
+
+    return jsonify({
+        "status": "reloaded" if database.version != previous_version else "unchanged",
+        "previous_version": previous_version,
+        "version": database.version,
+        "technologies_count": len(database.patterns)
+    })
+
+def process_metrics():
+    """Contadores e gauges deste processo que vivem fora do METRICS (cache, coalescência, regex)"""
+    extra = [("wappalyzer_fingerprints_info", "Versão ativa da base de fingerprints", "gauge", 1,
+              {"version": DATABASE.version, "source": DATABASE.source})]
+    if RESULT_CACHE is not None:
+        stats = RESULT_CACHE.stats()
+        extra.append(("wappalyzer_cache_hits_total", "Acertos do cache de resultados", "counter", stats["hits"], {}))
+        extra.append(("wappalyzer_cache_misses_total", "Faltas do cache de resultados", "counter", stats["misses"], {}))
+    for kind, count in REVALIDATION_STATS.items():
+        extra.append((f"wappalyzer_revalidation_{kind}_total", "Revalidações que reaproveitaram o resultado",
+                      "counter", count, {}))
+
+    inflight = INFLIGHT.stats()
+    extra.append(("wappalyzer_coalesced_total", "Requisições /detect que aproveitaram uma detecção idêntica em andamento",
+                  "counter", inflight["coalesced"], {}))
+
+    guard = GUARD.stats()
+    extra.append(("wappalyzer_regex_timeouts_total", "Buscas de regex interrompidas por timeout", "counter",
+                  guard["timeouts"], {}))
+    extra.append(("wappalyzer_regex_budget_exceeded_total", "Detecções que esgotaram o orçamento de regex", "counter",
+                  guard["budget_exceeded"], {}))
+    extra.append(("wappalyzer_regex_quarantined", "Padrões em quarentena (maior valor entre os workers)", "gauge",
+                  len(guard["quarantined"]), {}))
+    return extra
+
+METRICS.register(process_metrics)
+
+@app.route('/metrics')
+def metrics():
+    # Métricas de todos os workers no formato de texto do Prometheus
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+def create_app():
+    """Retorna a aplicação WSGI já com os padrões compilados (usada pelo gunicorn)"""
+    # Com preload_app, roda no mestre: os workers herdam as regexes compiladas via copy-on-write
+    DATABASE.compile_all()
+    logger.info(f"Aplicação pronta: {len(DATABASE.patterns)} tecnologias compiladas.")
+    return app
+
+def start_background():
+    """Sobe as threads de fundo no processo que atende requisições (post_fork do gunicorn ou servidor de desenvolvimento)
+
+    Nunca no mestre do gunicorn: uma base recarregada lá não chegaria aos workers já criados.
+    """
+    DATABASE_WATCHER.start()
+    JOBS.start()
+    METRICS.start()
 
 if __name__ == '__main__':
+    # Servidor de desenvolvimento; em produção use: gunicorn -c gunicorn.conf.py 'app:create_app()'
     port = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=port)
+    application = create_app()
+    start_background()
+    application.run(host='0.0.0.0', port=port)
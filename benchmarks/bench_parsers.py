@@ -0,0 +1,85 @@
+"""Benchmark dos backends de parser HTML sobre um corpus de páginas salvas.
+
+Uso:
+    python benchmarks/bench_parsers.py [--pages diretório | --synthetic] [--repeat N]
+
+Compara a árvore completa do BeautifulSoup (comportamento original) com
+cada backend de parsers.py instalado, no tempo e nos elementos extraídos de
+cada página. Sem --pages, usa o corpus de benchmarks/corpus; --synthetic mede
+uma única página sintética grande.
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+logging.disable(logging.CRITICAL)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import parsers  # noqa: E402
+from bench_prefilter import synthetic_page  # noqa: E402
+from fixture_server import CORPUS_DIR  # noqa: E402
+
+
+def full_soup(html):
+    """Árvore completa com html.parser, como o detect() fazia originalmente"""
+    return parsers.parse_soup(BeautifulSoup(html, 'html.parser'))
+
+
+def best_time(function, pages, repeat):
+    """Melhor tempo total de function sobre todas as páginas"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            function(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def summary(elements):
+    """Valores extraídos (não só as contagens), para conferir cada backend contra a árvore completa"""
+    return (elements.script_srcs, elements.scripts, elements.styles, elements.metas, elements.links)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=CORPUS_DIR, help="diretório com páginas .html salvas")
+    parser.add_argument("--synthetic", action="store_true", help="usar uma página sintética em vez do corpus")
+    parser.add_argument("--page-size", type=int, default=1_000_000, help="tamanho da página sintética em bytes")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        pages = [synthetic_page(args.page_size)]
+    else:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages, "*.html"))):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+        if not pages:
+            parser.error(f"nenhuma página .html em {args.pages}")
+
+    print(f"Páginas: {len(pages)} ({sum(len(html) for html in pages) / 1_000_000:.2f} MB)")
+    print(f"Backends instalados: {', '.join(parsers.available_backends())}")
+
+    reference = [summary(full_soup(html)) for html in pages]
+    baseline = best_time(full_soup, pages, args.repeat)
+    print(f"{'bs4 árvore completa':<22} {baseline * 1000:9.1f} ms   1.0x")
+
+    for backend in parsers.available_backends():
+        def run(html, backend=backend):
+            return parsers.parse_html(html, backend)
+
+        elapsed = best_time(run, pages, args.repeat)
+        different = sum(summary(run(html)) != expected for html, expected in zip(pages, reference))
+        note = f"   ({different} página(s) com elementos diferentes da árvore completa)" if different else ""
+        print(f"{backend:<22} {elapsed * 1000:9.1f} ms {baseline / elapsed:5.1f}x{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark do pré-filtro de literais contra o laço original de regex por padrão.
+
+Uso:
+    python benchmarks/bench_prefilter.py [--technologies arquivo.json] [--pages diretório] [--repeat N]
+
+Sem --technologies, a base local é ampliada com tecnologias sintéticas para
+simular o technologies.json completo do Wappalyzer.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+logging.disable(logging.CRITICAL)
+
+import app  # noqa: E402
+
+
+def synthetic_technologies(count, seed=42):
+    """Gera tecnologias sintéticas com padrões html/text/scripts/css realistas"""
+    rng = random.Random(seed)
+    with open(app.TECHNOLOGIES_PATH, "r", encoding="utf-8") as f:
+        technologies = json.load(f)
+
+    for i in range(count):
+        name = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+        technologies[f"Synthetic {i}"] = {
+            "cats": [rng.randint(1, 100)],
+            "html": [f"<link[^>]+{name}(?:\\.min)?\\.css", f"<div[^>]+id=[\"']{name}-root"],
+            "text": f"powered by {name}",
+            "scripts": f"{name}\\.init\\(([\\d.]+)\\)\\;version:\\1",
+            "css": f"\\.{name}-widget",
+        }
+
+    return technologies
+
+
+def synthetic_page(size, seed=7):
+    """Gera uma página HTML grande sem relação com os padrões sintéticos"""
+    rng = random.Random(seed)
+    chunks = ["<html><head><script src=\"/wp-includes/js/jquery.min.js\"></script></head><body>"]
+    total = 0
+
+    while total < size:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+        chunk = f"<div class=\"{word}\"><a href=\"/{word}\">{word}</a></div>\n"
+        chunks.append(chunk)
+        total += len(chunk)
+
+    chunks.append("</body></html>")
+    return "".join(chunks)
+
+
+def load_database(technologies):
+    """Recompila a base de fingerprints do app a partir de um dicionário de tecnologias"""
+    app.DATABASE = app.compile_database(technologies, "benchmark")
+
+
+def time_detection(evidences, repeat):
+    """Retorna o melhor tempo total de detecção e os resultados da última rodada"""
+    best = float("inf")
+    results = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [app.detect_technologies(None, evidence.url, {}, evidence=evidence) for evidence in evidences]
+        best = min(best, time.perf_counter() - start)
+
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--technologies", help="arquivo technologies.json (ex.: o conjunto completo do Wappalyzer)")
+    parser.add_argument("--synthetic", type=int, default=3000, help="tecnologias sintéticas adicionadas sem --technologies")
+    parser.add_argument("--pages", help="diretório com páginas .html salvas")
+    parser.add_argument("--page-size", type=int, default=500_000, help="tamanho da página sintética em bytes")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.technologies:
+        with open(args.technologies, "r", encoding="utf-8") as f:
+            technologies = json.load(f)
+    else:
+        technologies = synthetic_technologies(args.synthetic)
+
+    if args.pages:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages, "*.html"))):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    else:
+        pages = [synthetic_page(args.page_size)]
+
+    start = time.perf_counter()
+    load_database(technologies)
+    print(f"Compilação: {len(app.DATABASE.patterns)} tecnologias, {len(app.DATABASE.prefilter.literals)} literais "
+          f"em {time.perf_counter() - start:.2f}s")
+
+    evidences = [app.PageEvidence(html, "https://example.com/", {}) for html in pages]
+    size = sum(len(html) for html in pages)
+    print(f"Páginas: {len(pages)} ({size / 1_000_000:.2f} MB)")
+
+    prefilter = app.DATABASE.prefilter
+    with_prefilter, results = time_detection(evidences, args.repeat)
+
+    app.DATABASE.prefilter = None
+    without_prefilter, baseline = time_detection(evidences, args.repeat)
+    app.DATABASE.prefilter = prefilter
+
+    if results != baseline:
+        print("ERRO: resultados diferentes com e sem pré-filtro")
+        sys.exit(1)
+
+    print(f"Laço original:   {without_prefilter * 1000:.1f} ms")
+    print(f"Com pré-filtro:  {with_prefilter * 1000:.1f} ms")
+    print(f"Ganho:           {without_prefilter / with_prefilter:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark de inicialização: technologies.json + compilação contra o artefato pré-compilado.
+
+Uso:
+    python benchmarks/bench_startup.py [--technologies arquivo.json] [--synthetic N] [--repeat N]
+
+Mede o tempo até a base ficar pronta como no create_app (carga mais compile_all
+de todas as regexes) e o da primeira detecção, e confere que os dois caminhos
+detectam exatamente as mesmas tecnologias.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_prefilter import app, synthetic_page, synthetic_technologies  # noqa: E402
+
+
+def cold_load(source, artifact_path, page):
+    """Carrega a base do zero (sem cache de regex do módulo re), compila como o create_app e roda uma detecção"""
+    re.purge()
+    start = time.perf_counter()
+    database = app.load_database(source, artifact_path)
+    database.compile_all()
+    ready = time.perf_counter() - start
+
+    evidence = app.PageEvidence(page, "https://example.com/", {})
+    result = app.detect_technologies(None, evidence.url, {}, evidence=evidence, database=database)
+    first = time.perf_counter() - start
+
+    return ready, first, database, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--technologies", help="arquivo technologies.json (ex.: o conjunto completo do Wappalyzer)")
+    parser.add_argument("--synthetic", type=int, default=3000, help="tecnologias sintéticas adicionadas sem --technologies")
+    parser.add_argument("--page-size", type=int, default=200_000, help="tamanho da página sintética em bytes")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.technologies:
+        with open(args.technologies, "r", encoding="utf-8") as f:
+            technologies = json.load(f)
+    else:
+        technologies = synthetic_technologies(args.synthetic)
+
+    page = synthetic_page(args.page_size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "technologies.json")
+        artifact_path = os.path.join(directory, "technologies.compiled.json")
+        with open(source, "w", encoding="utf-8") as f:
+            json.dump(technologies, f)
+
+        database = app.load_database(source, None)
+        with open(artifact_path, "w", encoding="utf-8") as f:
+            json.dump(app.database_to_artifact(database), f, separators=(",", ":"))
+
+        print(f"Base: {len(database.patterns)} tecnologias "
+              f"({os.path.getsize(source) / 1024:.0f} KiB JSON, {os.path.getsize(artifact_path) / 1024:.0f} KiB artefato)")
+
+        timings = {}
+        results = {}
+        for label, path in (("JSON + compilação", None), ("Artefato", artifact_path)):
+            runs = [cold_load(source, path, page) for _ in range(args.repeat)]
+            timings[label] = (min(run[0] for run in runs), min(run[1] for run in runs))
+            results[label] = runs[-1][3]
+            if runs[-1][2].source != ("artifact" if path else "json"):
+                print(f"ERRO: {label} não carregou pelo caminho esperado")
+                sys.exit(1)
+
+    if results["JSON + compilação"] != results["Artefato"]:
+        print("ERRO: resultados diferentes entre JSON e artefato")
+        sys.exit(1)
+
+    for label, (ready, first) in timings.items():
+        print(f"{label:<18} pronta em {ready * 1000:8.1f} ms, primeira detecção em {first * 1000:8.1f} ms")
+
+    json_ready = timings["JSON + compilação"][0]
+    artifact_ready = timings["Artefato"][0]
+    print(f"Ganho na inicialização: {json_ready / artifact_ready:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
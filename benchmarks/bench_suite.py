@@ -0,0 +1,493 @@
+"""Suíte de benchmark e carga do pipeline de detecção, com baseline para comparação.
+
+Uso:
+    python benchmarks/bench_suite.py [--only startup,detection,throughput] [--output resultados.json]
+    python benchmarks/bench_suite.py --save-baseline     # grava benchmarks/baseline.json
+    python benchmarks/bench_suite.py --compare           # compara com benchmarks/baseline.json
+    python benchmarks/bench_suite.py --runs 5 --compare  # mais execuções, limites mais justos
+
+Mede:
+    startup     "import app" e create_app() num processo novo até a base ficar pronta, a primeira detecção e o pico de RSS
+    detection   latência por página do corpus com app.analyze (p50/p90/p99) e o pico de memória alocada
+    throughput  /detect de ponta a ponta num gunicorn local contra o fixture_server.py, em cada cenário
+                (páginas do corpus, servidor lento, página grande e resposta em chunks)
+
+O corpus (benchmarks/corpus) guarda páginas salvas com os cabeçalhos originais e as
+tecnologias esperadas no manifest.json; a suíte falha se a detecção mudar.
+
+Cada seção roda --runs vezes; os resultados são a mediana das execuções e o ruído de
+cada métrica (desvio absoluto mediano relativo à mediana) fica em "noise". Na comparação
+só entram a mediana da detecção, o tempo de import, a vazão e a memória (percentis altos,
+máximos e a latência sob carga, que acompanha a vazão, são informativos). Antes de cada seção
+uma carga fixa de CPU mede a velocidade da máquina ("calibration_ms"), e os tempos de startup
+e detection do baseline são escalados por ela antes da comparação. Uma métrica conta
+como regressão se piorar mais que o maior entre --tolerance e três vezes o ruído somado do
+baseline e da execução atual, e o script sai com código 1. Os números só são comparáveis na
+mesma máquina: o baseline guarda CPU, memória e sistema, e com máquina diferente a
+comparação é só informativa.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+logging.disable(logging.CRITICAL)
+
+import httpx  # noqa: E402
+
+import app  # noqa: E402
+from fixture_server import load_corpus, start_fixture_server  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+SECTIONS = ('startup', 'detection', 'throughput')
+MB = 1024 * 1024
+
+# Quantas vezes o ruído medido cabe no limite de uma métrica antes de contar como regressão
+NOISE_FACTOR = 3
+
+# Seções limitadas pela CPU de um processo, comparadas já descontada a velocidade da máquina
+CALIBRATED_SECTIONS = ('startup', 'detection')
+
+# Cenários de carga: sufixo aplicado às páginas do corpus, ou rota própria do fixture server
+SCENARIOS = {
+    "corpus": "",
+    "slow": "delay=0.2",
+    "chunked": "chunks=16&interval=0.01",
+    "large": "/large?size=2000000",
+}
+
+STARTUP_SCRIPT = """
+import json, logging, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+logging.disable(logging.CRITICAL)
+import app
+app.create_app()
+ready = time.perf_counter() - start
+app.analyze("<html><head><script src='/js/jquery.min.js'></script></head></html>")
+first = time.perf_counter() - start
+# No Linux o ru_maxrss herda o pico do processo que chamou o exec; o VmHWM é só deste processo
+try:
+    with open("/proc/self/status") as f:
+        maxrss = int(next(line for line in f if line.startswith("VmHWM:")).split()[1])
+except (OSError, StopIteration):
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"ready": ready, "first": first, "maxrss_kb": maxrss}}))
+"""
+
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def percentile(values, p):
+    """Percentil pelo método nearest-rank"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def latency_summary(seconds):
+    return {
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p90_ms": percentile(seconds, 90) * 1000,
+        "p99_ms": percentile(seconds, 99) * 1000,
+        "max_ms": max(seconds) * 1000,
+    }
+
+
+def calibrate(repeat=3):
+    """Tempo (ms) de uma carga fixa de CPU em Python: a velocidade da máquina naquele momento"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        values = [(i * 7919) % 10007 for i in range(400_000)]
+        json.loads(json.dumps(sorted(values)))
+        " ".join(map(str, values)).split()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_startup(repeat, env):
+    """Sobe processos novos que importam o app; reporta a mediana de cada medida"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT.format(root=ROOT)], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        wall = time.perf_counter() - start
+        runs.append(dict(json.loads(output.strip().splitlines()[-1]), wall=wall))
+
+    return {
+        "import_ms": median([run["ready"] for run in runs]) * 1000,
+        "first_detection_ms": median([run["first"] for run in runs]) * 1000,
+        "process_ms": median([run["wall"] for run in runs]) * 1000,
+        "peak_rss_mb": median([run["maxrss_kb"] for run in runs]) / 1024,
+    }
+
+
+def bench_detection(pages, repeat):
+    """Latência de app.analyze sobre o corpus; sai com erro se alguma página mudar de resultado"""
+    for page in pages:
+        result = app.analyze(page["html"], page["headers"], url=page["url"])
+        if sorted(result["technologies"]) != page["expected"]:
+            print(f"ERRO: {page['file']} detectou {sorted(result['technologies'])}, esperado {page['expected']}")
+            sys.exit(1)
+
+    latencies = []
+    per_page = {page["file"]: [] for page in pages}
+    for _ in range(repeat):
+        for page in pages:
+            start = time.perf_counter()
+            app.analyze(page["html"], page["headers"], url=page["url"])
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            per_page[page["file"]].append(elapsed)
+
+    # Pico de memória Python alocada durante uma passada pelo corpus
+    tracemalloc.start()
+    for page in pages:
+        app.analyze(page["html"], page["headers"], url=page["url"])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return dict(latency_summary(latencies),
+                pages=len(pages),
+                corpus_mb=sum(len(page["html"].encode("utf-8")) for page in pages) / MB,
+                pages_per_s=len(latencies) / sum(latencies),
+                alloc_peak_mb=peak / MB,
+                per_page_p50={name: percentile(values, 50) * 1000 for name, values in per_page.items()})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_peak_mb(pid):
+    """Soma do pico de RSS (VmHWM) do processo e dos filhos; None fora do Linux
+
+    Páginas compartilhadas por copy-on-write entram uma vez por processo: é um limite superior.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            peak = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except (OSError, StopIteration):
+        return None
+    return peak / 1024 + sum(process_tree_peak_mb(child) or 0 for child in children)
+
+
+def scenario_targets(name, base, pages):
+    suffix = SCENARIOS[name]
+    if suffix.startswith("/"):
+        return [base + suffix]
+    return [f"{base}/corpus/{page['file']}" + (f"?{suffix}" if suffix else "") for page in pages]
+
+
+def run_load(client, server, targets, requests, concurrency):
+    """Dispara requests /detect com concurrency clientes; cada URL é única para não cair na coalescência"""
+    def one(i):
+        target = targets[i % len(targets)]
+        target += ("&" if "?" in target else "?") + f"n={i}"
+        start = time.perf_counter()
+        try:
+            response = client.get(f"{server}/detect", params={"url": target, "cache": "bypass", "timeout": 30})
+            ok = response.status_code == 200 and "error" not in response.json()
+        except httpx.HTTPError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return dict(latency_summary([latency for latency, _ in results]),
+                requests=requests,
+                errors=sum(1 for _, ok in results if not ok),
+                rps=requests / elapsed)
+
+
+def bench_throughput(pages, requests, concurrency, workers, env):
+    """Sobe o fixture server e um gunicorn local e mede o /detect em cada cenário"""
+    fixtures, base = start_fixture_server(pages)
+    port = free_port()
+    server = f"http://127.0.0.1:{port}"
+    env = dict(env, PORT=str(port), GUNICORN_WORKERS=str(workers))
+
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:create_app()"],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        with httpx.Client(limits=limits, timeout=60) as client:
+            while True:
+                if process.poll() is not None:
+                    print("ERRO: o gunicorn terminou antes de ficar pronto")
+                    sys.exit(1)
+                try:
+                    if client.get(f"{server}/status").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.05)
+            results = {"server_ready_ms": (time.perf_counter() - start) * 1000, "workers": workers,
+                       "concurrency": concurrency}
+
+            for name in SCENARIOS:
+                targets = scenario_targets(name, base, pages)
+                run_load(client, server, targets, concurrency, concurrency)
+                results[name] = run_load(client, server, targets, requests, concurrency)
+
+            results["server_peak_rss_mb"] = process_tree_peak_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(10)
+        fixtures.shutdown()
+
+    return results
+
+
+def environment():
+    """Máquina e sistema em que os números foram medidos"""
+    cpu_model = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu_model = next(line.split(":", 1)[1].strip() for line in f if line.startswith("model name"))
+    except (OSError, StopIteration):
+        pass
+
+    try:
+        memory_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // MB
+    except (AttributeError, OSError, ValueError):
+        memory_mb = None
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "arch": platform.machine(),
+        "cpu_model": cpu_model,
+        "cpus": os.cpu_count(),
+        "usable_cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+        "memory_mb": memory_mb,
+    }
+
+
+def build():
+    """Base de fingerprints, parser e motor de regex medidos (mudam com o código, não com a máquina)"""
+    return {
+        "technologies": len(app.DATABASE.patterns),
+        "fingerprints_version": app.DATABASE.version,
+        "html_parser": app.PARSER_BACKEND,
+        "regex_engine": app.GUARD.stats()["engine"],
+    }
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+def summarize_runs(runs, prefix="", noise=None):
+    """Mediana de cada métrica entre as execuções e o ruído relativo (desvio absoluto mediano / mediana)"""
+    noise = {} if noise is None else noise
+    summary = {}
+    for key, value in runs[0].items():
+        values = [run.get(key) for run in runs]
+        if isinstance(value, dict):
+            summary[key] = summarize_runs(values, f"{prefix}{key}.", noise)[0]
+        elif all(v == value for v in values) or not all(isinstance(v, (int, float)) for v in values):
+            summary[key] = value
+        else:
+            middle = summary[key] = median(values)
+            if middle:
+                noise[prefix + key] = median([abs(v - middle) for v in values]) / abs(middle)
+    return summary, noise
+
+
+def better_direction(key):
+    """'lower' para tempos e memória, 'higher' para vazão; None para o que não é comparado
+
+    Percentis altos, máximos, o p50 de cada página e os tempos derivados (primeira detecção,
+    processo, servidor pronto, latência sob carga) são só informativos: variam demais entre execuções.
+    """
+    section = key.split(".")[0]
+    if section not in SECTIONS or key == "detection.corpus_mb" or ".per_page_p50." in key:
+        return None
+    if key.endswith("_ms") and key not in ("startup.import_ms", "detection.p50_ms"):
+        return None
+    if key.endswith(("_ms", "_mb")):
+        return "lower"
+    if key.endswith(("rps", "_per_s")):
+        return "higher"
+    return None
+
+
+def changed_keys(old, new):
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+
+def compare(results, baseline, tolerance):
+    """Imprime a variação de cada métrica e retorna as que pioraram além do limite
+
+    Tempos e vazão de startup e detection (CPU numa thread) do baseline são escalados pela
+    razão entre as calibrações, descontando a máquina estar mais lenta ou mais rápida. O limite
+    é o maior entre tolerance e NOISE_FACTOR vezes o ruído do baseline e da execução atual
+    (e das calibrações, nas métricas escaladas) somados em quadratura.
+    """
+    for section, label in (("build", "Base/parser/motor"), ("environment", "Máquina")):
+        differences = changed_keys(baseline.get(section, {}), results[section])
+        if differences:
+            print(f"{label} diferente do baseline: {', '.join(differences)}")
+
+    current, previous = flatten(results), flatten(baseline)
+    noise, previous_noise = results.get("noise", {}), baseline.get("noise", {})
+    speed = 1.0
+    if results.get("calibration_ms") and baseline.get("calibration_ms"):
+        speed = results["calibration_ms"] / baseline["calibration_ms"]
+        print(f"Calibração: {baseline['calibration_ms']:.1f} ms -> {results['calibration_ms']:.1f} ms "
+              f"({speed - 1:+.1%}; startup e detection ajustados)")
+
+    regressions = []
+    for key in sorted(current):
+        direction = better_direction(key)
+        old, new = previous.get(key), current[key]
+        if direction is None or not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+            continue
+        spread = [noise.get(key, 0), previous_noise.get(key, 0)]
+        if key.split(".")[0] in CALIBRATED_SECTIONS and not key.endswith("_mb"):
+            old = old * speed if direction == "lower" else old / speed
+            spread += [noise.get("calibration_ms", 0), previous_noise.get("calibration_ms", 0)]
+        change = (new - old) / old
+        limit = max(tolerance, NOISE_FACTOR * math.hypot(*spread))
+        worse = change > limit if direction == "lower" else change < -limit
+        print(f"{key:<40} {old:10.2f} -> {new:10.2f}  {change:+7.1%}  (limite {limit:.0%})"
+              f"{'  REGRESSÃO' if worse else ''}")
+        if worse:
+            regressions.append(key)
+    return regressions
+
+
+def print_results(results):
+    if "startup" in results:
+        startup = results["startup"]
+        print(f"Inicialização: import em {startup['import_ms']:.0f} ms, primeira detecção em "
+              f"{startup['first_detection_ms']:.0f} ms, processo em {startup['process_ms']:.0f} ms, "
+              f"pico de {startup['peak_rss_mb']:.0f} MB")
+
+    if "detection" in results:
+        detection = results["detection"]
+        print(f"Detecção: {detection['pages']} páginas ({detection['corpus_mb']:.2f} MB), "
+              f"p50 {detection['p50_ms']:.2f} ms, p90 {detection['p90_ms']:.2f} ms, p99 {detection['p99_ms']:.2f} ms, "
+              f"{detection['pages_per_s']:.0f} páginas/s, pico alocado {detection['alloc_peak_mb']:.1f} MB")
+        for name, p50 in detection["per_page_p50"].items():
+            print(f"    {name:<28} p50 {p50:8.2f} ms")
+
+    if "throughput" in results:
+        throughput = results["throughput"]
+        peak = throughput["server_peak_rss_mb"]
+        print(f"/detect: gunicorn com {throughput['workers']} workers pronto em {throughput['server_ready_ms']:.0f} ms, "
+              f"{throughput['concurrency']} clientes simultâneos"
+              + (f", pico de {peak:.0f} MB" if peak is not None else ""))
+        for name in SCENARIOS:
+            scenario = throughput[name]
+            print(f"    {name:<10} {scenario['rps']:8.1f} req/s  p50 {scenario['p50_ms']:8.1f} ms  "
+                  f"p99 {scenario['p99_ms']:8.1f} ms  erros {scenario['errors']}/{scenario['requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(SECTIONS), help="seções a rodar, separadas por vírgula")
+    parser.add_argument("--runs", type=int, default=3, help="execuções de cada seção; os resultados são a mediana")
+    parser.add_argument("--startup-repeat", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20, help="passadas pelo corpus na medida de latência")
+    parser.add_argument("--requests", type=int, default=200, help="requisições /detect por cenário")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=2, help="workers do gunicorn")
+    parser.add_argument("--output", help="grava os resultados em JSON")
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE_PATH, help="grava os resultados como baseline")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH, help="compara com um baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="piora relativa aceita na comparação")
+    args = parser.parse_args()
+
+    sections = [section for section in args.only.split(",") if section]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"seções desconhecidas: {', '.join(sorted(unknown))}")
+
+    if args.runs < 1:
+        parser.error("--runs deve ser pelo menos 1")
+
+    pages = load_corpus()
+    runs = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Processos filhos sem fila de jobs, métricas nem cache em disco compartilhados com uma instância real
+        env = dict(os.environ, JOBS_PATH=os.path.join(directory, "jobs.sqlite3"), JOB_WORKERS="0",
+                   METRICS_PATH=os.path.join(directory, "metrics.sqlite3"))
+        env.pop("CACHE_BACKEND", None)
+
+        for run in range(args.runs):
+            print(f"Execução {run + 1}/{args.runs}", flush=True)
+            # Calibração antes de cada seção: a máquina (VM compartilhada, turbo) muda de velocidade ao longo da execução
+            calibration = []
+            results = {}
+            if "startup" in sections:
+                calibration.append(calibrate())
+                results["startup"] = bench_startup(args.startup_repeat, env)
+            if "detection" in sections:
+                calibration.append(calibrate())
+                results["detection"] = bench_detection(pages, args.repeat)
+            if "throughput" in sections:
+                results["throughput"] = bench_throughput(pages, args.requests, args.concurrency, args.workers, env)
+            if calibration:
+                results["calibration_ms"] = median(calibration)
+            runs.append(results)
+
+    summary, noise = summarize_runs(runs)
+    results = dict({"environment": environment(), "build": build(), "runs": args.runs}, **summary, noise=noise)
+    print_results(results)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+            print(f"Resultados gravados em {path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions and baseline.get("environment") != results["environment"]:
+            print(f"Aviso: {len(regressions)} métricas pioraram, mas o baseline foi gerado em outra máquina; "
+                  "gere um baseline nesta máquina para usar a comparação como critério")
+        elif regressions:
+            print(f"ERRO: {len(regressions)} métricas pioraram além do limite")
+            sys.exit(1)
+        print("Sem regressões em relação ao baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Servidor HTTP local que entrega o corpus de benchmark com respostas lentas, grandes ou em chunks.
+
+Uso:
+    python benchmarks/fixture_server.py [--port 8800] [--corpus diretório]
+
+Rotas:
+    GET /corpus/<arquivo>   página do corpus com os cabeçalhos salvos no manifest.json
+    GET /large?size=N       página sintética de N bytes (padrão: 2 MB)
+
+Parâmetros aceitos pelas duas rotas:
+    delay=S                 espera S segundos antes de responder (servidor lento)
+    chunks=N                envia o corpo em N pedaços com Transfer-Encoding: chunked
+    interval=S              pausa de S segundos entre os pedaços
+"""
+import argparse
+import json
+import os
+import random
+import string
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+# Cabeçalhos que dependem de como o corpo é enviado aqui, não do site original
+SKIPPED_HEADERS = {'content-length', 'content-encoding', 'transfer-encoding', 'connection'}
+
+
+def load_corpus(directory=CORPUS_DIR):
+    """Lê o manifest.json e retorna as páginas com o HTML carregado"""
+    with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+        pages = json.load(f)['pages']
+
+    for page in pages:
+        with open(os.path.join(directory, page['file']), 'r', encoding='utf-8') as f:
+            page['html'] = f.read()
+    return pages
+
+
+def synthetic_page(size, seed=7):
+    """Página HTML de exatamente size bytes, sem relação com os fingerprints"""
+    rng = random.Random(seed)
+    head = b'<html><head><title>large</title></head><body>'
+    tail = b'</body></html>'
+    chunks = [head]
+    total = len(head) + len(tail)
+
+    while total < size:
+        word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+        chunk = f'<div class="{word}"><a href="/{word}">{word}</a></div>\n'.encode('ascii')
+        chunks.append(chunk)
+        total += len(chunk)
+
+    return b''.join(chunks)[:size - len(tail)] + tail
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+
+        if parsed.path.startswith('/corpus/'):
+            page = self.server.pages.get(parsed.path[len('/corpus/'):])
+            if page is None:
+                return self._send_empty(404)
+            headers = {name: value for name, value in page['headers'].items() if name.lower() not in SKIPPED_HEADERS}
+            body = page['html'].encode('utf-8')
+        elif parsed.path == '/large':
+            headers = {'Content-Type': 'text/html; charset=utf-8'}
+            body = self.server.large_page(int(query.get('size', 2_000_000)))
+        else:
+            return self._send_empty(404)
+
+        delay = float(query.get('delay', 0))
+        if delay > 0:
+            time.sleep(delay)
+
+        self.server_header = next((value for name, value in headers.items() if name.lower() == 'server'), None)
+        headers = {name: value for name, value in headers.items() if name.lower() != 'server'}
+
+        chunks = int(query.get('chunks', 0))
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        if chunks <= 0:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        interval = float(query.get('interval', 0))
+        size = -(-len(body) // chunks)
+        for start in range(0, len(body), size):
+            piece = body[start:start + size]
+            self.wfile.write(f'{len(piece):x}\r\n'.encode('ascii') + piece + b'\r\n')
+            self.wfile.flush()
+            if interval > 0:
+                time.sleep(interval)
+        self.wfile.write(b'0\r\n\r\n')
+
+    def version_string(self):
+        # O Server salvo no manifest substitui o do BaseHTTPRequestHandler
+        return getattr(self, 'server_header', None) or super().version_string()
+
+    def _send_empty(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, pages):
+        super().__init__(address, FixtureHandler)
+        self.pages = {page['file']: page for page in pages}
+        self._large = {}
+        self._lock = threading.Lock()
+
+    def large_page(self, size):
+        """Página sintética de size bytes, gerada uma vez por tamanho"""
+        with self._lock:
+            if size not in self._large:
+                self._large[size] = synthetic_page(size)
+            return self._large[size]
+
+
+def start_fixture_server(pages, host='127.0.0.1', port=0):
+    """Sobe o servidor numa thread e retorna (servidor, URL base)"""
+    server = FixtureServer((host, port), pages)
+    threading.Thread(target=server.serve_forever, name='fixture-server', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='diretório com manifest.json e as páginas')
+    args = parser.parse_args()
+
+    server = FixtureServer((args.host, args.port), load_corpus(args.corpus))
+    print(f'Servindo {len(server.pages)} páginas em http://{args.host}:{args.port}/corpus/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
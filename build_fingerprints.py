@@ -0,0 +1,116 @@
+"""Gera o artefato pré-compilado da base de fingerprints.
+
+Uso:
+    python build_fingerprints.py [technologies.json] [-o technologies.compiled.json] [--strict]
+
+Valida todos os padrões, lista as regexes inválidas (que a API apenas
+descartaria com um aviso no log), as sinalizadas com risco de backtracking
+catastrófico e referências de implies/excludes/requires a tecnologias
+inexistentes, e grava num JSON compacto só o que a carga não recalcula
+barato: os padrões com seus literais e risco, a trie do pré-filtro e o grafo
+de dependências. Na inicialização os workers
+carregam esse artefato em vez de analisar e compilar o technologies.json, desde
+que ele corresponda à versão (hash) do arquivo de origem.
+
+Um implies para tecnologia ausente da base interrompe o build (código 1): a
+detecção descartaria a tecnologia implicada.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+logging.disable(logging.CRITICAL)
+
+import app  # noqa: E402
+
+logging.disable(logging.NOTSET)
+
+
+def regex_error(raw):
+    """Explica por que um padrão foi descartado na compilação"""
+    if not isinstance(raw, str):
+        return f"not a string ({type(raw).__name__})"
+
+    source = app.parse_tags(raw)[0]
+    try:
+        app.compile_regex(source, re.IGNORECASE)
+    except Exception as e:
+        return str(e)
+    return "invalid pattern"
+
+
+def missing_references(technologies, graph):
+    """Lista implies/excludes/requires que apontam para tecnologias fora da base"""
+    missing = []
+
+    # O grafo já descarta implies desconhecidos: eles são conferidos no JSON original
+    for tech_name, tech_info in technologies.items():
+        for raw in app.as_list(tech_info.get("implies", [])):
+            name = app.parse_tags(raw)[0] if isinstance(raw, str) else None
+            if name is not None and name not in technologies:
+                missing.append((tech_name, "implies", name))
+
+    if graph is None:
+        return missing
+    for tech_name, excludes in graph.excludes.items():
+        missing.extend((tech_name, "excludes", name) for name in excludes if name not in technologies)
+    for tech_name, requires in graph.requires.items():
+        missing.extend((tech_name, "requires", name) for name in sorted(requires) if name not in technologies)
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", default=app.TECHNOLOGIES_PATH, help="arquivo technologies.json")
+    parser.add_argument("-o", "--output", default=app.FINGERPRINTS_ARTIFACT, help="arquivo do artefato gerado")
+    parser.add_argument("--strict", action="store_true", help="falhar (código 1) se houver regexes inválidas")
+    args = parser.parse_args()
+
+    with open(args.source, "rb") as f:
+        content = f.read()
+    technologies = json.loads(content)
+
+    start = time.perf_counter()
+    invalid = []
+    database = app.compile_database(technologies, app.file_version(content), args.source, invalid)
+    elapsed = time.perf_counter() - start
+
+    errors = [(tech_name, family, raw, regex_error(raw)) for tech_name, family, raw in invalid]
+    for tech_name, family, raw, error in errors:
+        print(f"INVÁLIDO  {tech_name} [{family}] {raw!r}: {error}", file=sys.stderr)
+
+    for tech_name, family, raw, risk in database.risky:
+        print(f"RISCO     {tech_name} [{family}] {raw!r}: {risk}", file=sys.stderr)
+
+    missing = missing_references(technologies, database.graph)
+    for tech_name, relation, name in missing:
+        label = "INVÁLIDO " if relation == "implies" else "AVISO    "
+        print(f"{label} {tech_name} {relation} '{name}', que não existe na base", file=sys.stderr)
+
+    # Um implies sem entrada na base seria descartado em silêncio na detecção
+    if any(relation == "implies" for _, relation, _ in missing):
+        print("ERRO: implies para tecnologias ausentes da base", file=sys.stderr)
+        sys.exit(1)
+
+    artifact = app.database_to_artifact(database)
+    temp_path = f"{args.output}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, args.output)
+
+    literals = len(database.prefilter.literals) if database.prefilter is not None else 0
+    print(f"{len(database.patterns)} tecnologias compiladas em {elapsed:.2f}s: {literals} literais, "
+          f"{len(errors)} regexes inválidas, {len(database.risky)} com risco de backtracking, "
+          f"{len(missing)} referências ausentes")
+    print(f"Artefato {args.output} (versão {database.version}, {os.path.getsize(args.output) / 1024:.0f} KiB)")
+
+    if args.strict and errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Cache de resultados de detecção com TTL e despejo LRU.
+
+Dois backends com a mesma interface (get/set/stats):
+
+    memory  dicionário LRU no próprio processo (padrão)
+    sqlite  arquivo SQLite compartilhado entre os workers do gunicorn
+
+Configuração por variáveis de ambiente: CACHE_BACKEND (memory|sqlite|none),
+CACHE_TTL (segundos), CACHE_MAX_ENTRIES e CACHE_PATH (arquivo do SQLite).
+Os validadores de revalidação (ETag/Last-Modified/hash do corpo) usam o
+mesmo backend, com VALIDATOR_TTL e VALIDATOR_MAX_ENTRIES próprios.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory').lower()
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1000))
+CACHE_PATH = os.environ.get('CACHE_PATH', '/tmp/wappalyzer-cache.sqlite3')
+VALIDATOR_TTL = float(os.environ.get('VALIDATOR_TTL', 7 * 24 * 3600))
+VALIDATOR_MAX_ENTRIES = int(os.environ.get('VALIDATOR_MAX_ENTRIES', 5000))
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_url(url):
+    """Normaliza a URL para uso como chave: esquema/host em minúsculas, sem porta padrão nem fragmento"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+def cache_key(url, cookie='', variant=''):
+    """Chave do cache: URL normalizada, hash do cookie enviado e variante do modo de detecção"""
+    cookie_hash = hashlib.sha256(cookie.encode('utf-8')).hexdigest()[:16] if cookie else ''
+    key = f"{normalize_url(url)}|{cookie_hash}"
+    return f"{key}|{variant}" if variant else key
+
+class MemoryCache:
+    """Cache LRU em memória com expiração por TTL"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def size(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "size": self.size(),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class SQLiteCache(MemoryCache):
+    """Cache LRU em arquivo SQLite, compartilhado entre processos"""
+
+    name = 'sqlite'
+
+    def __init__(self, path, max_entries, ttl, table='results'):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)")
+
+    def _connection(self):
+        # Uma conexão por thread e processo; o WAL permite leituras concorrentes dos workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                row = conn.execute(f"SELECT value FROM {self.table} WHERE key = ? AND expires > ?",
+                                   (key, now)).fetchone()
+                if row is not None:
+                    conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Erro ao ler o cache SQLite: {str(e)}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                             (key, json.dumps(value), now + self.ttl, now))
+                conn.execute(f"DELETE FROM {self.table} WHERE expires <= ?", (now,))
+                conn.execute(f"""
+                    DELETE FROM {self.table} WHERE key IN (
+                        SELECT key FROM {self.table} ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+        except sqlite3.Error as e:
+            logger.warning(f"Erro ao gravar no cache SQLite: {str(e)}")
+
+    def size(self):
+        try:
+            return self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+def create_cache(table='results', max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+    """Cria o backend de cache configurado (ou None se desativado)"""
+    if CACHE_BACKEND == 'none' or max_entries <= 0:
+        return None
+    if CACHE_BACKEND == 'sqlite':
+        return SQLiteCache(CACHE_PATH, max_entries, ttl, table)
+    if CACHE_BACKEND != 'memory':
+        logger.warning(f"CACHE_BACKEND desconhecido '{CACHE_BACKEND}'. Usando cache em memória.")
+    return MemoryCache(max_entries, ttl)
+
+def create_validator_store():
+    """Cria o armazenamento de validadores (ETag, Last-Modified, hash do corpo e último resultado)"""
+    return create_cache('validators', VALIDATOR_MAX_ENTRIES, VALIDATOR_TTL)
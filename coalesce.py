@@ -0,0 +1,67 @@
+"""Coalescência de requisições idênticas em andamento (single-flight).
+
+Quando várias requisições com a mesma chave (URL normalizada + opções)
+chegam enquanto a primeira ainda está baixando e analisando a página, só a
+primeira executa o trabalho; as demais esperam e recebem o mesmo resultado
+(ou a mesma exceção). Cada requisição em espera tem seu próprio limite de
+tempo: ao estourá-lo ela desiste sem afetar as outras nem a execução em curso.
+
+A coalescência é por processo: com vários workers do gunicorn, requisições
+atendidas por workers diferentes não se juntam.
+"""
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+class SingleFlight:
+    """Executa uma única vez as chamadas concorrentes com a mesma chave"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, function, timeout=None):
+        """Executa function() ou espera a execução em andamento; retorna (resultado, compartilhado)
+
+        Levanta TimeoutError se a espera passar de timeout segundos.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                result = function()
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                with self._lock:
+                    del self._calls[key]
+
+        try:
+            return future.result(timeout), True
+        except FutureTimeout:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"Timed out after {timeout}s waiting for an identical request in progress")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts
+            }
@@ -0,0 +1,282 @@
+"""Camada de download compartilhada entre requisições.
+
+Um único cliente httpx assíncrono roda num event loop em thread própria e
+mantém um pool de conexões com keep-alive, cache de DNS e HTTP/2 opcional.
+As rotas síncronas do Flask usam fetch(); quem já está no loop (lotes,
+crawls) pode usar fetch_async() diretamente.
+"""
+import asyncio
+import codecs
+import contextvars
+import logging
+import os
+import socket
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import httpcore
+import httpx
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Configuração do pool de conexões
+FETCH_MAX_CONNECTIONS = int(os.environ.get('FETCH_MAX_CONNECTIONS', 200))
+FETCH_MAX_KEEPALIVE = int(os.environ.get('FETCH_MAX_KEEPALIVE', 50))
+FETCH_KEEPALIVE_EXPIRY = float(os.environ.get('FETCH_KEEPALIVE_EXPIRY', 30))
+FETCH_HTTP2 = os.environ.get('FETCH_HTTP2', 'false').lower() in ('1', 'true', 'yes')
+DNS_CACHE_TTL = float(os.environ.get('DNS_CACHE_TTL', 300))
+
+# Limites do download: bytes do corpo (0 = sem limite) e prazo total em segundos
+FETCH_MAX_BYTES = int(os.environ.get('FETCH_MAX_BYTES', 5 * 1024 * 1024))
+FETCH_DEADLINE = float(os.environ.get('FETCH_DEADLINE', 30))
+
+# Tempos por fase (segundos) do download em andamento na task atual
+FETCH_TIMINGS = contextvars.ContextVar('fetch_timings', default=None)
+
+# Eventos de trace do httpcore -> fase medida
+TRACE_PHASES = {"connect_tcp": "connect", "start_tls": "tls"}
+
+class FetchedPage:
+    """Resposta baixada em streaming; truncated indica se o corpo foi cortado e por quê"""
+
+    __slots__ = ("url", "status_code", "headers", "cookies", "content", "text", "truncated", "timings")
+
+    def __init__(self, url, status_code, headers, cookies, content, text, truncated=None, timings=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.cookies = cookies
+        self.content = content
+        self.text = text
+        self.truncated = truncated
+        self.timings = timings or {}
+
+def add_timing(timings, phase, seconds):
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+def trace_timings(timings):
+    """Callback de trace do httpcore que soma conexão, TLS e espera pelos cabeçalhos (inclusive em redirects)"""
+    starts = {}
+
+    async def trace(event_name, info):
+        step, _, stage = event_name.rpartition('.')
+        step = step.rpartition('.')[2]
+        now = time.perf_counter()
+        if stage == 'started':
+            starts[step] = now
+        elif stage == 'complete':
+            if step in TRACE_PHASES:
+                add_timing(timings, TRACE_PHASES[step], now - starts.pop(step, now))
+            elif step == 'receive_response_headers':
+                add_timing(timings, 'wait', now - starts.pop('send_request_headers', now))
+
+    return trace
+
+class CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """Backend de rede que resolve nomes uma vez por TTL antes de abrir a conexão TCP"""
+
+    def __init__(self, ttl):
+        self._backend = httpcore.AnyIOBackend()
+        self._ttl = ttl
+        self._cache = {}
+
+    async def _resolve(self, host, port):
+        now = time.monotonic()
+        cached = self._cache.get((host, port))
+        if cached and cached[0] > now:
+            return cached[1]
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        add_timing(FETCH_TIMINGS.get(), 'dns', time.perf_counter() - start)
+        address = infos[0][4][0]
+        self._cache[(host, port)] = (now + self._ttl, address)
+        return address
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        # O TLS continua usando o nome original (SNI), só o connect usa o IP em cache
+        try:
+            address = await self._resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        return await self._backend.connect_tcp(address, port, timeout=timeout,
+                                               local_address=local_address, socket_options=socket_options)
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+class PooledTransport(httpx.AsyncHTTPTransport):
+    """Transporte httpx cujo pool de conexões usa o cache de DNS"""
+
+    def __init__(self, limits, http2, dns_ttl):
+        super().__init__(limits=limits, http2=http2)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http2=http2,
+            network_backend=CachingDNSBackend(dns_ttl),
+        )
+
+def http2_available():
+    """Indica se o pacote h2 está instalado para habilitar HTTP/2"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class FetchEngine:
+    """Event loop em thread dedicada com um cliente httpx compartilhado"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+
+    def _reset(self):
+        # Após um fork (gunicorn) o loop e as conexões do pai não existem no filho
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+
+    def _create_client(self):
+        http2 = FETCH_HTTP2 and http2_available()
+        if FETCH_HTTP2 and not http2:
+            logger.warning("FETCH_HTTP2 ativado, mas o pacote 'h2' não está instalado. Usando HTTP/1.1.")
+
+        limits = httpx.Limits(max_connections=FETCH_MAX_CONNECTIONS,
+                              max_keepalive_connections=FETCH_MAX_KEEPALIVE,
+                              keepalive_expiry=FETCH_KEEPALIVE_EXPIRY)
+        client = httpx.AsyncClient(transport=PooledTransport(limits, http2, DNS_CACHE_TTL),
+                                   follow_redirects=True,
+                                   headers={'User-Agent': USER_AGENT})
+
+        # Não guardar cookies entre requisições de sites/clientes diferentes
+        client.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return client
+
+    @property
+    def loop(self):
+        """Event loop do engine, iniciado na primeira utilização"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='fetch-loop', daemon=True).start()
+                self._client = asyncio.run_coroutine_threadsafe(self._async_create_client(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _async_create_client(self):
+        return self._create_client()
+
+    def submit(self, coro):
+        """Agenda uma corrotina no loop do engine e retorna um concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def fetch_async(self, url, timeout=10, cookie='', extra_headers=None, max_bytes=None, deadline=None):
+        """Baixa a página em streaming no loop do engine, respeitando o limite de bytes e o prazo total"""
+        headers = dict(extra_headers or {})
+
+        # Adicionar cookies se fornecidos
+        if cookie:
+            headers['Cookie'] = cookie
+
+        max_bytes = FETCH_MAX_BYTES if max_bytes is None else max_bytes
+        deadline = FETCH_DEADLINE if deadline is None else deadline
+        expires = asyncio.get_running_loop().time() + deadline
+
+        # O DNS é medido pelo backend de rede via contextvar; o resto pelo trace do httpcore
+        timings = {}
+        FETCH_TIMINGS.set(timings)
+        start = time.perf_counter()
+
+        request = self._client.build_request('GET', url, headers=headers, timeout=timeout,
+                                             extensions={"trace": trace_timings(timings)})
+        try:
+            async with asyncio.timeout_at(expires):
+                response = await self._client.send(request, stream=True)
+        except TimeoutError:
+            raise httpx.TimeoutException(f"Deadline of {deadline}s exceeded for url '{url}'", request=request)
+
+        try:
+            # 304 é a resposta esperada de uma revalidação condicional, não um erro
+            if response.status_code != 304:
+                response.raise_for_status()
+            page = await self._read_body(url, response, max_bytes, expires)
+        finally:
+            await response.aclose()
+
+        # O connect_tcp inclui a resolução de nomes feita pelo backend
+        if 'connect' in timings:
+            timings['connect'] = max(0.0, timings['connect'] - timings.get('dns', 0.0))
+        timings['fetch'] = time.perf_counter() - start
+        page.timings = timings
+        return page
+
+    async def _read_body(self, url, response, max_bytes, expires):
+        """Lê e decodifica o corpo aos poucos, parando no limite de bytes ou no prazo"""
+        loop = asyncio.get_running_loop()
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        chunks = []
+        text = []
+        size = 0
+        start = time.perf_counter()
+        truncated = None
+        stream = response.aiter_bytes()
+
+        while True:
+            remaining = expires - loop.time()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError
+                chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+            except StopAsyncIteration:
+                break
+            except TimeoutError:
+                truncated = 'deadline'
+                break
+
+            if max_bytes > 0 and size + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - size]
+                truncated = 'max_bytes'
+
+            chunks.append(chunk)
+            text.append(decoder.decode(chunk))
+            size += len(chunk)
+            if truncated:
+                break
+
+        text.append(decoder.decode(b'', final=True))
+        add_timing(FETCH_TIMINGS.get(), 'download', time.perf_counter() - start)
+
+        if truncated:
+            logger.info(f"Download de {url} interrompido ({truncated}) após {size} bytes.")
+
+        # url final, depois dos redirects
+        return FetchedPage(str(response.url), response.status_code, response.headers, response_cookies(response),
+                           b''.join(chunks), ''.join(text), truncated)
+
+    def fetch(self, url, timeout=10, cookie='', extra_headers=None, max_bytes=None, deadline=None):
+        """Versão síncrona de fetch_async para as rotas do Flask"""
+        return self.submit(self.fetch_async(url, timeout, cookie, extra_headers, max_bytes, deadline)).result()
+
+FETCHER = FetchEngine()
+os.register_at_fork(after_in_child=FETCHER._reset)
+
+def response_cookies(response):
+    """Retorna os cookies definidos pela resposta como dicionário nome -> valor"""
+    return {cookie.name: cookie.value for cookie in response.cookies.jar}
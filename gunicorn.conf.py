@@ -0,0 +1,46 @@
+"""Configuração do gunicorn para o modo de produção.
+
+Todos os valores podem ser ajustados por variáveis de ambiente:
+
+    PORT                porta HTTP (padrão: 3000)
+    GUNICORN_WORKERS    número de processos (padrão: WEB_CONCURRENCY ou 2 * CPUs + 1)
+    GUNICORN_THREADS    threads por processo (padrão: 4)
+    GUNICORN_KEEPALIVE  segundos de keep-alive das conexões (padrão: 5)
+    GUNICORN_TIMEOUT    segundos até um worker travado ser reiniciado (padrão: 60)
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 3000)}"
+
+workers = int(os.environ.get("GUNICORN_WORKERS", os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread" if threads > 1 else "sync"
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+# Carregar o app (e compilar PATTERNS) no processo mestre antes do fork,
+# para que os workers compartilhem os padrões compilados via copy-on-write
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    # Cada instância começa com métricas zeradas: os workers somam seus valores no arquivo compartilhado
+    import metrics
+    metrics.reset_store()
+
+
+def pre_fork(server, worker):
+    # Mover os objetos já carregados para a geração permanente do GC, evitando
+    # que a coleta nos workers toque nas páginas compartilhadas e force cópias
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Threads de fundo (recarga da base de fingerprints, fila de jobs, envio das métricas) rodam em cada worker, não no mestre
+    import app
+    app.start_background()
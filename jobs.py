@@ -0,0 +1,273 @@
+"""Fila de detecções assíncronas (POST /jobs) persistida em SQLite.
+
+POST /jobs grava o job e responde na hora com o id; threads de trabalho
+(JOB_WORKERS por processo) retiram os jobs da fila em ordem de chegada,
+respeitando por host um máximo de jobs simultâneos (JOB_PER_HOST) e um
+intervalo mínimo entre inícios (JOB_HOST_INTERVAL). O resultado fica no banco
+para GET /jobs/<id> e, se o job tiver callback_url, é enviado por POST
+(com até JOB_WEBHOOK_RETRIES tentativas).
+
+O arquivo (JOBS_PATH, padrão DATA_DIR/jobs.sqlite3) é compartilhado pelos
+workers do gunicorn e sobrevive a reinícios desde que DATA_DIR fique num volume
+persistente (no Docker, /app/data): jobs na fila continuam de onde pararam, e um job em execução cujo
+processo morreu volta para a fila quando a concessão (JOB_LEASE segundos)
+expira, até JOB_MAX_ATTEMPTS tentativas. Jobs concluídos são apagados após
+JOB_TTL segundos.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+JOBS_PATH = os.environ.get('JOBS_PATH', os.path.join(DATA_DIR, 'jobs.sqlite3'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_PER_HOST = int(os.environ.get('JOB_PER_HOST', 1))
+JOB_HOST_INTERVAL = float(os.environ.get('JOB_HOST_INTERVAL', 1.0))
+JOB_LEASE = float(os.environ.get('JOB_LEASE', 300))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_MAX_QUEUED = int(os.environ.get('JOB_MAX_QUEUED', 10000))
+JOB_TTL = float(os.environ.get('JOB_TTL', 7 * 24 * 3600))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+JOB_WEBHOOK_TIMEOUT = float(os.environ.get('JOB_WEBHOOK_TIMEOUT', 10))
+JOB_WEBHOOK_RETRIES = int(os.environ.get('JOB_WEBHOOK_RETRIES', 3))
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+class QueueFull(Exception):
+    """A fila atingiu JOB_MAX_QUEUED jobs pendentes"""
+
+class JobStore:
+    """Jobs e limites por host num arquivo SQLite compartilhado entre processos"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                host TEXT NOT NULL,
+                params TEXT NOT NULL,
+                callback_url TEXT,
+                result TEXT,
+                error TEXT,
+                owner TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                webhook_status TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                lease_until REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            CREATE INDEX IF NOT EXISTS jobs_host ON jobs (host, status);
+            CREATE TABLE IF NOT EXISTS job_hosts (
+                host TEXT PRIMARY KEY,
+                next_allowed REAL NOT NULL
+            );
+        """)
+
+    def _connection(self):
+        # Uma conexão por thread e processo, com transações explícitas (BEGIN IMMEDIATE) para a retirada
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, params, host, callback_url=None):
+        """Enfileira um job e retorna seu id"""
+        conn = self._connection()
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        if queued >= JOB_MAX_QUEUED:
+            raise QueueFull(f"Job queue is full ({JOB_MAX_QUEUED} queued jobs)")
+
+        job_id = uuid.uuid4().hex
+        conn.execute("INSERT INTO jobs (id, status, host, params, callback_url, created_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                     (job_id, host, json.dumps(params), callback_url, time.time()))
+        return job_id
+
+    def get(self, job_id):
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return job_view(row) if row is not None else None
+
+    def claim(self, owner):
+        """Retira o job mais antigo cujo host está liberado, ou None se não houver"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs na fila e jobs cuja concessão expirou (processo morreu no meio da execução)
+            row = conn.execute("""
+                SELECT * FROM jobs
+                WHERE (status = 'queued' OR (status = 'running' AND lease_until < :now))
+                  AND host NOT IN (SELECT host FROM job_hosts WHERE next_allowed > :now)
+                  AND (SELECT COUNT(*) FROM jobs AS other
+                       WHERE other.host = jobs.host AND other.status = 'running'
+                         AND other.lease_until >= :now) < :per_host
+                ORDER BY created_at LIMIT 1
+            """, {"now": now, "per_host": JOB_PER_HOST}).fetchone()
+
+            if row is not None and row["attempts"] >= JOB_MAX_ATTEMPTS:
+                conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                             (f"Job interrupted {row['attempts']} times", now, row["id"]))
+                row = None
+            elif row is not None:
+                conn.execute("""
+                    UPDATE jobs SET status = 'running', owner = ?, started_at = ?, lease_until = ?,
+                                    attempts = attempts + 1
+                    WHERE id = ?
+                """, (owner, now, now + JOB_LEASE, row["id"]))
+                conn.execute("""
+                    INSERT INTO job_hosts (host, next_allowed) VALUES (?, ?)
+                    ON CONFLICT (host) DO UPDATE SET next_allowed = excluded.next_allowed
+                """, (row["host"], now + JOB_HOST_INTERVAL))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def finish(self, job_id, result):
+        status = "failed" if "error" in result else "done"
+        self._connection().execute("""
+            UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?
+        """, (status, json.dumps(result), result.get("error"), time.time(), job_id))
+
+    def set_webhook_status(self, job_id, status):
+        self._connection().execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (status, job_id))
+
+    def purge(self):
+        """Apaga jobs concluídos há mais de JOB_TTL e limites de host vencidos"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (now - JOB_TTL,))
+        conn.execute("DELETE FROM job_hosts WHERE next_allowed < ?", (now,))
+
+    def counts(self):
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+def job_view(row):
+    """Representação pública do job (GET /jobs/<id> e corpo do webhook)"""
+    params = json.loads(row["params"])
+    view = {
+        "id": row["id"],
+        "status": row["status"],
+        "url": params.get("url"),
+        "params": params,
+        "attempts": row["attempts"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"]
+    }
+    if row["result"] is not None:
+        view["result"] = json.loads(row["result"])
+    if row["error"] is not None:
+        view["error"] = row["error"]
+    if row["callback_url"]:
+        view["webhook"] = {"url": row["callback_url"], "status": row["webhook_status"]}
+    return view
+
+class JobScheduler:
+    """Threads que executam os jobs da fila e avisam o callback_url ao terminar
+
+    O banco só é aberto no primeiro uso: importar o app (build, scan_archive,
+    benchmarks) não cria o arquivo. start() deve rodar nos workers do gunicorn
+    (post_fork), nunca no mestre.
+    """
+
+    def __init__(self, path, run, workers=JOB_WORKERS):
+        self.path = path
+        self.run = run
+        self.workers = workers
+        self._store = None
+        self._lock = threading.Lock()
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._last_purge = 0.0
+
+    @property
+    def store(self):
+        with self._lock:
+            if self._store is None:
+                self._store = JobStore(self.path)
+            return self._store
+
+    def start(self):
+        if self.workers <= 0 or self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self):
+        """Acorda as threads ociosas (um job acabou de ser enfileirado)"""
+        self._wakeup.set()
+
+    def _loop(self):
+        owner = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        while True:
+            try:
+                job = self.store.claim(owner)
+                if job is None:
+                    self._maybe_purge()
+                    self._wakeup.wait(JOB_POLL_INTERVAL)
+                    self._wakeup.clear()
+                    continue
+                self._execute(job)
+            except Exception as e:
+                logger.error(f"Erro no processamento da fila de jobs: {str(e)}")
+                time.sleep(JOB_POLL_INTERVAL)
+
+    def _execute(self, job):
+        params = json.loads(job["params"])
+        try:
+            result = self.run(params)
+        except Exception as e:
+            result = {"error": str(e), "url": params.get("url")}
+        self.store.finish(job["id"], result)
+
+        if job["callback_url"]:
+            self._webhook(job["id"], job["callback_url"])
+
+    def _webhook(self, job_id, callback_url):
+        payload = self.store.get(job_id)
+        error = ""
+        for attempt in range(JOB_WEBHOOK_RETRIES):
+            try:
+                response = httpx.post(callback_url, json=payload, timeout=JOB_WEBHOOK_TIMEOUT)
+                response.raise_for_status()
+                self.store.set_webhook_status(job_id, f"delivered ({response.status_code})")
+                return
+            except httpx.HTTPError as e:
+                error = str(e)
+                logger.warning(f"Webhook do job {job_id} falhou (tentativa {attempt + 1}): {error}")
+                time.sleep(2 ** attempt)
+        self.store.set_webhook_status(job_id, f"failed: {error}")
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge >= 3600:
+            self._last_purge = now
+            self.store.purge()
+
+    def stats(self):
+        return dict(self.store.counts(), workers=self.workers, per_host=JOB_PER_HOST, host_interval=JOB_HOST_INTERVAL)
@@ -0,0 +1,282 @@
+"""Métricas de latência no formato de texto do Prometheus (GET /metrics).
+
+Cada fase de uma detecção (DNS, conexão, TLS, espera, download, parse,
+pré-filtro, casamento de padrões) alimenta um histograma. Com amostragem
+(METRICS_SAMPLE_RATE, fração das detecções entre 0 e 1) ou com debug=timings,
+o tempo de cada família de padrões e de cada regex também é medido; as
+METRICS_TOP_PATTERNS tecnologias mais lentas são exportadas.
+
+Com vários workers do gunicorn, cada processo mantém os valores em memória e
+os grava a cada METRICS_FLUSH_INTERVAL segundos num SQLite compartilhado
+(METRICS_PATH); o /metrics soma contadores e histogramas de todos os
+processos, inclusive de workers já reiniciados, e para gauges usa o maior valor
+entre os processos ativos. O gunicorn apaga o arquivo ao iniciar (on_starting).
+"""
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0))
+METRICS_TOP_PATTERNS = int(os.environ.get('METRICS_TOP_PATTERNS', 20))
+METRICS_PATH = os.environ.get('METRICS_PATH', os.path.join(tempfile.gettempdir(), 'wappalyzer-metrics.sqlite3'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+# Limites (em segundos) dos buckets dos histogramas
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+class Counter:
+    """Contador com rótulos"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple((name, labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+class Histogram(Counter):
+    """Histograma cumulativo com os buckets padrão"""
+
+    kind = "histogram"
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels[name]) for name in self.label_names)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * len(BUCKETS) + [0, 0.0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, counts in self._values.items():
+                for bound, count in zip(BUCKETS, counts):
+                    samples.append((f"{self.name}_bucket", key + (("le", repr(bound)),), count))
+                samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), counts[-2]))
+                samples.append((f"{self.name}_count", key, counts[-2]))
+                samples.append((f"{self.name}_sum", key, counts[-1]))
+        return samples
+
+class PatternTimer:
+    """Tempos de uma detecção amostrada: por família de padrões e por regex"""
+
+    __slots__ = ("families", "patterns")
+
+    def __init__(self):
+        self.families = defaultdict(float)
+        self.patterns = {}
+
+    def add_pattern(self, technology, family, pattern, seconds):
+        self.families[family] += seconds
+        key = (technology, family, pattern)
+        self.patterns[key] = self.patterns.get(key, 0.0) + seconds
+
+    def slowest(self, count=10):
+        """Regexes mais lentas desta detecção"""
+        ranked = sorted(self.patterns.items(), key=lambda item: item[1], reverse=True)[:count]
+        return [
+            {"technology": technology, "family": family, "pattern": pattern, "ms": round(seconds * 1000, 3)}
+            for (technology, family, pattern), seconds in ranked
+        ]
+
+class MetricsStore:
+    """Últimos valores de cada processo num arquivo SQLite compartilhado entre os workers"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS samples (
+                process TEXT NOT NULL,
+                family TEXT NOT NULL,
+                name TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (process, name, labels)
+            );
+            CREATE INDEX IF NOT EXISTS samples_family ON samples (family);
+            CREATE TABLE IF NOT EXISTS processes (
+                process TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL
+            );
+        """)
+
+    def _connection(self):
+        # Uma conexão por thread e processo, como em jobs.JobStore
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def write(self, process, rows):
+        """Substitui os valores do processo; rows = [(família, nome, rótulos, valor)]"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Rótulos que sumiram do processo (ex.: versão anterior da base) saem junto
+            conn.execute("DELETE FROM samples WHERE process = ?", (process,))
+            conn.executemany("""
+                INSERT INTO samples (process, family, name, labels, value) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (process, name, labels) DO UPDATE SET value = excluded.value
+            """, [(process, family, name, json.dumps(labels), value) for family, name, labels, value in rows])
+            conn.execute("""
+                INSERT INTO processes (process, updated_at) VALUES (?, ?)
+                ON CONFLICT (process) DO UPDATE SET updated_at = excluded.updated_at
+            """, (process, time.time()))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read(self, family, kind, limit=None):
+        """Amostras da família somadas entre os processos (gauges: maior valor entre os processos ativos)"""
+        if kind == "gauge":
+            query = """
+                SELECT name, labels, MAX(value) AS total FROM samples JOIN processes USING (process)
+                WHERE family = ? AND updated_at >= ? GROUP BY name, labels
+            """
+            params = [family, time.time() - 3 * METRICS_FLUSH_INTERVAL]
+        else:
+            query = "SELECT name, labels, SUM(value) AS total FROM samples WHERE family = ? GROUP BY name, labels"
+            params = [family]
+        query += " ORDER BY total DESC LIMIT ?" if limit is not None else " ORDER BY MIN(samples.rowid)"
+        if limit is not None:
+            params.append(limit)
+        rows = self._connection().execute(query, params).fetchall()
+        return [(name, tuple(tuple(pair) for pair in json.loads(labels)), value) for name, labels, value in rows]
+
+def reset_store(path=METRICS_PATH):
+    """Apaga o arquivo de métricas (início do gunicorn, antes de criar os workers)"""
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+class Metrics:
+    """Registro das métricas do processo, somadas às dos outros workers na coleta"""
+
+    def __init__(self, path=METRICS_PATH):
+        self.path = path
+        self.phases = Histogram("wappalyzer_phase_seconds", "Duração de cada fase da detecção", ("phase",))
+        self.detections = Counter("wappalyzer_detections_total", "Detecções concluídas", ("mode",))
+        self.sampled = Counter("wappalyzer_sampled_detections_total", "Detecções com tempos por padrão")
+        self.families = Counter("wappalyzer_family_seconds_total",
+                                "Tempo de casamento por família de padrões (amostrado)", ("family",))
+        self.patterns = Counter("wappalyzer_regex_seconds_total",
+                                "Tempo de regex por tecnologia e família, só as mais lentas (amostrado)",
+                                ("technology", "family"))
+        self._collectors = []
+        self._store = None
+        self._process = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def should_sample(self):
+        return METRICS_SAMPLE_RATE > 0 and random.random() < METRICS_SAMPLE_RATE
+
+    def observe_phases(self, timings):
+        """Registra um dicionário fase -> segundos"""
+        for phase, seconds in timings.items():
+            self.phases.observe(seconds, phase=phase)
+
+    def observe_timer(self, timer):
+        """Acumula os tempos por família e por tecnologia de uma detecção amostrada"""
+        self.sampled.inc()
+        for family, seconds in timer.families.items():
+            self.families.inc(seconds, family=family)
+        for (technology, family, _), seconds in timer.patterns.items():
+            self.patterns.inc(seconds, technology=technology, family=family)
+
+    def register(self, collector):
+        """collector() retorna [(nome, ajuda, tipo, valor, rótulos)] com valores deste processo"""
+        self._collectors.append(collector)
+
+    def start(self):
+        """Grava os valores periodicamente (nos workers do gunicorn, via post_fork)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro ao gravar as métricas: {str(e)}")
+
+    def _families(self):
+        """[(nome, ajuda, tipo, amostras)] deste processo"""
+        families = [(metric.name, metric.help, metric.kind, metric.samples())
+                    for metric in (self.phases, self.detections, self.sampled, self.families, self.patterns)]
+        for collector in self._collectors:
+            for name, help_text, kind, value, labels in collector():
+                families.append((name, help_text, kind, [(name, tuple(labels.items()), value)]))
+        return families
+
+    def flush(self):
+        """Grava no arquivo compartilhado os valores atuais deste processo"""
+        with self._lock:
+            if self._store is None or self._process[1] != os.getpid():
+                # Identificador novo por processo: um pid reaproveitado não sobrescreve os valores de um worker morto
+                self._process = (f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}", os.getpid())
+                self._store = MetricsStore(self.path)
+            store, process = self._store, self._process[0]
+
+        families = self._families()
+        store.write(process, [(family, name, labels, value)
+                              for family, _, _, samples in families for name, labels, value in samples])
+        return store, families
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus com os valores de todos os processos"""
+        store, families = self.flush()
+        lines = []
+        for family, help_text, kind, _ in families:
+            limit = METRICS_TOP_PATTERNS if family == self.patterns.name else None
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+            for name, labels, value in store.read(family, kind, limit):
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
@@ -0,0 +1,133 @@
+"""Extração dos elementos HTML usados na detecção, com backends plugáveis.
+
+Só os elementos que a detecção usa (script, style, meta e link) são
+extraídos; nenhum backend precisa da árvore completa. Todos seguem a mesma
+regra do navegador: o conteúdo de <template> é inerte e o de textarea, title,
+xmp, iframe, noembed, noframes e plaintext é texto, então nada dentro deles é
+extraído. Backends, em ordem de preferência quando HTML_PARSER=auto (padrão):
+
+    selectolax   selectolax/lexbor (pip install selectolax)
+    lxml         lxml.html (pip install lxml)
+    html.parser  BeautifulSoup com o parser puro Python, sempre disponível
+"""
+import logging
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+logger = logging.getLogger(__name__)
+
+HTML_PARSER = os.environ.get('HTML_PARSER', 'auto').lower()
+
+DETECTION_TAGS = ("script", "style", "meta", "link")
+
+# Elementos cujo conteúdo o navegador não trata como parte do documento
+INERT_CONTAINERS = ("template", "textarea", "title", "xmp", "iframe", "noembed", "noframes", "plaintext")
+
+class ParsedElements:
+    """Elementos da página relevantes para a detecção"""
+
+    __slots__ = ("script_srcs", "scripts", "styles", "metas", "links")
+
+    def __init__(self):
+        self.script_srcs = []
+        self.scripts = []
+        self.styles = []
+        self.metas = []
+        self.links = []
+
+    def add(self, name, attrs, text):
+        """Registra um elemento a partir do nome, atributos e texto interno"""
+        if name == "script":
+            if "src" in attrs:
+                self.script_srcs.append(attrs["src"] or "")
+            if text:
+                self.scripts.append(text)
+        elif name == "style":
+            if text:
+                self.styles.append(text)
+        elif name == "meta":
+            self.metas.append(attrs)
+        elif name == "link":
+            self.links.append(attrs)
+
+def _soup_attrs(tag):
+    # BeautifulSoup devolve atributos multivalorados (rel, class) como listas
+    return {key: " ".join(value) if isinstance(value, list) else value for key, value in tag.attrs.items()}
+
+def parse_soup(soup):
+    """Extrai os elementos de um BeautifulSoup já construído"""
+    elements = ParsedElements()
+    for tag in soup.find_all(DETECTION_TAGS):
+        # O html.parser monta como tags o que está dentro de textarea, title, template...
+        if tag.find_parent(INERT_CONTAINERS) is None:
+            elements.add(tag.name, _soup_attrs(tag), tag.string)
+    return elements
+
+def _parse_html_parser(html):
+    # Os contêineres inertes entram no filtro para que o que estiver dentro deles possa ser descartado
+    return parse_soup(BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer(DETECTION_TAGS + INERT_CONTAINERS)))
+
+def _parse_lxml(html):
+    import lxml.etree
+    import lxml.html
+
+    elements = ParsedElements()
+    try:
+        try:
+            root = lxml.html.document_fromstring(html)
+        except ValueError:
+            # Documentos com declaração de encoding precisam ser passados como bytes
+            root = lxml.html.document_fromstring(html.encode('utf-8'))
+    except lxml.etree.ParserError:
+        # Documento vazio (ou só com comentários)
+        return elements
+
+    for node in root.iter(*DETECTION_TAGS):
+        # O libxml2 já trata textarea, title etc. como texto, mas monta o conteúdo de <template> na árvore
+        if next(node.iterancestors(*INERT_CONTAINERS), None) is None:
+            elements.add(node.tag, dict(node.attrib), node.text)
+    return elements
+
+def _parse_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
+
+    elements = ParsedElements()
+    for node in LexborHTMLParser(html).css(", ".join(DETECTION_TAGS)):
+        attrs = {key: value or "" for key, value in node.attributes.items()}
+        elements.add(node.tag, attrs, node.text(deep=True))
+    return elements
+
+PARSER_BACKENDS = {
+    "selectolax": ("selectolax.lexbor", _parse_selectolax),
+    "lxml": ("lxml.html", _parse_lxml),
+    "html.parser": ("bs4", _parse_html_parser),
+}
+
+def available_backends():
+    """Lista os backends cujas dependências estão instaladas, em ordem de preferência"""
+    available = []
+    for name, (module, _) in PARSER_BACKENDS.items():
+        try:
+            __import__(module)
+            available.append(name)
+        except ImportError:
+            pass
+    return available
+
+def resolve_backend(name):
+    """Escolhe o backend pedido; 'auto' usa o melhor instalado e os demais caem para html.parser"""
+    available = available_backends()
+    if name == 'auto':
+        return available[0] if available else "html.parser"
+    if name not in available:
+        logger.warning(f"Parser HTML '{name}' indisponível. Usando html.parser.")
+        return "html.parser"
+    return name
+
+PARSER_BACKEND = resolve_backend(HTML_PARSER)
+logger.info(f"Parser HTML em uso: {PARSER_BACKEND}")
+
+def parse_html(html, backend=None):
+    """Extrai script, style, meta e link do HTML com o backend configurado"""
+    return PARSER_BACKENDS[backend or PARSER_BACKEND][1](html)
@@ -0,0 +1,245 @@
+"""Proteção contra backtracking catastrófico nas regexes dos fingerprints.
+
+Motores, em ordem de preferência quando REGEX_ENGINE=auto (padrão):
+
+    re2     google-re2, tempo linear (pip install google-re2)
+    regex   módulo regex, com timeout por busca (pip install regex)
+    re      biblioteca padrão, sem timeout: só mede e coloca em quarentena
+
+re2 e regex estão fixados no requirements.txt; sem os dois o startup avisa no log.
+
+Padrões que o motor escolhido não suporta (lookarounds e referências no RE2)
+usam o próximo da lista. Cada detecção tem um orçamento total de
+REGEX_REQUEST_BUDGET segundos; ao esgotá-lo os padrões restantes são pulados e
+o resultado sai marcado como parcial. Uma busca acima de REGEX_PATTERN_TIMEOUT
+conta como estouro, e o padrão que estourar REGEX_QUARANTINE_AFTER vezes deixa
+de ser avaliado neste processo (quarentena, listada em /status).
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+logger = logging.getLogger(__name__)
+
+REGEX_ENGINE = os.environ.get('REGEX_ENGINE', 'auto').lower()
+REGEX_PATTERN_TIMEOUT = float(os.environ.get('REGEX_PATTERN_TIMEOUT', 0.25))
+REGEX_REQUEST_BUDGET = float(os.environ.get('REGEX_REQUEST_BUDGET', 2.0))
+REGEX_QUARANTINE_AFTER = int(os.environ.get('REGEX_QUARANTINE_AFTER', 3))
+
+ENGINE_MODULES = {"re2": "re2", "regex": "regex", "re": "re"}
+
+# Flags do re que podem ser expressas como flags inline no RE2
+RE2_INLINE_FLAGS = {re.IGNORECASE: "i", re.DOTALL: "s", re.MULTILINE: "m"}
+
+def available_engines():
+    """Lista os motores instalados, em ordem de preferência"""
+    available = []
+    for name, module in ENGINE_MODULES.items():
+        try:
+            __import__(module)
+            available.append(name)
+        except ImportError:
+            pass
+    return available
+
+def resolve_engines(name):
+    """Motor pedido seguido dos alternativos para padrões que ele não suporta"""
+    available = available_engines()
+    if name == 'auto':
+        return available
+    if name not in available:
+        logger.warning(f"Motor de regex '{name}' indisponível. Usando {available[0]}.")
+        return available
+    return [name] + [engine for engine in available if engine != name]
+
+ENGINES = resolve_engines(REGEX_ENGINE)
+logger.info(f"Motor de regex em uso: {ENGINES[0]}")
+if ENGINES == ["re"]:
+    logger.warning("Só o módulo re está disponível: as buscas não têm timeout e um padrão com backtracking "
+                   "catastrófico pode travar o worker. Instale google-re2 ou regex (requirements.txt).")
+
+def _compile_re2(source, flags):
+    import re2
+
+    inline = "".join(letter for flag, letter in RE2_INLINE_FLAGS.items() if flags & flag)
+    if flags & ~(re.IGNORECASE | re.DOTALL | re.MULTILINE | re.UNICODE):
+        raise ValueError("unsupported flags")
+
+    options = re2.Options()
+    options.log_errors = False
+    return re2.compile(f"(?{inline}){source}" if inline else source, options)
+
+def _compile_regex(source, flags):
+    import regex
+    return regex.compile(source, flags | regex.V0)
+
+COMPILERS = {"re2": _compile_re2, "regex": _compile_regex, "re": re.compile}
+
+def compile_regex(source, flags=0):
+    """Compila com o primeiro motor que aceitar o padrão; retorna (regex, motor)"""
+    for engine in ENGINES[:-1]:
+        try:
+            return COMPILERS[engine](source, flags), engine
+        except Exception:
+            pass
+    return COMPILERS[ENGINES[-1]](source, flags), ENGINES[-1]
+
+def parse_regex(source, flags=0):
+    """Árvore do sre_parse usada pelo pré-filtro e pela análise de risco (None se não analisável)"""
+    try:
+        return sre_parse.parse(source, flags)
+    except Exception:
+        return None
+
+REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+if hasattr(sre_constants, "POSSESSIVE_REPEAT"):
+    REPEATS += (sre_constants.POSSESSIVE_REPEAT,)
+
+def _children(op, av):
+    """Subárvores de um nó do sre_parse"""
+    if op in REPEATS:
+        return [av[2]]
+    if op == sre_constants.SUBPATTERN:
+        return [av[-1]]
+    if op == sre_constants.BRANCH:
+        return list(av[1])
+    if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return [av[1]]
+    if op == sre_constants.GROUPREF_EXISTS:
+        return [item for item in av[1:] if item is not None]
+    if hasattr(sre_constants, "ATOMIC_GROUP") and op == sre_constants.ATOMIC_GROUP:
+        return [av]
+    return []
+
+def _unbounded(op, av):
+    return op in REPEATS and av[1] == sre_constants.MAXREPEAT
+
+def backtracking_risk(parsed):
+    """Motivo do risco de backtracking catastrófico de um padrão, ou "" se parecer seguro
+
+    Sinaliza quantificadores ilimitados aninhados ((a+)+), alternativas sob um
+    quantificador ilimitado ((a|ab)*) e mais de dois curingas ilimitados (.*) na mesma sequência.
+    """
+    if parsed is None:
+        return ""
+
+    def walk(items, inside_unbounded):
+        wildcards = 0
+        for op, av in items:
+            unbounded = _unbounded(op, av)
+            if unbounded and inside_unbounded:
+                return "nested_quantifier"
+            if op == sre_constants.BRANCH and inside_unbounded:
+                return "quantified_alternation"
+            if unbounded and len(av[2]) == 1 and av[2][0][0] == sre_constants.ANY:
+                wildcards += 1
+                if wildcards > 2:
+                    return "repeated_wildcards"
+            for child in _children(op, av):
+                reason = walk(child, inside_unbounded or unbounded)
+                if reason:
+                    return reason
+        return ""
+
+    return walk(list(parsed), False)
+
+class SearchContext:
+    """Estado de uma detecção: prazo do orçamento, tecnologia em avaliação e medição opcional"""
+
+    __slots__ = ("technology", "deadline", "timer", "exceeded")
+
+    def __init__(self, timer=None, budget=REGEX_REQUEST_BUDGET):
+        self.technology = ""
+        self.deadline = time.perf_counter() + budget if budget > 0 else float("inf")
+        self.timer = timer
+        self.exceeded = False
+
+class RegexGuard:
+    """Executa as buscas respeitando orçamento, timeout por padrão e quarentena"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # Chamado ao trocar a base de fingerprints: os padrões antigos deixam de existir
+        with self._lock:
+            self.overruns = {}
+            self.quarantined = {}
+            self.timeouts = 0
+            self.budget_exceeded = 0
+
+    def search(self, pattern, text, family, context):
+        """Busca o padrão no texto; retorna None se ele estiver em quarentena ou sem orçamento"""
+        if pattern in self.quarantined:
+            return None
+
+        regex = pattern.regex
+        start = time.perf_counter()
+        remaining = context.deadline - start
+        if remaining <= 0:
+            if not context.exceeded:
+                context.exceeded = True
+                with self._lock:
+                    self.budget_exceeded += 1
+            return None
+
+        try:
+            if pattern.engine == "regex":
+                match = regex.search(text, timeout=min(REGEX_PATTERN_TIMEOUT or remaining, remaining))
+            else:
+                match = regex.search(text)
+        except TimeoutError:
+            match = None
+            with self._lock:
+                self.timeouts += 1
+
+        elapsed = time.perf_counter() - start
+        if context.timer is not None:
+            context.timer.add_pattern(context.technology, family, pattern.pattern, elapsed)
+        if REGEX_PATTERN_TIMEOUT > 0 and elapsed >= REGEX_PATTERN_TIMEOUT:
+            self._overrun(pattern, family, context.technology, elapsed)
+
+        return match
+
+    def _overrun(self, pattern, family, technology, elapsed):
+        with self._lock:
+            count = self.overruns.get(pattern, 0) + 1
+            self.overruns[pattern] = count
+            if REGEX_QUARANTINE_AFTER <= 0 or count < REGEX_QUARANTINE_AFTER or pattern in self.quarantined:
+                return
+            self.quarantined[pattern] = {
+                "technology": technology,
+                "family": family,
+                "pattern": pattern.pattern,
+                "engine": pattern.engine,
+                "overruns": count,
+                "last_ms": round(elapsed * 1000, 1),
+                "since": time.time()
+            }
+
+        logger.warning(f"Regex em quarentena após {count} estouros ({technology} [{family}]): {pattern.pattern}")
+
+    def stats(self, risky=()):
+        with self._lock:
+            return {
+                "engine": ENGINES[0],
+                "pattern_timeout": REGEX_PATTERN_TIMEOUT,
+                "request_budget": REGEX_REQUEST_BUDGET,
+                "quarantine_after": REGEX_QUARANTINE_AFTER,
+                "risky_patterns": len(risky),
+                "timeouts": self.timeouts,
+                "overruns": sum(self.overruns.values()),
+                "budget_exceeded": self.budget_exceeded,
+                "quarantined": list(self.quarantined.values())
+            }
+
+GUARD = RegexGuard()
@@ -0,0 +1,240 @@
+"""Modo de renderização com navegador headless (opcional, render=true).
+
+Usa o Playwright (pip install playwright && playwright install chromium).
+Um único Chromium por processo mantém um pool de contextos reutilizáveis;
+cada renderização abre uma página num contexto livre, avalia as
+propriedades JS dos fingerprints e devolve o DOM pós-renderização. Os
+contextos são recriados após RENDER_PAGES_PER_CONTEXT páginas. O navegador
+só é iniciado na primeira requisição com render=true; o resultado (inclusive
+uma falha, por RENDER_RETRY_INTERVAL segundos) fica guardado e o /status
+apenas o reporta.
+
+Configuração: RENDER_CONCURRENCY (contextos/renderizações simultâneas),
+RENDER_TIMEOUT (segundos por renderização), RENDER_PAGES_PER_CONTEXT e
+RENDER_RETRY_INTERVAL (segundos até tentar de novo iniciar um navegador que falhou).
+"""
+import asyncio
+import logging
+import os
+import time
+
+from fetcher import USER_AGENT
+
+logger = logging.getLogger(__name__)
+
+RENDER_CONCURRENCY = int(os.environ.get('RENDER_CONCURRENCY', 2))
+RENDER_TIMEOUT = float(os.environ.get('RENDER_TIMEOUT', 20))
+RENDER_PAGES_PER_CONTEXT = int(os.environ.get('RENDER_PAGES_PER_CONTEXT', 50))
+RENDER_RETRY_INTERVAL = float(os.environ.get('RENDER_RETRY_INTERVAL', 60))
+
+# Avalia cada cadeia de propriedades (ex.: "jQuery.fn.jquery") a partir de window
+EVALUATE_JS = """
+(chains) => {
+    const values = {};
+    for (const chain of chains) {
+        try {
+            let value = window;
+            for (const part of chain.split('.')) {
+                if (value === undefined || value === null || !(part in Object(value))) {
+                    value = undefined;
+                    break;
+                }
+                value = value[part];
+            }
+            if (value === undefined) continue;
+            values[chain] = ['string', 'number', 'boolean'].includes(typeof value) ? String(value) : '';
+        } catch (e) {}
+    }
+    return values;
+}
+"""
+
+class RenderError(Exception):
+    """Falha ao renderizar a página no navegador"""
+
+class BrowserUnavailable(RenderError):
+    """O navegador headless não pôde ser iniciado (Playwright ou Chromium ausentes)"""
+
+class RenderedPage:
+    """Resultado de uma renderização: DOM final, cabeçalhos, cookies e valores JS"""
+
+    __slots__ = ("url", "status_code", "html", "headers", "cookies", "js")
+
+    def __init__(self, url, status_code, html, headers, cookies, js):
+        self.url = url
+        self.status_code = status_code
+        self.html = html
+        self.headers = headers
+        self.cookies = cookies
+        self.js = js
+
+def render_available():
+    """Indica se o Playwright está instalado (o navegador pode faltar: veja BrowserPool.probe)"""
+    try:
+        import playwright.async_api  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def parse_cookie_header(cookie, url):
+    """Converte 'a=1; b=2' no formato de cookies do Playwright"""
+    cookies = []
+    for item in cookie.split(';'):
+        name, sep, value = item.strip().partition('=')
+        if sep and name:
+            cookies.append({"name": name, "value": value, "url": url})
+    return cookies
+
+class BrowserPool:
+    """Pool de contextos de navegador de longa duração, usado no loop do FETCHER"""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        # Após um fork (gunicorn) o navegador do processo pai não pertence ao filho
+        self._playwright = None
+        self._browser = None
+        self._contexts = None
+        self._start_lock = None
+        self._failed_at = None
+        self.launch_error = None
+        self.renders = 0
+        self.recycled = 0
+
+    async def _start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+
+            # Falha recente: não tentar lançar o Chromium a cada requisição
+            if self._failed_at is not None and time.monotonic() - self._failed_at < RENDER_RETRY_INTERVAL:
+                raise BrowserUnavailable(f"Browser unavailable: {self.launch_error}")
+
+            try:
+                self._browser = await self._launch()
+            except Exception as e:
+                self._browser = None
+                self._failed_at = time.monotonic()
+                self.launch_error = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+                logger.error(f"Não foi possível iniciar o navegador headless: {self.launch_error}")
+                raise BrowserUnavailable(f"Browser unavailable: {self.launch_error}") from e
+            self._failed_at = None
+            self.launch_error = None
+
+            # Fila de contextos livres: (contexto ou None, páginas já renderizadas)
+            self._contexts = asyncio.Queue()
+            for _ in range(RENDER_CONCURRENCY):
+                self._contexts.put_nowait((None, 0))
+
+            logger.info(f"Navegador headless iniciado com {RENDER_CONCURRENCY} contextos.")
+
+    async def _launch(self):
+        from playwright.async_api import async_playwright
+
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        return await self._playwright.chromium.launch(headless=True)
+
+    async def probe(self):
+        """Inicia o navegador se ainda não estiver rodando; retorna se ele está disponível"""
+        try:
+            await self._start()
+            return True
+        except BrowserUnavailable:
+            return False
+
+    def available(self):
+        """Navegador iniciado com sucesso neste processo (sem tentar iniciá-lo)"""
+        return self._browser is not None and self._browser.is_connected()
+
+    def state(self):
+        """'running', 'failed' (última tentativa falhou) ou 'idle' (inicia na primeira render=true)"""
+        if self.available():
+            return "running"
+        return "failed" if self.launch_error is not None else "idle"
+
+    async def _new_context(self):
+        return await self._browser.new_context(user_agent=USER_AGENT, ignore_https_errors=True)
+
+    async def render(self, url, timeout=None, cookie='', js_chains=()):
+        """Renderiza a URL num contexto livre e avalia as cadeias de propriedades JS"""
+        timeout = min(timeout or RENDER_TIMEOUT, RENDER_TIMEOUT)
+
+        await self._start()
+
+        context, uses = await self._contexts.get()
+        try:
+            if context is None or uses >= RENDER_PAGES_PER_CONTEXT:
+                if context is not None:
+                    self.recycled += 1
+                    await context.close()
+                context, uses = await self._new_context(), 0
+
+            try:
+                async with asyncio.timeout(timeout):
+                    page = await self._render_page(context, url, timeout, cookie, js_chains)
+            except TimeoutError:
+                raise RenderError(f"Render timeout of {timeout}s exceeded for url '{url}'")
+            finally:
+                await context.clear_cookies()
+
+            uses += 1
+            self.renders += 1
+            return page
+        except RenderError:
+            raise
+        except Exception as e:
+            # Contexto possivelmente quebrado: descartar e criar outro na próxima vez
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            context = None
+            raise RenderError(str(e)) from e
+        finally:
+            self._contexts.put_nowait((context, uses))
+
+    async def _render_page(self, context, url, timeout, cookie, js_chains):
+        if cookie:
+            await context.add_cookies(parse_cookie_header(cookie, url))
+
+        page = await context.new_page()
+        try:
+            response = await page.goto(url, wait_until="load", timeout=timeout * 1000)
+            if response is None:
+                raise RenderError(f"No response for url '{url}'")
+            if response.status >= 400:
+                raise RenderError(f"HTTP {response.status} for url '{url}'")
+
+            # Dar tempo aos scripts assíncronos, sem ultrapassar o prazo da renderização
+            try:
+                await page.wait_for_load_state("networkidle", timeout=timeout * 500)
+            except Exception:
+                pass
+
+            js = await page.evaluate(EVALUATE_JS, list(js_chains)) if js_chains else {}
+            html = await page.content()
+            headers = await response.all_headers()
+            cookies = {item["name"]: item["value"] for item in await context.cookies()}
+            return RenderedPage(url, response.status, html, headers, cookies, js)
+        finally:
+            await page.close()
+
+    def stats(self):
+        return {
+            "available": self.available(),
+            "state": self.state(),
+            "installed": render_available(),
+            "launch_error": self.launch_error,
+            "concurrency": RENDER_CONCURRENCY,
+            "renders": self.renders,
+            "recycled_contexts": self.recycled
+        }
+
+RENDERER = BrowserPool()
+os.register_at_fork(after_in_child=RENDERER._reset)
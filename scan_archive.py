@@ -0,0 +1,390 @@
+"""Varredura offline de páginas arquivadas (WARC ou JSONL) com vários processos.
+
+Uso:
+    python scan_archive.py ENTRADA [ENTRADA ...] -o resultados.jsonl [--format jsonl|parquet]
+                           [--workers N] [--resume] [--checkpoint arquivo] [--flush-every N]
+
+Entradas:
+    *.warc, *.warc.gz   registros "response" (HTTP completo); só respostas HTML são analisadas
+    *.jsonl, *.jsonl.gz um objeto por linha, no formato do POST /analyze:
+                        {"url", "html" ou "html_base64", "headers", "cookies"}
+
+A base de fingerprints é carregada e todas as regexes são compiladas antes de
+criar o pool, para que os processos filhos (fork) compartilhem os padrões via
+copy-on-write. Os resultados saem na ordem das entradas, uma linha JSON por
+página (ou, com --format parquet, arquivos part-NNNNN.parquet num diretório;
+requer pyarrow). A cada --flush-every páginas a saída é gravada em disco e o
+checkpoint atualizado; --resume continua do último checkpoint, descartando o
+que foi escrito depois dele. O progresso (páginas/s) sai no stderr.
+"""
+import argparse
+import base64
+import gc
+import glob
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+from collections import deque
+
+logging.disable(logging.CRITICAL)
+
+import app  # noqa: E402
+
+logging.disable(logging.NOTSET)
+
+PARQUET_FIELDS = ("url", "record_id", "fingerprints_version", "truncated", "error", "technologies")
+
+
+def open_input(path):
+    """Abre o arquivo de entrada em modo binário, descompactando gzip (inclusive um membro por registro)"""
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    return gzip.open(path, "rb") if magic == b"\x1f\x8b" else open(path, "rb")
+
+
+def input_kind(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".warc"):
+        return "warc"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise ValueError(f"formato de entrada desconhecido: {path}")
+
+
+def read_warc(stream):
+    """Gera (cabeçalhos WARC, bloco) de cada registro do arquivo"""
+    while True:
+        line = stream.readline()
+        if not line:
+            return
+        if not line.strip():
+            continue
+        if not line.startswith(b"WARC/"):
+            raise ValueError(f"registro WARC inválido: {line[:40]!r}")
+
+        headers = {}
+        for line in iter(stream.readline, b""):
+            if not line.strip():
+                break
+            name, _, value = line.decode("utf-8", "replace").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        block = stream.read(int(headers.get("content-length", 0)))
+        yield headers, block
+
+
+def read_records(path):
+    """Gera (tipo, metadados, dados) dos registros a analisar; a decodificação fica para os processos filhos"""
+    kind = input_kind(path)
+    with open_input(path) as stream:
+        if kind == "jsonl":
+            for line in stream:
+                if line.strip():
+                    yield "jsonl", "", line
+            return
+
+        for headers, block in read_warc(stream):
+            if headers.get("warc-type") != "response" or not block.startswith(b"HTTP/"):
+                continue
+            yield "warc", (headers.get("warc-target-uri", ""), headers.get("warc-record-id", "")), block
+
+
+def dechunk(body):
+    """Remove a codificação chunked do corpo HTTP (tolerando registros cortados)"""
+    chunks = []
+    position = 0
+    while position < len(body):
+        end = body.find(b"\r\n", position)
+        if end < 0:
+            break
+        try:
+            size = int(body[position:end].split(b";")[0], 16)
+        except ValueError:
+            break
+        if size == 0:
+            break
+        chunks.append(body[end + 2:end + 2 + size])
+        position = end + 4 + size
+    return b"".join(chunks)
+
+
+def decode_content(body, encoding, max_bytes):
+    """Desfaz gzip/deflate do corpo, parando em max_bytes; retorna (conteúdo, truncado)"""
+    if encoding in ("gzip", "x-gzip"):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        decompressor = zlib.decompressobj()
+    elif encoding in ("", "identity"):
+        return body[:max_bytes], len(body) > max_bytes
+    else:
+        raise ValueError(f"unsupported content-encoding: {encoding}")
+
+    content = decompressor.decompress(body, max_bytes)
+    return content, bool(decompressor.unconsumed_tail)
+
+
+def parse_http_response(block, max_bytes):
+    """Separa cabeçalhos e corpo de uma resposta HTTP gravada no WARC"""
+    head, _, body = block.partition(b"\r\n\r\n")
+    lines = head.decode("iso-8859-1").split("\r\n")[1:]
+    headers = []
+    for line in lines:
+        name, separator, value = line.partition(":")
+        if separator:
+            headers.append((name.strip(), value.strip()))
+
+    values = {}
+    for name, value in headers:
+        values.setdefault(name.lower(), value.lower())
+    if "chunked" in values.get("transfer-encoding", ""):
+        body = dechunk(body)
+    body, truncated = decode_content(body, values.get("content-encoding", ""), max_bytes)
+    return headers, body, values.get("content-type", ""), truncated
+
+
+def scan_record(record):
+    """Analisa um registro no processo filho; None para respostas que não são HTML"""
+    kind, meta, data = record
+    url, record_id = meta if kind == "warc" else ("", "")
+    max_bytes = app.ANALYZE_MAX_BYTES
+    try:
+        cookies = None
+        if kind == "warc":
+            headers, html, content_type, truncated = parse_http_response(data, max_bytes)
+            if content_type and "html" not in content_type:
+                return None
+        else:
+            payload = json.loads(data)
+            url = payload.get("url", "")
+            record_id = payload.get("id", "")
+            headers = payload.get("headers") or {}
+            cookies = payload.get("cookies")
+            html = payload.get("html") or ""
+            if "html_base64" in payload:
+                html = base64.b64decode(payload["html_base64"])
+            # Limite em bytes (texto em UTF-8); gzip é descompactado (uma vez, com o limite) em analyze
+            html, truncated = app.truncate_html(html, max_bytes)
+
+        result = app.analyze(html, headers, cookies, url, max_bytes=max_bytes)
+    except Exception as e:
+        return {"url": url, "record_id": record_id, "error": str(e)}
+
+    result["record_id"] = record_id
+    result["truncated"] = truncated
+    return result
+
+
+class JsonlOutput:
+    """Saída JSONL com escrita em ordem e posição confirmada a cada checkpoint"""
+
+    def __init__(self, path, position=0):
+        self.file = open(path, "r+b" if position else "wb")
+        self.file.truncate(position)
+        self.file.seek(position)
+
+    def write(self, result):
+        self.file.write(json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def flush(self):
+        """Grava em disco; retorna o estado a guardar no checkpoint"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"position": self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetOutput:
+    """Saída Parquet: um arquivo part-NNNNN.parquet completo a cada flush"""
+
+    def __init__(self, directory, part=0):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.directory = directory
+        self.part = part
+        self.rows = []
+        os.makedirs(directory, exist_ok=True)
+
+        # Partes gravadas depois do último checkpoint serão refeitas
+        for path in glob.glob(os.path.join(directory, "part-*.parquet")):
+            if int(os.path.basename(path)[5:10]) >= part:
+                os.remove(path)
+
+        technology = pyarrow.struct([
+            ("name", pyarrow.string()),
+            ("version", pyarrow.string()),
+            ("confidence", pyarrow.int32()),
+            ("categories", pyarrow.list_(pyarrow.int32())),
+            ("matched_patterns", pyarrow.list_(pyarrow.string())),
+        ])
+        self.schema = pyarrow.schema([
+            ("url", pyarrow.string()),
+            ("record_id", pyarrow.string()),
+            ("fingerprints_version", pyarrow.string()),
+            ("truncated", pyarrow.bool_()),
+            ("error", pyarrow.string()),
+            ("technologies", pyarrow.list_(technology)),
+        ])
+
+    def write(self, result):
+        row = {field: result.get(field) for field in PARQUET_FIELDS}
+        row["technologies"] = [
+            {
+                "name": name,
+                "version": info.get("version", ""),
+                "confidence": info.get("confidence", 100),
+                "categories": info.get("categories", []),
+                "matched_patterns": info.get("matched_patterns", []),
+            }
+            for name, info in (result.get("technologies") or {}).items()
+        ]
+        self.rows.append(row)
+
+    def flush(self):
+        if self.rows:
+            path = os.path.join(self.directory, f"part-{self.part:05d}.parquet")
+            table = self.pyarrow.Table.from_pylist(self.rows, schema=self.schema)
+            self.parquet.write_table(table, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+            self.part += 1
+            self.rows = []
+        return {"part": self.part}
+
+    def close(self):
+        pass
+
+
+def load_checkpoint(path, inputs):
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("inputs") != inputs:
+        raise SystemExit(f"Checkpoint {path} é de outras entradas; remova-o ou rode sem --resume")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+def pending_records(inputs, start_file, start_record):
+    """Registros de todas as entradas a partir da posição do checkpoint, com (arquivo, índice)"""
+    for file_index, path in enumerate(inputs):
+        if file_index < start_file:
+            continue
+        for record_index, record in enumerate(read_records(path)):
+            if file_index == start_file and record_index < start_record:
+                continue
+            yield (file_index, record_index), record
+
+
+def with_positions(records, positions):
+    """Repassa só o registro ao pool e enfileira a posição de cada um, na mesma ordem dos resultados"""
+    for position, record in records:
+        positions.append(position)
+        yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="arquivos WARC ou JSONL (gzip aceito)")
+    parser.add_argument("-o", "--output", required=True, help="arquivo JSONL ou diretório Parquet de saída")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processos de análise")
+    parser.add_argument("--chunksize", type=int, default=16, help="registros enviados por vez a cada processo")
+    parser.add_argument("--flush-every", type=int, default=1000, help="páginas entre checkpoints")
+    parser.add_argument("--checkpoint", help="arquivo de checkpoint (padrão: SAÍDA.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="continuar do último checkpoint")
+    parser.add_argument("--progress", type=float, default=10.0, help="segundos entre relatórios de progresso")
+    args = parser.parse_args()
+
+    inputs = [os.path.abspath(path) for path in args.inputs]
+    for path in inputs:
+        input_kind(path)
+    checkpoint_path = args.checkpoint or f"{args.output.rstrip(os.sep)}.checkpoint.json"
+
+    checkpoint = load_checkpoint(checkpoint_path, inputs) if args.resume else None
+    if checkpoint is None:
+        checkpoint = {"inputs": inputs, "file": 0, "record": 0, "pages": 0, "errors": 0, "output": {}}
+    elif checkpoint.get("fingerprints_version") != app.DATABASE.version:
+        print(f"AVISO: checkpoint gerado com a base {checkpoint.get('fingerprints_version')}, "
+              f"base atual {app.DATABASE.version}", file=sys.stderr)
+
+    if args.format == "parquet":
+        try:
+            output = ParquetOutput(args.output, checkpoint["output"].get("part", 0))
+        except ImportError:
+            raise SystemExit("--format parquet requer pyarrow (pip install pyarrow)")
+    else:
+        output = JsonlOutput(args.output, checkpoint["output"].get("position", 0))
+
+    # Compilar tudo e congelar os objetos antes do fork: os filhos compartilham as páginas de memória
+    app.DATABASE.compile_all()
+    gc.freeze()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    positions = deque()
+    records = with_positions(pending_records(inputs, checkpoint["file"], checkpoint["record"]), positions)
+    previous_pages, previous_errors = checkpoint["pages"], checkpoint["errors"]
+    pages = skipped = errors = 0
+    since_flush = 0
+    start = last_report = time.perf_counter()
+
+    def commit(position):
+        # A saída vai para o disco antes do checkpoint que aponta para depois dela
+        checkpoint["output"] = output.flush()
+        checkpoint["file"], checkpoint["record"] = position[0], position[1] + 1
+        checkpoint["pages"] = previous_pages + pages
+        checkpoint["errors"] = previous_errors + errors
+        checkpoint["fingerprints_version"] = app.DATABASE.version
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    with context.Pool(args.workers) as pool:
+        for result in pool.imap(scan_record, records, args.chunksize):
+            position = positions.popleft()
+            if result is None:
+                skipped += 1
+            else:
+                output.write(result)
+                pages += 1
+                errors += "error" in result
+            since_flush += 1
+
+            if since_flush >= args.flush_every:
+                commit(position)
+                since_flush = 0
+
+            now = time.perf_counter()
+            if args.progress and now - last_report >= args.progress:
+                last_report = now
+                print(f"{pages} páginas ({pages / (now - start):.1f}/s), {errors} erros, "
+                      f"{skipped} respostas não HTML ignoradas", file=sys.stderr)
+
+        if since_flush:
+            commit(position)
+    output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{pages} páginas analisadas em {elapsed:.1f}s ({pages / elapsed if elapsed else 0:.1f} páginas/s), "
+          f"{errors} erros, {skipped} respostas não HTML ignoradas; total com checkpoints anteriores: "
+          f"{checkpoint['pages']} páginas", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+/* Widget de atendimento carregado pela página de teste */
+window.intercomSettings = { app_id: "abc123" };
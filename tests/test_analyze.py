@@ -0,0 +1,49 @@
+import base64
+import gzip
+import json
+
+import app
+
+PAGE = '<html><head><meta name="generator" content="WordPress 6.4.2"></head><body>{}</body></html>'
+
+
+def post_base64(client, data):
+    return client.post('/analyze', json={"url": "https://example.com/", "html_base64": base64.b64encode(data).decode()})
+
+
+def test_analyze_accepts_gzipped_html(client):
+    response = post_base64(client, gzip.compress(PAGE.format("").encode()))
+    assert response.status_code == 200
+    assert "WordPress" in response.get_json()["technologies"]
+
+
+def test_analyze_rejects_gzip_larger_than_the_limit(client, monkeypatch):
+    monkeypatch.setattr(app, "ANALYZE_MAX_BYTES", 10_000)
+    response = post_base64(client, gzip.compress(PAGE.format("x" * 50_000).encode()))
+    assert response.status_code == 413
+
+
+def test_analyze_decompresses_only_once(client, monkeypatch):
+    # Gzip dentro de gzip: a camada interna não pode escapar do limite
+    monkeypatch.setattr(app, "ANALYZE_MAX_BYTES", 10_000)
+    inner = gzip.compress(PAGE.format("x" * 5_000_000).encode())
+    response = post_base64(client, gzip.compress(inner))
+
+    assert response.status_code == 200
+    assert "WordPress" not in response.get_json()["technologies"]
+
+
+def test_analyze_library_limits_decompressed_size():
+    data = gzip.compress(gzip.compress(PAGE.format("x" * 100_000).encode()))
+    result = app.analyze(data, max_bytes=len(gzip.decompress(data)))
+    assert "WordPress" not in result["technologies"]
+
+
+def test_analyze_measures_text_html_in_bytes(client, monkeypatch):
+    # 3 bytes UTF-8 por caractere: 6.000 caracteres passam de 10.000 bytes
+    monkeypatch.setattr(app, "ANALYZE_MAX_BYTES", 10_000)
+    body = json.dumps({"url": "https://example.com/", "html": PAGE.format("€" * 6_000)}, ensure_ascii=False)
+    response = client.post('/analyze', data=body.encode(), content_type='application/json')
+
+    assert response.status_code == 200
+    assert response.get_json()["truncated"] is True
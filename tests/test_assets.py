@@ -0,0 +1,52 @@
+import app
+
+
+def page(static_server, query):
+    url = f'{static_server}/assets/index.html'
+    html = ('<html><head><meta name="generator" content="WordPress 6.4.2">'
+            f'<script src="/assets/chat-widget.js?{query}"></script>'
+            f'<script src="/assets/missing.js?{query}"></script></head></html>')
+    return url, html
+
+
+def count_downloads(monkeypatch):
+    downloads = []
+    fetch_assets_async = app.fetch_assets_async
+
+    def record(urls):
+        downloads.extend(urls)
+        return fetch_assets_async(urls)
+
+    monkeypatch.setattr(app, 'fetch_assets_async', record)
+    return downloads
+
+
+def test_external_script_matches_scripts_fingerprints(static_server):
+    url, html = page(static_server, 'detect')
+
+    assert 'Intercom' not in app.analyze_page(url, html, {})["technologies"]
+    assert 'Intercom' in app.analyze_page(url, html, {}, assets=True)["technologies"]
+
+
+def test_repeated_asset_is_downloaded_once(static_server, monkeypatch):
+    downloads = count_downloads(monkeypatch)
+    url, html = page(static_server, 'repeated')
+
+    first = app.analyze_page(url, html, {}, assets=True)
+    second = app.analyze_page(url, html, {}, assets=True)
+
+    assert 'Intercom' in first["technologies"] and 'Intercom' in second["technologies"]
+    widget = [asset for asset in downloads if 'chat-widget' in asset]
+    assert len(widget) == 1
+
+
+def test_large_or_failed_assets_do_not_break_detection(static_server, monkeypatch):
+    monkeypatch.setattr(app, 'ASSET_MAX_BYTES', 16)
+    failed = app.ASSET_STATS["failed"]
+    url, html = page(static_server, 'large')
+
+    technologies = app.analyze_page(url, html, {}, assets=True)["technologies"]
+
+    assert 'WordPress' in technologies
+    assert 'Intercom' not in technologies
+    assert app.ASSET_STATS["failed"] == failed + 1
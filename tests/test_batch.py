@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize('payload', [
+    ["http://example.com/"],
+    "http://example.com/",
+    {"urls": []},
+    {"urls": ["http://example.com/"], "timeout": "soon"},
+    {"urls": ["http://example.com/"], "cache": "forever"},
+    {"urls": ["http://example.com/"], "render": True},
+    {"urls": ["http://example.com/"], "depth": 1},
+    {"urls": ["http://example.com/"], "cookie": 42},
+])
+def test_detect_batch_rejects_invalid_payload(client, payload):
+    response = client.post('/detect/batch', json=payload)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_detect_batch_streams_one_result_per_url(client, static_server):
+    urls = [f'{static_server}/render/static.html', 'http://127.0.0.1:1/unreachable']
+    response = client.post('/detect/batch', json={"urls": urls, "cache": "bypass", "timeout": "5"})
+    assert response.status_code == 200
+
+    results = {result["url"]: result for result in map(json.loads, response.get_data(as_text=True).splitlines())}
+    assert set(results) == set(urls)
+    assert "WordPress" in results[urls[0]]["technologies"]
+    assert "error" in results[urls[1]]
+
+
+def test_detect_batch_reports_invalid_urls_without_aborting(client, static_server):
+    ok = f'{static_server}/render/static.html'
+    urls = [ok + '?first', 'http://x:abc/', ok + '?last']
+    response = client.post('/detect/batch', json={"urls": urls})
+    assert response.status_code == 200
+
+    results = {result["url"]: result for result in map(json.loads, response.get_data(as_text=True).splitlines())}
+    assert set(results) == set(urls)
+    assert "error" in results['http://x:abc/']
+    assert "WordPress" in results[ok + '?first']["technologies"]
+    assert "WordPress" in results[ok + '?last']["technologies"]
@@ -0,0 +1,71 @@
+import app
+from cache import MemoryCache
+
+
+def test_detect_reports_miss_hit_and_refresh(client, static_server):
+    url = f'{static_server}/render/static.html?b=2&a=1'
+
+    first = client.get('/detect', query_string={'url': url})
+    assert first.headers['X-Cache'] == 'MISS'
+    assert 'WordPress' in first.get_json()['technologies']
+
+    # Mesma URL normalizada: ordem da query e fragmento não importam
+    again = client.get('/detect', query_string={'url': f'{static_server}/render/static.html?a=1&b=2#top'})
+    assert again.headers['X-Cache'] == 'HIT'
+    assert again.get_json()['technologies'] == first.get_json()['technologies']
+
+    assert client.get('/detect', query_string={'url': url, 'cache': 'refresh'}).headers['X-Cache'] == 'MISS'
+    assert client.get('/detect', query_string={'url': url}).headers['X-Cache'] == 'HIT'
+    assert client.get('/detect', query_string={'url': url, 'cache': 'bypass'}).headers['X-Cache'] == 'MISS'
+
+
+def test_memory_cache_evicts_least_recently_used_and_expired_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('cache.time.time', lambda: now[0])
+    cache = MemoryCache(max_entries=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+    now[0] += 61
+    assert cache.get('a') is None
+
+
+def revalidate(client, monkeypatch, url):
+    """Detecta duas vezes sem o cache de resultados, para a segunda passar pela revalidação"""
+    monkeypatch.setattr(app, 'RESULT_CACHE', None)
+    before = dict(app.REVALIDATION_STATS)
+    first = client.get('/detect', query_string={'url': url}).get_json()
+    second = client.get('/detect', query_string={'url': url}).get_json()
+    return first, second, {kind: app.REVALIDATION_STATS[kind] - before[kind] for kind in before}
+
+
+def test_not_modified_reuses_the_stored_result(client, static_server, monkeypatch):
+    sent = []
+    fetch_page = app.fetch_page
+    monkeypatch.setattr(app, 'fetch_page', lambda url, timeout, cookie, headers: (
+        sent.append(headers) or fetch_page(url, timeout, cookie, headers)))
+
+    first, second, stats = revalidate(client, monkeypatch, f'{static_server}/render/static.html?revalidate')
+
+    assert 'If-Modified-Since' in sent[1]
+    assert stats == {"not_modified": 1, "unchanged_body": 0}
+    assert second == first
+
+
+def test_unchanged_body_reuses_the_stored_result(client, static_server, monkeypatch):
+    # Sem validadores na requisição o servidor responde 200; o hash do corpo evita a nova análise
+    monkeypatch.setattr(app, 'conditional_headers', lambda previous: {})
+    analyze_response = app.analyze_response
+    analyzed = []
+    monkeypatch.setattr(app, 'analyze_response', lambda *args: analyzed.append(args) or analyze_response(*args))
+
+    first, second, stats = revalidate(client, monkeypatch, f'{static_server}/render/static.html?unchanged')
+
+    assert stats == {"not_modified": 0, "unchanged_body": 1}
+    assert len(analyzed) == 1
+    assert second == first
@@ -0,0 +1,26 @@
+import app
+from cache import normalize_url
+
+
+def test_crawl_links_use_the_cache_normalization():
+    html = ('<a href="/a?y=2&x=1#top">a</a> <a href="HTTP://Example.com:80/a?x=1&y=2">a</a>'
+            '<a href="https://other.example/">b</a> <a href="/logo.png">c</a>')
+    origins = {app.url_origin(normalize_url('http://example.com/'))}
+
+    links = app.same_origin_links(html, 'http://example.com/', origins)
+    assert links == ['http://example.com/a?x=1&y=2', 'http://example.com/a?x=1&y=2']
+
+
+def crawled(static_server, max_pages):
+    result = app.crawl_site(f'{static_server}/crawl/index.html', 2, max_pages)
+    return [page["url"].removeprefix(static_server) for page in result["crawl"]["pages"]]
+
+
+def test_crawl_visits_each_same_origin_page_once(static_server):
+    pages = crawled(static_server, 10)
+
+    assert pages == ['/crawl/index.html', '/crawl/page1.html', '/crawl/docs/', '/crawl/page2.html']
+
+
+def test_crawl_stops_at_max_pages(static_server):
+    assert crawled(static_server, 2) == ['/crawl/index.html', '/crawl/page1.html']
@@ -0,0 +1,53 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+
+def slow_detection(monkeypatch, seconds):
+    """Troca download e análise por uma detecção que demora seconds; retorna a lista de downloads"""
+    fetched = []
+
+    def fetch_page(url, timeout=10, cookie='', extra_headers=None):
+        fetched.append(url)
+        time.sleep(seconds)
+        return None
+
+    monkeypatch.setattr(app, 'fetch_page', fetch_page)
+    monkeypatch.setattr(app, 'analyze_fetched', lambda *args: {"url": args[0], "technologies": {}})
+    return fetched
+
+
+def detect(url, **args):
+    return app.detect_url(app.detect_options(dict(args, url=url)))
+
+
+def test_waiters_wait_for_the_leader_beyond_their_own_timeout(monkeypatch):
+    fetched = slow_detection(monkeypatch, 1.5)
+    url = 'https://coalesce.example/slow'
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(detect, url, cache='bypass')
+        time.sleep(0.2)
+        waiter = pool.submit(detect, url, cache='bypass', timeout='1')
+
+        assert leader.result()[1] == 'MISS'
+        assert waiter.result()[1] == 'COALESCED'
+    assert len(fetched) == 1
+
+
+def test_refresh_does_not_join_a_regular_detection(monkeypatch):
+    fetched = slow_detection(monkeypatch, 0.5)
+    url = 'https://coalesce.example/refresh'
+    started = threading.Event()
+
+    with ThreadPoolExecutor(2) as pool:
+        regular = pool.submit(lambda: started.set() or detect(url))
+        started.wait()
+        time.sleep(0.1)
+        refresh = pool.submit(detect, url, cache='refresh')
+
+        assert regular.result()[1] == 'MISS'
+        assert refresh.result()[1] == 'MISS'
+    assert len(fetched) == 2
@@ -0,0 +1,46 @@
+import copy
+import json
+import os
+
+import app
+from benchmarks.fixture_server import load_corpus
+from conftest import ROOT
+
+
+def detect(page, database):
+    return app.analyze(page['html'], page['headers'], url=page['url'], database=database)['technologies']
+
+
+def test_artifact_round_trip_detects_the_same_technologies(tmp_path):
+    source = os.path.join(ROOT, 'technologies.json')
+    database = app.load_database(source, None)
+    artifact_path = tmp_path / 'technologies.compiled.json'
+    artifact_path.write_text(json.dumps(app.database_to_artifact(database), separators=(',', ':')))
+
+    loaded = app.load_database(source, str(artifact_path))
+    assert loaded.source == 'artifact'
+    assert artifact_path.stat().st_size < os.path.getsize(source)
+
+    for page in load_corpus():
+        assert detect(page, loaded) == detect(page, database), page['file']
+
+
+def test_prefilter_does_not_change_detections():
+    database = app.load_database(os.path.join(ROOT, 'technologies.json'), None)
+    unfiltered = copy.copy(database)
+    unfiltered.prefilter = None
+
+    for page in load_corpus():
+        assert detect(page, database) == detect(page, unfiltered), page['file']
+
+
+def test_json_path_compiles_each_pattern_once_with_the_search_engine(monkeypatch):
+    calls = []
+    compile_regex = app.compile_regex
+    monkeypatch.setattr(app, 'compile_regex', lambda *args: calls.append(args) or compile_regex(*args))
+    monkeypatch.setattr(app, 'safe_compile_regex', lambda *args: calls.append(args))
+
+    pattern = app.parse_pattern('jquery[.-]([\\d.]+)\\;version:\\1')
+
+    assert len(calls) == 1
+    assert pattern.engine and pattern.regex.search('jquery-3.7.1').group(1) == '3.7.1'
@@ -0,0 +1,113 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app
+import jobs
+from jobs import JobScheduler, JobStore
+
+
+@pytest.fixture
+def webhook():
+    """Servidor que guarda os corpos recebidos; responde com o status da lista statuses (200 ao esgotá-la)"""
+    received, statuses = [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            self.send_response(statuses.pop(0) if statuses else 200)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/hook', received, statuses
+    server.shutdown()
+
+
+def test_claim_follows_arrival_order_and_the_per_host_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_HOST_INTERVAL', 0)
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    first = store.create({"url": "https://a.example/1"}, "a.example")
+    second = store.create({"url": "https://a.example/2"}, "a.example")
+    other = store.create({"url": "https://b.example/"}, "b.example")
+
+    assert store.claim("worker")["id"] == first
+    assert store.claim("worker")["id"] == other
+    assert store.claim("worker") is None
+
+    store.finish(first, {"url": "https://a.example/1", "technologies": {}})
+    assert store.claim("worker")["id"] == second
+    assert store.get(first)["status"] == "done"
+    assert store.counts() == {"queued": 0, "running": 2, "done": 1, "failed": 0}
+
+
+def test_expired_lease_requeues_until_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_HOST_INTERVAL', 0)
+    monkeypatch.setattr(jobs, 'JOB_LEASE', -1)
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    job_id = store.create({"url": "https://a.example/"}, "a.example")
+
+    for attempt in range(1, jobs.JOB_MAX_ATTEMPTS + 1):
+        assert store.claim("worker")["attempts"] == attempt - 1
+    assert store.claim("worker") is None
+
+    job = store.get(job_id)
+    assert job["status"] == "failed" and "interrupted" in job["error"]
+
+
+def test_webhook_receives_the_finished_job(tmp_path, webhook, monkeypatch):
+    url, received, statuses = webhook
+    monkeypatch.setattr(jobs.time, 'sleep', lambda seconds: None)
+    statuses.append(500)
+    scheduler = JobScheduler(str(tmp_path / 'jobs.sqlite3'), lambda params: {"url": params["url"], "technologies": {}})
+    job_id = scheduler.store.create({"url": "https://a.example/"}, "a.example", url)
+
+    scheduler._execute(scheduler.store.claim("worker"))
+
+    job = scheduler.store.get(job_id)
+    assert job["status"] == "done"
+    assert job["webhook"] == {"url": url, "status": "delivered (200)"}
+    assert len(received) == 2 and received[-1]["id"] == job_id and received[-1]["status"] == "done"
+
+
+def test_webhook_failure_is_recorded(tmp_path, webhook, monkeypatch):
+    url, received, statuses = webhook
+    monkeypatch.setattr(jobs.time, 'sleep', lambda seconds: None)
+    statuses.extend([503] * jobs.JOB_WEBHOOK_RETRIES)
+    scheduler = JobScheduler(str(tmp_path / 'jobs.sqlite3'), lambda params: {"error": "boom", "url": params["url"]})
+    job_id = scheduler.store.create({"url": "https://a.example/"}, "a.example", url)
+
+    scheduler._execute(scheduler.store.claim("worker"))
+
+    job = scheduler.store.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "boom"
+    assert job["webhook"]["status"].startswith("failed:")
+    assert len(received) == jobs.JOB_WEBHOOK_RETRIES
+
+
+def test_job_api_runs_the_detection(client, static_server, tmp_path, webhook, monkeypatch):
+    url, received, _ = webhook
+    scheduler = JobScheduler(str(tmp_path / 'jobs.sqlite3'), app.run_job)
+    monkeypatch.setattr(app, 'JOBS', scheduler)
+
+    assert client.post('/jobs', json={"callback_url": url}).status_code == 400
+    assert client.post('/jobs', json={"url": static_server, "callback_url": "file:///tmp/x"}).status_code == 400
+
+    response = client.post('/jobs', json={"url": f'{static_server}/render/static.html?job', "callback_url": url})
+    assert response.status_code == 202
+    job_id = response.get_json()["id"]
+    assert client.get(f'/jobs/{job_id}').get_json()["status"] == "queued"
+
+    scheduler._execute(scheduler.store.claim("worker"))
+
+    job = client.get(f'/jobs/{job_id}').get_json()
+    assert job["status"] == "done"
+    assert 'WordPress' in job["result"]["technologies"]
+    assert job["webhook"]["status"] == "delivered (200)"
+    assert received[-1]["result"] == job["result"]
+    assert client.get('/jobs/missing').status_code == 404
@@ -0,0 +1,54 @@
+from metrics import Metrics
+
+
+def test_render_sums_counters_and_histograms_across_processes(tmp_path):
+    # Duas instâncias no mesmo arquivo fazem o papel de dois workers
+    path = str(tmp_path / 'metrics.sqlite3')
+    first, second = Metrics(path), Metrics(path)
+    first.detections.inc(mode="fetch")
+    first.observe_phases({"parse": 0.002})
+    second.detections.inc(2, mode="fetch")
+    second.observe_phases({"parse": 0.2})
+    second.flush()
+
+    text = first.render()
+    assert 'wappalyzer_detections_total{mode="fetch"} 3.0' in text
+    assert 'wappalyzer_phase_seconds_count{phase="parse"} 2' in text
+    assert 'wappalyzer_phase_seconds_bucket{phase="parse",le="0.005"} 1' in text
+    assert 'pid=' not in text
+
+
+def test_render_keeps_latest_value_of_each_process(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite3')
+    worker = Metrics(path)
+    worker.detections.inc(mode="fetch")
+    worker.flush()
+    worker.detections.inc(mode="fetch")
+
+    assert 'wappalyzer_detections_total{mode="fetch"} 2.0' in worker.render()
+
+
+def test_collectors_use_max_for_gauges(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite3')
+    first, second = Metrics(path), Metrics(path)
+    first.register(lambda: [("quarantined", "Padrões", "gauge", 1, {}), ("hits_total", "Acertos", "counter", 4, {})])
+    second.register(lambda: [("quarantined", "Padrões", "gauge", 3, {}), ("hits_total", "Acertos", "counter", 5, {})])
+    second.flush()
+
+    text = first.render()
+    assert 'quarantined 3' in text
+    assert 'hits_total 9' in text
+
+
+def test_flush_drops_label_sets_the_process_no_longer_reports(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite3')
+    worker = Metrics(path)
+    info = {"version": "old"}
+    worker.register(lambda: [("fingerprints_info", "Base", "gauge", 1, dict(info))])
+    worker.flush()
+    info["version"] = "new"
+    worker.flush()
+
+    text = worker.render()
+    assert 'fingerprints_info{version="new"} 1' in text
+    assert 'version="old"' not in text
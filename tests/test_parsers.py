@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+import parsers
+from benchmarks.fixture_server import CORPUS_DIR, load_corpus
+
+EDGE_CASES = {
+    "template": "<body><template><script src='/t.js'>var t = 1</script><meta name='generator' content='T'></template></body>",
+    "nested_template": "<body><template><div><template><link rel='stylesheet' href='/t.css'></template></div></template></body>",
+    "textarea": "<body><textarea><script src='/x.js'>var x = 1</script></textarea></body>",
+    "title": "<head><title><script src='/title.js'></script></title></head>",
+    "iframe": "<body><iframe><script src='/frame.js'></script></iframe></body>",
+    "xmp": "<body><xmp><style>.x {}</style></xmp></body>",
+    "noembed": "<body><noembed><script src='/noembed.js'></script></noembed></body>",
+    "plaintext": "<body><plaintext><script src='/plain.js'></script></body>",
+    "noscript": "<head><noscript><link rel='stylesheet' href='/n.css'></noscript></head>"
+                "<body><noscript><script src='/ns.js'></script></noscript></body>",
+    "comment": "<body><!-- <script src='/c.js'></script> --></body>",
+    "svg": "<body><svg><script>var s = 1</script><style>.s {}</style></svg></body>",
+    "script_with_markup": "<head><script>var a = '<style>.x {}</style><meta name=x>'</script></head>",
+    "empty": "",
+}
+
+CORPUS = {page["file"]: page["html"] for page in load_corpus()} if os.path.isdir(CORPUS_DIR) else {}
+BACKENDS = parsers.available_backends()
+
+
+def extracted(html, backend):
+    elements = parsers.parse_html(html, backend)
+    return {name: getattr(elements, name) for name in parsers.ParsedElements.__slots__}
+
+
+@pytest.mark.skipif(len(BACKENDS) < 2, reason="só um backend de parser instalado")
+@pytest.mark.parametrize("name", sorted(EDGE_CASES) + sorted(CORPUS))
+def test_backends_extract_the_same_elements(name):
+    html = EDGE_CASES.get(name, CORPUS.get(name))
+    results = {backend: extracted(html, backend) for backend in BACKENDS}
+    reference = results[BACKENDS[0]]
+    for backend, result in results.items():
+        assert result == reference, f"{backend} difere de {BACKENDS[0]} em {name}"
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_inert_containers_are_skipped(backend):
+    for name in ("template", "nested_template", "textarea", "title", "iframe", "xmp", "noembed", "plaintext"):
+        assert not any(extracted(EDGE_CASES[name], backend).values()), f"{backend} extraiu conteúdo de {name}"
@@ -0,0 +1,48 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+from conftest import ROOT
+
+HTML = '<html><head><meta name="generator" content="WordPress 6.4.2"></head><body>reload-marker</body></html>'
+
+
+def test_reload_swaps_the_database_without_disturbing_running_detections(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'DATABASE', app.DATABASE)
+    with open(f'{ROOT}/technologies.json', encoding='utf-8') as f:
+        technologies = json.load(f)
+    technologies["Reload Marker"] = {"cats": [1], "html": "reload-marker"}
+    path = tmp_path / 'technologies.json'
+    path.write_text(json.dumps(technologies), encoding='utf-8')
+
+    # A detecção em andamento para no meio, depois de pegar a base ativa
+    started, release = threading.Event(), threading.Event()
+    detect_technologies = app.detect_technologies
+
+    def paused(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return detect_technologies(*args, **kwargs)
+
+    monkeypatch.setattr(app, 'detect_technologies', paused)
+    previous = app.DATABASE
+    with ThreadPoolExecutor(1) as pool:
+        running = pool.submit(app.analyze, HTML)
+        assert started.wait(5)
+        previous_version, database = app.reload_database(str(path))
+        release.set()
+        old = running.result()
+    monkeypatch.setattr(app, 'detect_technologies', detect_technologies)
+
+    assert previous_version == previous.version
+    assert app.DATABASE is database and database is not previous
+    assert old["fingerprints_version"] == previous.version
+    assert 'Reload Marker' not in old["technologies"] and 'WordPress' in old["technologies"]
+
+    new = app.analyze(HTML)
+    assert new["fingerprints_version"] == database.version
+    assert {'Reload Marker', 'WordPress'} <= set(new["technologies"])
+
+    # Arquivo sem alterações: a mesma base continua ativa
+    assert app.reload_database(str(path)) == (database.version, database)
@@ -0,0 +1,91 @@
+"""Modo render=true contra páginas servidas localmente (requer Playwright e Chromium)"""
+import pytest
+
+import app
+
+
+@pytest.fixture(scope='module')
+def browser():
+    if not app.render_available() or not app.FETCHER.submit(app.RENDERER.probe()).result():
+        pytest.skip(f"navegador headless indisponível: {app.RENDERER.launch_error}")
+
+
+def detect(client, url, **params):
+    response = client.get('/detect', query_string=dict(url=url, cache='bypass', **params))
+    return response.status_code, response.get_json()
+
+
+def test_render_static_page(client, static_server, browser):
+    status, result = detect(client, f'{static_server}/render/static.html', render='true')
+
+    assert status == 200
+    assert result['technologies']['WordPress']['version'] == '6.4.2'
+    assert result['technologies']['jQuery']['version'] == '3.7.1'
+    assert 'PHP' in result['technologies']
+
+
+def test_render_sees_js_injected_markers(client, static_server, browser):
+    url = f'{static_server}/render/js_markers.html'
+
+    # Sem renderizar, o meta e as variáveis globais não existem
+    status, fetched = detect(client, url)
+    assert status == 200
+    assert 'WordPress' not in fetched['technologies']
+    assert 'jQuery' not in fetched['technologies']
+
+    status, rendered = detect(client, url, render='true')
+    assert status == 200
+    assert rendered['technologies']['WordPress']['version'] == '6.4.2'
+    assert rendered['technologies']['jQuery']['version'] == '3.7.1'
+    assert 'HubSpot Chat' in rendered['technologies']
+
+
+def test_render_status_reports_running_browser(client, browser):
+    render = client.get('/status').get_json()['render']
+
+    assert render['available'] is True
+    assert render['state'] == 'running'
+    assert render['launch_error'] is None
+
+
+def test_status_does_not_launch_the_browser(client, monkeypatch):
+    launches = []
+
+    async def launch():
+        launches.append(1)
+        raise RuntimeError("should not launch")
+
+    monkeypatch.setattr(app.RENDERER, '_launch', launch)
+    monkeypatch.setattr(app.RENDERER, '_browser', None)
+    monkeypatch.setattr(app.RENDERER, '_failed_at', None)
+    monkeypatch.setattr(app.RENDERER, 'launch_error', None)
+
+    render = client.get('/status').get_json()['render']
+    assert launches == []
+    assert render['state'] == 'idle'
+    assert render['available'] is False
+
+
+def test_browser_unavailable_returns_503(client, static_server, monkeypatch):
+    async def launch():
+        raise RuntimeError("Executable doesn't exist at /ms-playwright/chromium/chrome-linux/chrome")
+
+    monkeypatch.setattr(app.RENDERER, '_launch', launch)
+    monkeypatch.setattr(app.RENDERER, '_browser', None)
+    monkeypatch.setattr(app.RENDERER, '_failed_at', None)
+    monkeypatch.setattr(app.RENDERER, 'launch_error', None)
+
+    status, result = detect(client, f'{static_server}/render/static.html', render='true')
+    assert status == 503
+    assert 'Browser unavailable' in result['error']
+
+    # A falha fica guardada: o /status a reporta sem tentar de novo
+    render = client.get('/status').get_json()['render']
+    assert render['available'] is False
+    assert render['state'] == 'failed'
+    assert "Executable doesn't exist" in render['launch_error']
+
+    # Sem render=true a detecção continua funcionando
+    status, result = detect(client, f'{static_server}/render/static.html')
+    assert status == 200
+    assert 'WordPress' in result['technologies']
@@ -0,0 +1,82 @@
+import base64
+import gzip
+import json
+import subprocess
+import sys
+
+import app
+import scan_archive
+from conftest import ROOT
+
+PAGE = '<html><head><meta name="generator" content="WordPress 6.4.2"></head><body>{}</body></html>'
+
+
+def warc_record(kind, uri, block):
+    head = (f"WARC/1.0\r\nWARC-Type: {kind}\r\nWARC-Target-URI: {uri}\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uri[-1]}>\r\nContent-Length: {len(block)}\r\n\r\n")
+    return gzip.compress(head.encode() + block + b"\r\n\r\n")
+
+
+def chunked(body):
+    return b"".join(b"%x\r\n%s\r\n" % (len(body[i:i + 50]), body[i:i + 50]) for i in range(0, len(body), 50)) + b"0\r\n\r\n"
+
+
+def scan(*args):
+    subprocess.run([sys.executable, f"{ROOT}/scan_archive.py", *map(str, args), "--workers", "2", "--progress", "0"],
+                   check=True, capture_output=True)
+
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_warc_scan_keeps_order_and_skips_non_html(tmp_path):
+    html = gzip.compress(PAGE.format("").encode())
+    warc = tmp_path / "crawl.warc.gz"
+    warc.write_bytes(
+        warc_record("request", "https://example.com/1", b"GET / HTTP/1.1\r\n\r\n")
+        + warc_record("response", "https://example.com/1", b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n"
+                      b"Content-Encoding: gzip\r\nTransfer-Encoding: chunked\r\n\r\n" + chunked(html))
+        + warc_record("response", "https://example.com/2", b"HTTP/1.1 200 OK\r\nContent-Type: image/png\r\n\r\nPNG")
+        + warc_record("response", "https://example.com/3", b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n"
+                      b"X-Powered-By: PHP/8.2.1\r\n\r\n<html></html>"))
+    output = tmp_path / "out.jsonl"
+
+    scan(warc, "-o", output)
+
+    results = read_lines(output)
+    assert [result["url"] for result in results] == ["https://example.com/1", "https://example.com/3"]
+    assert "WordPress" in results[0]["technologies"]
+    assert results[1]["technologies"]["PHP"]["version"] == "8.2.1"
+
+
+def test_jsonl_scan_reports_bad_records_and_resumes_from_the_checkpoint(tmp_path):
+    records = [
+        {"url": "https://example.com/a", "html": PAGE.format("")},
+        {"url": "https://example.com/b", "html_base64": base64.b64encode(gzip.compress(PAGE.format("").encode())).decode()},
+    ]
+    source = tmp_path / "pages.jsonl"
+    source.write_text("\n".join([json.dumps(records[0]), "{not json", json.dumps(records[1])]) + "\n")
+    output = tmp_path / "out.jsonl"
+
+    scan(source, "-o", output, "--flush-every", "1")
+    results = read_lines(output)
+    assert [result.get("url") for result in results] == ["https://example.com/a", "", "https://example.com/b"]
+    assert "error" in results[1]
+    assert all("WordPress" in results[i]["technologies"] for i in (0, 2))
+
+    # Escrita depois do último checkpoint (processo interrompido) é descartada no --resume
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"url": "parcial"')
+    scan(source, "-o", output, "--resume")
+    assert read_lines(output) == results
+
+
+def test_scan_record_limits_text_html_in_bytes(monkeypatch):
+    monkeypatch.setattr(app, "ANALYZE_MAX_BYTES", 10_000)
+    line = json.dumps({"url": "https://example.com/", "html": PAGE.format("€" * 6_000)})
+
+    result = scan_archive.scan_record(("jsonl", "", line.encode()))
+
+    assert result["truncated"] is True
+    assert "WordPress" in result["technologies"]